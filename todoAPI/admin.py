@@ -0,0 +1,51 @@
+from flask import Blueprint, jsonify, request
+from models import db, PurgeJob
+from decorators import role_required
+from database import pool_metrics
+from principals import principal_cache
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+PURGES_DEFAULT_LIMIT = 50
+PURGES_MAX_LIMIT = 500
+
+@admin_bp.route('/db/pool', methods=['GET'])
+@role_required('admin')
+def get_pool_metrics():
+    """Connection pool checkout wait, saturation and churn for each engine"""
+    pools = {}
+    for bind_key, engine in db.engines.items():
+        pools[bind_key or 'default'] = {
+            'dialect': engine.dialect.name,
+            'metrics': pool_metrics(engine)
+        }
+    return jsonify({'pools': pools}), 200
+
+@admin_bp.route('/cache/principals', methods=['GET'])
+@role_required('admin')
+def get_principal_cache_stats():
+    """Hit rate and size of this process's authenticated-user cache"""
+    return jsonify({'principals': principal_cache().stats()}), 200
+
+@admin_bp.route('/purges', methods=['GET'])
+@role_required('admin')
+def get_purges():
+    """Background deletions, newest first, optionally filtered by status"""
+    query = PurgeJob.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    limit = request.args.get('limit', PURGES_DEFAULT_LIMIT, type=int)
+    if limit < 1 or limit > PURGES_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {PURGES_MAX_LIMIT}'}), 400
+    jobs = query.order_by(PurgeJob.id.desc()).limit(limit).all()
+    return jsonify({'purges': [job.to_dict() for job in jobs], 'count': len(jobs)}), 200
+
+@admin_bp.route('/purges/<int:job_id>', methods=['GET'])
+@role_required('admin')
+def get_purge(job_id):
+    """Progress of one background deletion"""
+    job = db.session.get(PurgeJob, job_id)
+    if job is None:
+        return jsonify({'error': 'Purge job not found'}), 404
+    return jsonify({'purge': job.to_dict()}), 200
@@ -13,6 +13,18 @@ from todos import todos_bp
 from users import users_bp
 from todolists import todolists_bp
 from simple_todos import simple_todos_bp
+from admin import admin_bp
+from sync import sync_bp, purge_tombstones_command
+from batch import batch_bp
+from transfer import transfer_bp
+from ordering import rebalance_orders_command
+from counters import recount_stats_command
+from purge import init_purge_worker, run_purges_command
+from principals import init_principal_cache, token_revoked
+from database import configure_engines, engine_options_from_env, sqlite_pragmas_from_env
+from routing import init_routing, replica_binds_from_env, REPLICA_BIND, TOKEN_HEADER
+from compression import init_compression
+from serialization import init_json
 from logging_config import logger
 
 def create_app():
@@ -20,8 +32,12 @@ def create_app():
     load_dotenv()
     app = Flask(__name__)
     
+    # orjson when installed; JSON_PROVIDER=stdlib forces the standard library
+    app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', '')
+    init_json(app)
+    
     # CORS configuration
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=[TOKEN_HEADER, 'ETag'])
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
@@ -30,12 +46,38 @@ def create_app():
     # Database configuration - use instance folder for SQLite
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///todo.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Optional read replica for GET endpoints
+    replica_url = os.environ.get('REPLICA_DATABASE_URL')
+    app.config['SQLALCHEMY_BINDS'] = replica_binds_from_env(
+        replica_url, engine_options_from_env(replica_url) if replica_url else {}
+    )
+    app.config['REPLICA_PIN_SECONDS'] = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+    app.config['SYNC_RETENTION_DAYS'] = int(os.environ.get('SYNC_RETENTION_DAYS', 30))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['MAX_DECOMPRESSED_BODY_SIZE'] = int(os.environ.get('MAX_DECOMPRESSED_BODY_SIZE', 16 * 1024 * 1024))
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas_from_env()
+    # Authenticated-user cache for token_required/role_required (principals.py)
+    app.config['PRINCIPAL_CACHE_SIZE'] = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    app.config['PRINCIPAL_CACHE_TTL'] = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    # Role checks trust the token's role claim; security epochs revoke stale tokens
+    app.config['AUTHZ_FROM_CLAIMS'] = os.environ.get('AUTHZ_FROM_CLAIMS', 'false').lower() in ('true', '1', 'yes')
+    app.config['SECURITY_EPOCH_REFRESH_SECONDS'] = int(os.environ.get('SECURITY_EPOCH_REFRESH_SECONDS', 5))
+    # Background deletion of large users and lists (purge.py)
+    app.config['PURGE_WORKER_ENABLED'] = os.environ.get('PURGE_WORKER_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    app.config['PURGE_ASYNC_THRESHOLD'] = int(os.environ.get('PURGE_ASYNC_THRESHOLD', 5000))
+    app.config['PURGE_CHUNK_SIZE'] = int(os.environ.get('PURGE_CHUNK_SIZE', 500))
+    app.config['PURGE_POLL_SECONDS'] = int(os.environ.get('PURGE_POLL_SECONDS', 30))
     # Disable CSRF protection for API usage
     app.config['JWT_CSRF_CHECK_FORM'] = False
     app.config['JWT_CSRF_IN_COOKIES'] = False
     
     # Initialize extensions
     db.init_app(app)
+    # The replica mirrors the primary and has no models of its own; keep
+    # create_all/drop_all from running DDL against it
+    db.metadatas.pop(REPLICA_BIND, None)
     
     # Initialize migrations directory
     basedir = os.path.abspath(os.path.dirname(__file__))
@@ -43,6 +85,7 @@ def create_app():
     
     # Create tables and run migrations in app context
     with app.app_context():
+        configure_engines(app, db)
         try:
             from flask_migrate import upgrade
             logger.info("Running database migrations...")
@@ -79,6 +122,24 @@ def create_app():
     app.register_blueprint(simple_todos_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(todolists_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(transfer_bp)
+
+    # CLI commands
+    app.cli.add_command(rebalance_orders_command)
+    app.cli.add_command(recount_stats_command)
+    app.cli.add_command(purge_tombstones_command)
+    app.cli.add_command(run_purges_command)
+
+    # Route safe reads to the replica, if one is configured
+    init_routing(app)
+
+    # gzip/brotli responses and gzip request bodies
+    init_compression(app)
+
+    init_principal_cache(app)
 
     # Request logging middleware
     @app.before_request
@@ -110,6 +171,15 @@ def create_app():
     @jwt.unauthorized_loader
     def missing_token_callback(error):
         return jsonify({'error': 'Authorization token is required'}), 401
+
+    # Tokens issued before the user's security epoch (role change, deactivation, password reset)
+    @jwt.token_in_blocklist_loader
+    def check_security_epoch(jwt_header, jwt_payload):
+        return token_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked'}), 401
     
     # Debug endpoint for frontend troubleshooting
     @app.route('/debug')
@@ -138,17 +208,27 @@ def create_app():
                     'get': 'GET /todos/:id',
                     'update': 'PUT /todos/:id',
                     'delete': 'DELETE /todos/:id',
-                    'stats': 'GET /todos/stats'
+                    'stats': 'GET /todos/stats',
+                    'search': 'GET /todos/search?q='
                 },
+                'sync': 'GET /sync?since=',
+                'batch': 'POST /batch',
+                'export': 'GET /export',
+                'import': 'POST /import',
                 'todolists': {
                     'list': 'GET /todolists',
                     'create': 'POST /todolists',
                     'get': 'GET /todolists/:id',
                     'update': 'PUT /todolists/:id',
                     'delete': 'DELETE /todolists/:id',
+                    'stats': 'GET /todolists/:id/stats',
                     'todos': {
                         'list': 'GET /todolists/:id/todos',
                         'create': 'POST /todolists/:id/todos',
+                        'bulk_create': 'POST /todolists/:id/todos/bulk',
+                        'bulk_complete': 'PATCH /todolists/:id/todos/bulk',
+                        'bulk_delete': 'DELETE /todolists/:id/todos/bulk',
+                        'clear_completed': 'DELETE /todolists/:id/todos/completed',
                         'get': 'GET /todolists/:id/todos/:todoId',
                         'update': 'PUT /todolists/:id/todos/:todoId',
                         'delete': 'DELETE /todolists/:id/todos/:todoId'
@@ -177,10 +257,16 @@ if __name__ == '__main__':
     
     # Get port from environment variable (for Docker)
     port = int(os.environ.get('PORT', 5001))
+    debug = os.environ.get('FLASK_ENV') == 'development'
+
+    # Resume and run background deletions, in the serving process only (not
+    # the reloader's parent); WSGI servers and CLI commands run `flask run-purges`
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_purge_worker(app)
     
     # Run the application
     app.run(
         host='0.0.0.0',
         port=port,
-        debug=os.environ.get('FLASK_ENV') == 'development'
+        debug=debug
     )
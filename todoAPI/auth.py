@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import db, User, UserRole, PasswordResetToken
 from decorators import token_required
+from principals import bump_security_epoch, clear_reused_revocation, invalidate_principal, token_claims
 import re
+from routing import replica_read
 from logging_config import logger
 import secrets
 from datetime import datetime, timedelta
@@ -68,17 +70,19 @@ def register():
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
         
         # If no users exist, make the first one an admin
-        is_first_user = User.query.count() == 0
+        # Users hidden pending a purge still hold their username and email
+        users = User.query.execution_options(include_deleted=True)
+        is_first_user = users.count() == 0
         logger.info(f"Is first user: {is_first_user}")
         
         # Check if user already exists
         if not is_first_user:
-            existing_user = User.query.filter_by(username=username).first()
+            existing_user = users.filter_by(username=username).first()
             if existing_user:
                 logger.warning(f"Username already exists: {username}")
                 return jsonify({'error': 'Username already exists'}), 409
             
-            existing_email = User.query.filter_by(email=email).first()
+            existing_email = users.filter_by(email=email).first()
             if existing_email:
                 logger.warning(f"Email already exists: {email}")
                 return jsonify({'error': 'Email already exists'}), 409
@@ -94,6 +98,8 @@ def register():
         
         try:
             db.session.add(user)
+            db.session.flush()
+            clear_reused_revocation(user)
             db.session.commit()
             logger.info(f"User {username} saved to database with ID: {user.id}")
         except Exception as e:
@@ -103,7 +109,7 @@ def register():
         
         # Create access token
         try:
-            access_token = create_access_token(identity=str(user.id))
+            access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
             logger.info(f"Access token created for user {username}")
         except Exception as e:
             logger.error(f"Error creating access token: {e}")
@@ -152,8 +158,7 @@ def login():
             return jsonify({'error': 'Invalid username or password'}), 401
         
         # Create access token with additional claims
-        additional_claims = {'role': user.role.value}
-        access_token = create_access_token(identity=str(user.id), additional_claims=additional_claims)
+        access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
         
         logger.info(f"User '{username}' logged in successfully")
         return jsonify({
@@ -167,10 +172,14 @@ def login():
         return jsonify({'error': 'Login failed', 'details': str(e)}), 500
 
 @auth_bp.route('/me', methods=['GET'])
+@replica_read
 @token_required
 def get_current_user(current_user):
     """Get current user information"""
-    return jsonify({'user': current_user.to_dict()}), 200
+    user = db.session.get(User, current_user.id)
+    if not user:
+        return jsonify({"message": "User not found!"}), 404
+    return jsonify({'user': user.to_dict()}), 200
 
 @auth_bp.route('/request-password-reset', methods=['POST'])
 def request_password_reset():
@@ -229,11 +238,13 @@ def reset_password():
     if not user:
         return jsonify({'error': 'User not found'}), 404
         
-    # Set the new password
+    # Set the new password and revoke the user's existing tokens
     user.set_password(new_password)
+    bump_security_epoch(user)
     
     # Invalidate the token
     db.session.delete(reset_token)
     db.session.commit()
+    invalidate_principal(user.id)
     
     return jsonify({'message': 'Password has been reset successfully.'}), 200
@@ -0,0 +1,211 @@
+"""
+POST /batch: many list and todo writes in one request.
+
+The caller is authenticated once, and every list and todo the operations name
+by ID is loaded with one ownership-checked query per kind, instead of once per
+operation. Operations run in order in one transaction:
+
+- atomic (the default): the first failing operation rolls everything back;
+- per-item (`"atomic": false`): each operation runs in its own savepoint, so a
+  failing one is undone on its own and the rest are committed.
+
+A create_list operation may carry a client-chosen `ref`; later operations
+can then pass `list_ref` instead of a `list_id`, so a list and its todos can
+be created in the same batch.
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Todo, TodoList
+from ordering import append_order, list_scope, user_scope
+from todos import apply_todo_changes
+from validation import (is_id, validate_list_name, validate_new_todo, validate_todo_changes,
+                        ValidationError)
+from logging_config import logger
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_MAX_OPERATIONS = 500
+
+class OperationError(Exception):
+    """Raised when one operation of a batch fails; carries the HTTP status for its result"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _id(value):
+    return value if is_id(value) else None
+
+class Batch:
+    """The state shared by the operations of one batch"""
+
+    def __init__(self, user_id, operations):
+        self.user_id = int(user_id)
+        self.refs = {}
+        # The database deletes a list's todos with it, behind the session's back
+        self.deleted_lists = set()
+        list_ids = {_id(op.get('list_id')) for op in operations} - {None}
+        todo_ids = {_id(op.get('todo_id')) for op in operations} - {None}
+        # One ownership query per kind; IDs the user does not own are simply absent
+        self.lists = {l.id: l for l in TodoList.query.filter(
+            TodoList.id.in_(list_ids), TodoList.user_id == self.user_id)} if list_ids else {}
+        self.todos = {t.id: t for t in Todo.query.filter(
+            Todo.id.in_(todo_ids), Todo.user_id == self.user_id)} if todo_ids else {}
+
+    def todolist(self, op, required=True):
+        """The list an operation names by list_id or list_ref"""
+        if 'list_ref' in op:
+            list_id = self.refs.get(op['list_ref']) if isinstance(op['list_ref'], str) else None
+            if list_id is None:
+                raise OperationError(400, f"Unknown list_ref: {op['list_ref']}")
+        elif op.get('list_id') is None and not required:
+            return None
+        else:
+            list_id = _id(op.get('list_id'))
+            if list_id is None:
+                raise OperationError(400, 'list_id must be an integer')
+        todolist = self.lists.get(list_id)
+        if todolist is None or _deleted(todolist):
+            raise OperationError(404, 'TodoList not found or you do not have permission to access it')
+        return todolist
+
+    def todo(self, op):
+        """The todo an operation names by todo_id"""
+        todo_id = _id(op.get('todo_id'))
+        if todo_id is None:
+            raise OperationError(400, 'todo_id must be an integer')
+        todo = self.todos.get(todo_id)
+        if todo is None or _deleted(todo) or todo.todo_list_id in self.deleted_lists:
+            raise OperationError(404, 'Todo not found')
+        return todo
+
+def _deleted(obj):
+    # Deleted earlier in the batch, directly or with its list
+    state = inspect(obj)
+    return state.deleted or state.was_deleted or obj in db.session.deleted
+
+def _create_list(batch, op):
+    ref = op.get('ref')
+    if ref is not None and not isinstance(ref, str):
+        raise OperationError(400, 'ref must be a string')
+    todolist = TodoList(name=validate_list_name(op.get('name')), user_id=batch.user_id)
+    db.session.add(todolist)
+    db.session.flush()
+    batch.lists[todolist.id] = todolist
+    if ref is not None:
+        batch.refs[ref] = todolist.id
+    return 201, {'todolist': todolist.to_summary_dict()}
+
+def _update_list(batch, op):
+    todolist = batch.todolist(op)
+    todolist.name = validate_list_name(op.get('name'))
+    db.session.flush()
+    return 200, {'todolist': todolist.to_summary_dict()}
+
+def _delete_list(batch, op):
+    todolist = batch.todolist(op)
+    db.session.delete(todolist)
+    db.session.flush()
+    batch.deleted_lists.add(todolist.id)
+    return 200, {}
+
+def _create_todo(batch, op):
+    fields = validate_new_todo(op)
+    todolist = batch.todolist(op, required=False)
+    scope = list_scope(todolist.id) if todolist else user_scope(batch.user_id)
+    todo = Todo(user_id=batch.user_id, todo_list_id=todolist.id if todolist else None,
+                completed=False, order=append_order(scope), **fields)
+    db.session.add(todo)
+    db.session.flush()
+    batch.todos[todo.id] = todo
+    return 201, {'todo': todo.to_dict()}
+
+def _update_todo(batch, op):
+    todo = batch.todo(op)
+    apply_todo_changes(todo, validate_todo_changes(op))
+    db.session.flush()
+    return 200, {'todo': todo.to_dict()}
+
+def _delete_todo(batch, op):
+    db.session.delete(batch.todo(op))
+    db.session.flush()
+    return 200, {}
+
+OPERATIONS = {
+    'create_list': _create_list,
+    'update_list': _update_list,
+    'delete_list': _delete_list,
+    'create_todo': _create_todo,
+    'update_todo': _update_todo,
+    'delete_todo': _delete_todo,
+}
+
+def run_operation(batch, op):
+    """Run one operation; returns (status, result body)"""
+    if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+        raise OperationError(400, f"op must be one of: {', '.join(OPERATIONS)}")
+    try:
+        return OPERATIONS[op['op']](batch, op)
+    except ValidationError as e:
+        raise OperationError(400, str(e))
+
+def _result(index, op, status, body):
+    name = op.get('op') if isinstance(op, dict) else None
+    return {'index': index, 'op': name, 'status': status, **body}
+
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def run_batch():
+    """Run an ordered list of list and todo operations in one transaction"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+        return jsonify({'error': 'operations must be a list'}), 400
+
+    operations = data['operations']
+    atomic = data.get('atomic', True)
+    if not isinstance(atomic, bool):
+        return jsonify({'error': 'atomic must be a boolean'}), 400
+    if not operations or len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'operations must hold between 1 and {BATCH_MAX_OPERATIONS} items'}), 400
+
+    try:
+        batch = Batch(user_id, [op for op in operations if isinstance(op, dict)])
+        results = []
+        for index, op in enumerate(operations):
+            # Per-item mode undoes a failing operation by rolling back to its savepoint
+            savepoint = None if atomic else db.session.begin_nested()
+            try:
+                status, body = run_operation(batch, op)
+                if savepoint:
+                    savepoint.commit()
+            except (OperationError, SQLAlchemyError) as e:
+                if savepoint:
+                    savepoint.rollback()
+                else:
+                    db.session.rollback()
+                status = e.status if isinstance(e, OperationError) else 500
+                error = str(e) if isinstance(e, OperationError) else 'Database error'
+                results.append(_result(index, op, status, {'error': error}))
+                if atomic:
+                    logger.info(f"Batch for user {user_id} rolled back at operation {index}: {error}")
+                    return jsonify({
+                        'error': f'Operation {index} failed; no changes were made',
+                        'committed': False,
+                        'failed_index': index,
+                        'results': results
+                    }), status
+                continue
+            results.append(_result(index, op, status, body))
+
+        db.session.commit()
+        failed = sum(1 for result in results if result['status'] >= 400)
+        logger.info(f"Batch of {len(operations)} operations for user {user_id} committed ({failed} failed)")
+        return jsonify({'committed': True, 'results': results}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to run batch for user {user_id}: {e}")
+        return jsonify({'error': 'Failed to run batch', 'details': str(e)}), 500
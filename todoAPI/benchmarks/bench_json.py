@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compare ways of serializing one 10k-todo list into a JSON response body:
+ORM objects + to_dict() with the stdlib and orjson providers, and column
+rows + rows_to_dicts() with both providers.
+
+Usage (from the todoAPI directory):
+    python benchmarks/bench_json.py --todos 10000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from sqlalchemy import text
+from models import db, Todo
+from serialization import (OrjsonProvider, StdlibJSONProvider, orjson,
+                           rows_to_dicts, select_todo_fields)
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    return app
+
+def seed(count):
+    db.create_all()
+    db.session.execute(text(
+        "INSERT INTO users (id, username, email, password_hash, role, is_active) "
+        "VALUES (1, 'bench', 'bench@example.com', 'x', 'USER', 1)"
+    ))
+    db.session.execute(text("INSERT INTO todolists (id, name, user_id) VALUES (1, 'list', 1)"))
+    db.session.execute(text(
+        'INSERT INTO todos (user_id, todo_list_id, title, description, completed, created_at, updated_at, "order") '
+        "VALUES (1, 1, :title, 'A short description of the todo', :completed, "
+        "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, :order)"
+    ), [{'title': f'Todo number {index}', 'completed': index % 3 == 0, 'order': index * 1024}
+        for index in range(count)])
+    db.session.commit()
+
+def orm_to_dict():
+    todos = Todo.query.filter_by(todo_list_id=1).order_by(Todo.order).all()
+    return jsonify({'todos': [todo.to_dict() for todo in todos], 'count': len(todos)}).get_data()
+
+def column_rows():
+    query = Todo.query.filter_by(todo_list_id=1).order_by(Todo.order)
+    todos = select_todo_fields(query).all()
+    return jsonify({'todos': rows_to_dicts(todos), 'count': len(todos)}).get_data()
+
+def measure(app, provider, build, repeat):
+    app.json = provider(app)
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = build()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--todos', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_app(path)
+        with app.test_request_context():
+            seed(args.todos)
+            variants = [('ORM + to_dict, stdlib', StdlibJSONProvider, orm_to_dict),
+                        ('rows, stdlib', StdlibJSONProvider, column_rows)]
+            if orjson is not None:
+                variants += [('ORM + to_dict, orjson', OrjsonProvider, orm_to_dict),
+                             ('rows, orjson', OrjsonProvider, column_rows)]
+            else:
+                print('orjson is not installed; only the stdlib provider is measured')
+
+            baseline = None
+            print(f'{args.todos} todos, median of {args.repeat} runs (query + serialize)')
+            for name, provider, build in variants:
+                seconds, size = measure(app, provider, build, args.repeat)
+                baseline = baseline or seconds
+                print(f'  {name:<24} {seconds * 1000:8.1f} ms  {size / 1024:8.0f} KiB  '
+                      f'{baseline / seconds:5.1f}x')
+    finally:
+        os.unlink(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare SQLite read/write throughput with and without the pragma profile
+from database.py under concurrent workers.
+
+Usage (from the todoAPI directory):
+    python benchmarks/bench_sqlite_pragmas.py --workers 8 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from database import SQLITE_PRAGMA_DEFAULTS, apply_sqlite_pragmas
+from models import db
+
+LISTS = 50
+TODOS_PER_LIST = 200
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, password_hash, role, is_active) "
+            "VALUES (1, 'bench', 'bench@example.com', 'x', 'USER', 1)"
+        ))
+        connection.execute(text("INSERT INTO todolists (id, name, user_id) VALUES (:id, 'list', 1)"),
+                           [{'id': list_id} for list_id in range(1, LISTS + 1)])
+        connection.execute(text(
+            'INSERT INTO todos (user_id, todo_list_id, title, completed, "order") '
+            "VALUES (1, :list_id, 'todo', 0, :order)"
+        ), [{'list_id': list_id, 'order': order}
+            for list_id in range(1, LISTS + 1) for order in range(TODOS_PER_LIST)])
+
+def worker(engine, deadline, write_ratio, results):
+    reads = writes = errors = 0
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        list_id = rng.randint(1, LISTS)
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        'INSERT INTO todos (user_id, todo_list_id, title, completed, "order") '
+                        "VALUES (1, :list_id, 'new', 0, :order)"
+                    ), {'list_id': list_id, 'order': rng.randint(0, 10 ** 6)})
+                writes += 1
+            else:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        'SELECT * FROM todos WHERE todo_list_id = :list_id ORDER BY "order" LIMIT 50'
+                    ), {'list_id': list_id}).fetchall()
+                reads += 1
+        except OperationalError:
+            errors += 1
+    results.append((reads, writes, errors))
+
+def run(profile_name, pragmas, workers, seconds, write_ratio):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        engine = create_engine(f'sqlite:///{path}', pool_size=workers, max_overflow=0)
+        if pragmas:
+            apply_sqlite_pragmas(engine, pragmas)
+        seed(engine)
+
+        results = []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=worker, args=(engine, deadline, write_ratio, results))
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    reads = sum(r for r, _, _ in results)
+    writes = sum(w for _, w, _ in results)
+    errors = sum(e for _, _, e in results)
+    print(f'{profile_name:<10} reads/s {reads / seconds:>10.0f}   writes/s {writes / seconds:>8.0f}   '
+          f'lock errors {errors}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers, {args.seconds:g}s per profile, {args.write_ratio:.0%} writes')
+    # SQLite defaults: rollback journal, synchronous=FULL, no busy timeout
+    run('default', {}, args.workers, args.seconds, args.write_ratio)
+    run('tuned', SQLITE_PRAGMA_DEFAULTS, args.workers, args.seconds, args.write_ratio)
+
+if __name__ == '__main__':
+    main()
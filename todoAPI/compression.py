@@ -0,0 +1,180 @@
+"""
+HTTP compression.
+
+Responses are compressed with brotli (when the optional `brotli` package is
+installed) or gzip, whichever the client's Accept-Encoding prefers. Bodies
+smaller than COMPRESS_MIN_SIZE are sent as they are, because compressing them
+costs more CPU than it saves on the wire. Streamed responses are compressed
+chunk by chunk and flushed after every chunk, so clients still receive each
+chunk as soon as it is produced.
+
+Request bodies sent with `Content-Encoding: gzip` are decompressed before
+Flask sees them. Decompression stops with 413 once the body grows past
+MAX_DECOMPRESSED_BODY_SIZE, so a small compressed upload cannot expand into
+an unbounded one.
+"""
+import json
+import zlib
+from io import BytesIO
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+
+# Compressed representations get their own strong ETag: "<etag>-<coding>"
+CODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+# Dynamic content: favour speed over the last few percent of ratio
+BROTLI_QUALITY = 4
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+def _gzip_compressor(level):
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+class _BrotliCompressor:
+    """Adapts brotli.Compressor to the zlib compressobj interface"""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self, mode=zlib.Z_FINISH):
+        if mode == zlib.Z_FINISH:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def _compressor(coding, level):
+    return _BrotliCompressor() if coding == 'br' else _gzip_compressor(level)
+
+def _stream(chunks, compressor):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+def negotiate_coding():
+    """The content coding to use for the current request's response, or None"""
+    return request.accept_encodings.best_match(CODINGS)
+
+def _compressible(response):
+    if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+def compress_response(response, min_size, level):
+    """Compress a response in place if the client accepts it and it is worth it"""
+    if not _compressible(response):
+        return response
+    # Caches must not hand a compressed body to a client that cannot read it
+    response.vary.add('Accept-Encoding')
+
+    coding = negotiate_coding()
+    if coding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, _compressor(coding, level))
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        compressor = _compressor(coding, level)
+        response.set_data(compressor.compress(body) + compressor.flush())
+
+    response.headers['Content-Encoding'] = coding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{coding}')
+    return response
+
+def _json_error(start_response, status, message):
+    body = json.dumps({'error': message}).encode()
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    return [body]
+
+class DecompressRequestMiddleware:
+    """WSGI middleware that inflates gzip request bodies up to a size limit"""
+
+    def __init__(self, wsgi_app, max_size):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        coding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if coding in ('', 'identity'):
+            return self.wsgi_app(environ, start_response)
+        if coding not in ('gzip', 'x-gzip'):
+            return _json_error(start_response, '415 Unsupported Media Type',
+                               f'Unsupported Content-Encoding: {coding}')
+
+        body = self._inflate(environ)
+        if body is None:
+            return _json_error(start_response, '413 Request Entity Too Large',
+                               f'Decompressed request body exceeds {self.max_size} bytes')
+        if body is False:
+            return _json_error(start_response, '400 Bad Request', 'Invalid gzip request body')
+
+        # Downstream sees an ordinary uncompressed body
+        environ['wsgi.input'] = BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ.pop('wsgi.input_terminated', None)
+        return self.wsgi_app(environ, start_response)
+
+    def _inflate(self, environ):
+        """The decompressed body, None if it is too large, or False if it is not valid gzip"""
+        stream = environ['wsgi.input']
+        remaining = int(environ.get('CONTENT_LENGTH') or 0)
+        terminated = bool(environ.get('wsgi.input_terminated'))
+        decompressor = zlib.decompressobj(31)
+        parts, size = [], 0
+        try:
+            while terminated or remaining > 0:
+                chunk = stream.read(_READ_CHUNK_SIZE if terminated else min(_READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                # Never inflate more than one byte past the limit, whatever the ratio
+                data = decompressor.decompress(chunk, self.max_size + 1 - size)
+                while data:
+                    parts.append(data)
+                    size += len(data)
+                    if size > self.max_size:
+                        return None
+                    data = decompressor.decompress(decompressor.unconsumed_tail, self.max_size + 1 - size)
+            if not decompressor.eof:
+                return False
+        except zlib.error:
+            return False
+        return b''.join(parts)
+
+def init_compression(app):
+    """Compress responses and accept compressed request bodies"""
+    app.wsgi_app = DecompressRequestMiddleware(app.wsgi_app, app.config['MAX_DECOMPRESSED_BODY_SIZE'])
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
@@ -0,0 +1,40 @@
+"""
+Conditional GET for polling clients.
+
+Responses carry a strong ETag built from a version that changes on every
+write the response depends on (a user's change sequence or a list's version,
+see sync.py) plus the user and the exact path and query string. A matching
+If-None-Match is answered with 304 straight after that one version lookup,
+before the todos table is read or anything is serialized.
+"""
+import hashlib
+from flask import make_response, request
+from compression import CODINGS
+
+# Let clients store responses but make them revalidate before every use
+CACHE_CONTROL = 'private, no-cache'
+
+def etag_for(user_id, version):
+    """ETag for the current request's representation at `version`"""
+    raw = f'{user_id}:{version}:{request.full_path}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def not_modified(etag):
+    """A 304 response if the client already holds this representation, otherwise None"""
+    # The client may hold the compressed variant, which has its own ETag
+    for candidate in (etag, *(f'{etag}-{coding}' for coding in CODINGS)):
+        if request.if_none_match.contains_weak(candidate):
+            break
+    else:
+        return None
+    response = make_response('', 304)
+    response.set_etag(candidate)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def with_etag(rv, etag):
+    """Turn a view's return value into a response carrying the ETag"""
+    response = make_response(rv)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -5,7 +5,7 @@ import pytest
 import tempfile
 import os
 from app import create_app
-from models import db, User, Todo, UserRole
+from models import db, User, Todo, TodoList, UserRole
 
 
 @pytest.fixture
@@ -124,6 +124,24 @@ def completed_todo(app, test_user):
         yield db.session.merge(todo)
 
 
+@pytest.fixture
+def sample_todolist(app, test_user):
+    """Create a todo list with three todos for testing."""
+    with app.app_context():
+        todolist = TodoList(name='Groceries', user_id=test_user.id)
+        db.session.add(todolist)
+        db.session.flush()
+        for index, title in enumerate(['Milk', 'Eggs', 'Bread'], start=1):
+            db.session.add(Todo(
+                user_id=test_user.id,
+                todo_list_id=todolist.id,
+                title=title,
+                order=index
+            ))
+        db.session.commit()
+        yield db.session.merge(todolist)
+
+
 @pytest.fixture
 def admin_user(app):
     """Create an admin test user in the database."""
@@ -0,0 +1,210 @@
+"""
+Denormalized todo counters: TodoList.todo_count/completed_count and the
+per-user UserStats row.
+
+ORM writes are picked up automatically by session flush hooks and applied in
+the same transaction as the change. Set-based statements that bypass the ORM
+(bulk inserts, UPDATE/DELETE ... WHERE) must call `adjust` themselves.
+Todos removed by ON DELETE CASCADE with their list are taken off the owner's
+counters using the list's own counters, so deleting a list never reads its
+todos.
+`flask recount-stats` rebuilds every counter from the todos table.
+"""
+from collections import defaultdict
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, update
+from models import db, Todo, TodoList, User, UserStats
+from routing import use_primary
+from logging_config import logger
+
+_PENDING_KEY = 'counter_deltas'
+_SKIP_USERS_KEY = 'counter_deleted_users'
+_TOUCHED_KEY = 'counter_touched'
+
+def _count_columns():
+    completed = db.func.coalesce(db.func.sum(db.case((Todo.completed == True, 1), else_=0)), 0)
+    return db.func.count(Todo.id), completed
+
+def recount_user(user_id):
+    """Recompute a user's counters from the todos table and store them"""
+    user_id = int(user_id)
+    total, completed = db.session.query(*_count_columns()).filter(Todo.user_id == user_id).one()
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id)
+        db.session.add(stats)
+    stats.todo_count, stats.completed_count = total, completed
+    return stats
+
+def recount_list(list_id):
+    """Recompute a list's counters from the todos table and store them"""
+    total, completed = db.session.query(*_count_columns()).filter(Todo.todo_list_id == list_id).one()
+    db.session.query(TodoList).filter_by(id=list_id).update(
+        {'todo_count': total, 'completed_count': completed}, synchronize_session='fetch'
+    )
+
+def get_user_stats(user_id):
+    """The user's counter row, created from a recount the first time it is needed"""
+    user_id = int(user_id)
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        # A lagging replica may not have the row yet; create it from the primary
+        use_primary()
+        stats = recount_user(user_id)
+        db.session.commit()
+    return stats
+
+def insert_user_stats(connection, user_id, **values):
+    """Create a missing counter row from a recount, inside the caller's flush or statement"""
+    counts = db.select(*_count_columns()).where(Todo.user_id == user_id)
+    total, completed = connection.execute(counts).one()
+    connection.execute(UserStats.__table__.insert().values(
+        user_id=user_id, todo_count=total, completed_count=completed, **values
+    ))
+
+def _apply(connection, list_deltas, user_deltas, skip_users=()):
+    lists = TodoList.__table__
+    stats = UserStats.__table__
+    for list_id, (total, completed) in list_deltas.items():
+        if total or completed:
+            connection.execute(lists.update().where(lists.c.id == list_id).values(
+                todo_count=lists.c.todo_count + total,
+                completed_count=lists.c.completed_count + completed
+            ))
+    for user_id, (total, completed) in user_deltas.items():
+        if not (total or completed) or user_id in skip_users:
+            continue
+        result = connection.execute(stats.update().where(stats.c.user_id == user_id).values(
+            todo_count=stats.c.todo_count + total,
+            completed_count=stats.c.completed_count + completed
+        ))
+        if result.rowcount == 0:
+            # No row yet: the recount already includes this change
+            insert_user_stats(connection, user_id)
+
+def adjust(user_id, list_id=None, total=0, completed=0):
+    """Apply counter deltas for a change made outside the ORM unit of work"""
+    list_deltas = {list_id: (total, completed)} if list_id is not None else {}
+    _apply(db.session.connection(), list_deltas, {int(user_id): (total, completed)})
+
+def _value_before(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), key)
+
+def _add(deltas, todo_list_id, user_id, total, completed):
+    if todo_list_id is not None:
+        deltas['lists'][todo_list_id][0] += total
+        deltas['lists'][todo_list_id][1] += completed
+    deltas['users'][int(user_id)][0] += total
+    deltas['users'][int(user_id)][1] += completed
+
+def _new_deltas():
+    return {'lists': defaultdict(lambda: [0, 0]), 'users': defaultdict(lambda: [0, 0])}
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_deletes(session, flush_context, instances):
+    # Deleted rows are read before the flush, while they can still be loaded
+    deltas = session.info.setdefault(_PENDING_KEY, _new_deltas())
+    skip_users = session.info.setdefault(_SKIP_USERS_KEY, set())
+    deleted_lists = []
+    # Per deleted list: the todos the ORM is deleting itself, which are counted one by one
+    orm_deleted = defaultdict(lambda: [0, 0])
+    for obj in session.deleted:
+        if isinstance(obj, Todo):
+            state = inspect(obj)
+            list_id, completed = _value_before(state, 'todo_list_id'), int(bool(_value_before(state, 'completed')))
+            _add(deltas, list_id, _value_before(state, 'user_id'), -1, -completed)
+            orm_deleted[list_id][0] += 1
+            orm_deleted[list_id][1] += completed
+        elif isinstance(obj, TodoList):
+            deleted_lists.append(obj)
+        elif isinstance(obj, User):
+            skip_users.add(obj.id)
+
+    # The rest of a deleted list's todos go with it in the database
+    for todolist in deleted_lists:
+        if todolist.user_id in skip_users:
+            continue
+        total, completed = orm_deleted.get(todolist.id, (0, 0))
+        deltas['users'][int(todolist.user_id)][0] -= todolist.todo_count - total
+        deltas['users'][int(todolist.user_id)][1] -= todolist.completed_count - completed
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_and_apply(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None) or _new_deltas()
+    skip_users = session.info.pop(_SKIP_USERS_KEY, set())
+
+    # New rows are counted after the flush, once list and todo IDs exist
+    for obj in session.new:
+        if isinstance(obj, Todo):
+            _add(deltas, obj.todo_list_id, obj.user_id, 1, int(bool(obj.completed)))
+
+    for obj in session.dirty:
+        if not isinstance(obj, Todo) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in ('completed', 'todo_list_id', 'user_id')):
+            continue
+        _add(deltas, _value_before(state, 'todo_list_id'), _value_before(state, 'user_id'),
+             -1, -int(bool(_value_before(state, 'completed'))))
+        _add(deltas, obj.todo_list_id, obj.user_id, 1, int(bool(obj.completed)))
+
+    if deltas['lists'] or deltas['users']:
+        _apply(session.connection(), deltas['lists'], deltas['users'], skip_users)
+        session.info[_TOUCHED_KEY] = (set(deltas['lists']), set(deltas['users']))
+
+@event.listens_for(db.session, 'after_flush_postexec')
+def _expire_counters(session, flush_context):
+    # Loaded lists and stats rows no longer match the database
+    touched_lists, touched_users = session.info.pop(_TOUCHED_KEY, (set(), set()))
+    for obj in list(session.identity_map.values()):
+        # The identity, not the attribute, which may be expired and its row gone
+        key = inspect(obj).identity[0]
+        if (isinstance(obj, TodoList) and key in touched_lists) or \
+                (isinstance(obj, UserStats) and key in touched_users):
+            session.expire(obj, ['todo_count', 'completed_count'])
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    # A failed flush never reaches after_flush; drop what it collected
+    for key in (_PENDING_KEY, _SKIP_USERS_KEY, _TOUCHED_KEY):
+        session.info.pop(key, None)
+
+@click.command('recount-stats')
+@with_appcontext
+def recount_stats_command():
+    """Rebuild list and user todo counters from the todos table."""
+    total_col, completed_col = _count_columns()
+
+    list_counts = db.session.query(Todo.todo_list_id, total_col, completed_col).filter(
+        Todo.todo_list_id.isnot(None)
+    ).group_by(Todo.todo_list_id).all()
+    db.session.query(TodoList).update({'todo_count': 0, 'completed_count': 0}, synchronize_session=False)
+    for list_id, total, completed in list_counts:
+        db.session.query(TodoList).filter_by(id=list_id).update(
+            {'todo_count': total, 'completed_count': completed}, synchronize_session=False
+        )
+
+    user_counts = {
+        user_id: (total, completed) for user_id, total, completed in
+        db.session.query(Todo.user_id, total_col, completed_col).group_by(Todo.user_id)
+    }
+    # Existing rows are updated in place so their change_seq keeps counting up
+    existing = {row.user_id for row in db.session.query(UserStats.user_id)}
+    user_ids = [row.id for row in db.session.query(User.id)]
+    updates, inserts = [], []
+    for user_id in user_ids:
+        total, completed = user_counts.get(user_id, (0, 0))
+        row = {'user_id': user_id, 'todo_count': total, 'completed_count': completed}
+        (updates if user_id in existing else inserts).append(row)
+    if updates:
+        db.session.execute(update(UserStats), updates)
+    if inserts:
+        db.session.execute(UserStats.__table__.insert(), inserts)
+    db.session.commit()
+
+    logger.info(f"Recounted stats for {len(list_counts)} lists and {len(user_ids)} users")
+    click.echo(f'Recounted {len(list_counts)} non-empty lists and {len(user_ids)} users')
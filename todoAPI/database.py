@@ -0,0 +1,209 @@
+"""
+Engine configuration applied in create_app.
+
+Pooled engines use InstrumentedQueuePool, sized from DB_POOL_SIZE,
+DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and DB_POOL_PRE_PING, and
+record checkout wait, saturation and connection churn for GET /admin/db/pool.
+
+SQLite connections get a pragma profile (WAL, relaxed fsync, larger page
+cache, mmap) so readers are not blocked by the writer and each commit does not
+wait for a full fsync. Every pragma can be overridden with an environment
+variable named SQLITE_<PRAGMA> (e.g. SQLITE_SYNCHRONOUS=FULL); an empty value
+leaves SQLite's own default in place.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from logging_config import logger
+
+SQLITE_PRAGMA_DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': '5000',        # ms to wait for the write lock instead of failing
+    'cache_size': '-20000',        # negative values are KiB, so ~20 MB per connection
+    'mmap_size': '268435456',      # 256 MB
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+def sqlite_pragmas_from_env():
+    """The pragma profile with any SQLITE_<PRAGMA> environment overrides applied"""
+    pragmas = {}
+    for name, default in SQLITE_PRAGMA_DEFAULTS.items():
+        value = os.environ.get(f'SQLITE_{name.upper()}', default).strip()
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the pragmas on every new DBAPI connection the engine opens"""
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+def active_sqlite_pragmas(engine, names):
+    """Read back the pragma values a connection from the engine actually uses"""
+    with engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in names
+        }
+
+def configure_engines(app, db):
+    """Apply per-dialect settings to every engine Flask-SQLAlchemy created"""
+    pragmas = app.config['SQLITE_PRAGMAS']
+    for bind_key, engine in db.engines.items():
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics.attach(engine)
+        if engine.dialect.name != 'sqlite':
+            continue
+        name = bind_key or 'default'
+        if pragmas:
+            apply_sqlite_pragmas(engine, pragmas)
+            active = active_sqlite_pragmas(engine, pragmas)
+            logger.info(f"SQLite profile for {name} engine ({engine.url.database}): "
+                        + ', '.join(f'{key}={value}' for key, value in active.items()))
+        # Deleting a user or list relies on ON DELETE CASCADE for their rows
+        if not active_sqlite_pragmas(engine, ['foreign_keys'])['foreign_keys']:
+            logger.warning(f"SQLite foreign_keys is off for {name} engine; deleted users "
+                           "and lists will leave their todos behind")
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('true', '1', 'yes')
+
+def engine_options_from_env(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy gives in-memory databases a single static connection
+        return {}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server connections can be dropped by the server, proxies or failovers
+        options['pool_pre_ping'] = _env_bool('DB_POOL_PRE_PING', True)
+        options['pool_recycle'] = _env_int('DB_POOL_RECYCLE', 1800)
+    return options
+
+class PoolMetrics:
+    """Checkout wait, saturation and connection churn for one pool"""
+
+    SLOW_CHECKOUT_SECONDS = 0.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, seconds, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if seconds >= self.SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def attach(self, engine):
+        """Count physical connection churn through pool events"""
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(engine, 'close')
+        def on_close(dbapi_connection, connection_record):
+            with self._lock:
+                self.closes += 1
+
+        @event.listens_for(engine, 'invalidate')
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            data = {
+                'checkouts': self.checkouts,
+                'checkout_wait_ms': {
+                    'avg': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                    'max': round(self.wait_max * 1000, 3),
+                },
+                'slow_checkouts': self.slow_checkouts,
+                'timeouts': self.timeouts,
+                'connections_opened': self.connects,
+                'connections_closed': self.closes,
+                'invalidations': self.invalidations,
+                'peak_checked_out': self.peak_checked_out,
+            }
+        data['pool'] = pool.status()
+        if isinstance(pool, InstrumentedQueuePool):
+            checked_out = pool.checkedout()
+            data.update({
+                'size': pool.size(),
+                'checked_out': checked_out,
+                'overflow': pool.overflow(),
+                'capacity': pool.capacity,
+                'saturation': round(checked_out / pool.capacity, 3) if pool.capacity else None,
+            })
+        return data
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.capacity = kwargs.get('pool_size', 5) + max(kwargs.get('max_overflow', 10), 0)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def pool_metrics(engine):
+    """Metrics for an engine's pool, or None if it is not instrumented"""
+    metrics = getattr(engine.pool, 'metrics', None)
+    return metrics.snapshot(engine.pool) if metrics else None
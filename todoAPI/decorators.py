@@ -1,14 +1,15 @@
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from models import User
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from principals import load_principal
 
 def token_required(f):
+    """Pass the caller's principal (id, role, is_active) to the view as current_user"""
     @wraps(f)
     @jwt_required()
     def decorated(*args, **kwargs):
         user_id = get_jwt_identity()
-        current_user = User.query.filter_by(id=user_id).first()
+        current_user = load_principal(user_id)
         if not current_user:
             return jsonify({"message": "User not found!"}), 404
         return f(current_user, *args, **kwargs)
@@ -19,9 +20,13 @@ def role_required(role):
         @wraps(f)
         @jwt_required()
         def decorated_function(*args, **kwargs):
-            user_id = get_jwt_identity()
-            current_user = User.query.filter_by(id=user_id).first()
-            if not current_user or current_user.role.value != role:
+            if current_app.config['AUTHZ_FROM_CLAIMS']:
+                # The token's epoch has been checked, so its role is current
+                allowed = get_jwt().get('role') == role
+            else:
+                current_user = load_principal(get_jwt_identity())
+                allowed = current_user is not None and current_user.role.value == role
+            if not allowed:
                 return jsonify({"error": "Admins only!"}), 403
             return f(*args, **kwargs)
         return decorated_function
@@ -11,6 +11,7 @@ def setup_logging():
     # Create a logger
     logger = logging.getLogger('todo_api')
     logger.setLevel(logging.DEBUG)  # Set the lowest level to capture all messages
+    logger.propagate = False  # Handlers below are the only output; avoid duplicates via root
 
     # Create a file handler for logging to a file
     file_handler = RotatingFileHandler(
@@ -13,7 +13,8 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# Keep the application's loggers enabled when migrations run inside create_app.
+fileConfig(config.config_file_name, disable_existing_loggers=False)
 logger = logging.getLogger('alembic.env')
 
 load_dotenv()
@@ -41,6 +42,11 @@ def get_metadata():
     return target_metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # The todos_fts search table and its shadow tables are managed by hand in 0004
+    return not (type_ == 'table' and reflected and name.startswith('todos_fts'))
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -55,7 +61,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -80,6 +87,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""composite indexes for todo list, user and stats queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_todolists_user_id', 'todolists', ['user_id'], if_not_exists=True)
+    op.create_index('ix_todos_list_order', 'todos', ['todo_list_id', 'order'], if_not_exists=True)
+    op.create_index('ix_todos_user_order', 'todos', ['user_id', 'order'], if_not_exists=True)
+    op.create_index('ix_todos_user_completed', 'todos', ['user_id', 'completed'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_todos_user_completed', table_name='todos')
+    op.drop_index('ix_todos_user_order', table_name='todos')
+    op.drop_index('ix_todos_list_order', table_name='todos')
+    op.drop_index('ix_todolists_user_id', table_name='todolists')
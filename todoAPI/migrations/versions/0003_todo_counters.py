@@ -0,0 +1,53 @@
+"""denormalized todo counters on todolists and user_stats
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('todolists') as batch_op:
+        batch_op.add_column(sa.Column('todo_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('todo_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    # Backfill from the existing todos
+    op.execute(
+        'UPDATE todolists SET '
+        'todo_count = (SELECT COUNT(*) FROM todos WHERE todos.todo_list_id = todolists.id), '
+        'completed_count = (SELECT COUNT(*) FROM todos WHERE todos.todo_list_id = todolists.id '
+        'AND todos.completed = true)'
+    )
+    op.execute(
+        'INSERT INTO user_stats (user_id, todo_count, completed_count) '
+        'SELECT users.id, '
+        '(SELECT COUNT(*) FROM todos WHERE todos.user_id = users.id), '
+        '(SELECT COUNT(*) FROM todos WHERE todos.user_id = users.id AND todos.completed = true) '
+        'FROM users'
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
+    with op.batch_alter_table('todolists') as batch_op:
+        batch_op.drop_column('completed_count')
+        batch_op.drop_column('todo_count')
@@ -0,0 +1,57 @@
+"""per-user change sequence and tombstones for delta sync
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than batch mode: rebuilding todos on SQLite would
+    # drop the full-text search triggers from 0004
+    op.add_column('user_stats', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('todolists', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('todos', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_index('ix_todolists_user_change_seq', 'todolists', ['user_id', 'change_seq'])
+    # Covered by the new index's leading column
+    op.drop_index('ix_todolists_user_id', table_name='todolists')
+    op.create_index('ix_todos_user_change_seq', 'todos', ['user_id', 'change_seq'])
+
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_tombstones_user_change_seq', 'tombstones', ['user_id', 'change_seq'])
+    op.create_index('ix_tombstones_deleted_at', 'tombstones', ['deleted_at'])
+
+
+def downgrade():
+    op.drop_index('ix_tombstones_deleted_at', table_name='tombstones')
+    op.drop_index('ix_tombstones_user_change_seq', table_name='tombstones')
+    op.drop_table('tombstones')
+
+    op.drop_index('ix_todos_user_change_seq', table_name='todos')
+    op.create_index('ix_todolists_user_id', 'todolists', ['user_id'])
+    op.drop_index('ix_todolists_user_change_seq', table_name='todolists')
+    # Needs SQLite 3.35+ for ALTER TABLE ... DROP COLUMN
+    op.drop_column('todos', 'change_seq')
+    op.drop_column('todolists', 'change_seq')
+    op.drop_column('user_stats', 'change_seq')
@@ -0,0 +1,27 @@
+"""indexes for the admin user listing filters
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_role_id', 'users', ['role', 'id'])
+    op.create_index('ix_users_active_id', 'users', ['is_active', 'id'])
+    op.create_index('ix_users_created_at', 'users', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at', table_name='users')
+    op.drop_index('ix_users_active_id', table_name='users')
+    op.drop_index('ix_users_role_id', table_name='users')
@@ -0,0 +1,79 @@
+"""ON DELETE CASCADE on every foreign key to users and todolists
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, referred table); every key refers to the referred table's id
+FOREIGN_KEYS = [
+    ('password_reset_tokens', 'user_id', 'users'),
+    ('todolists', 'user_id', 'users'),
+    ('todos', 'user_id', 'users'),
+    ('todos', 'todo_list_id', 'todolists'),
+    ('user_stats', 'user_id', 'users'),
+    ('tombstones', 'user_id', 'users'),
+]
+
+# SQLite foreign keys are unnamed; batch mode names the reflected ones with
+# this convention so they can be dropped
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# Rebuilding todos on SQLite drops the search index triggers from 0004
+SQLITE_FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO todos_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+
+def _set_ondelete(ondelete):
+    # On SQLite each table is rebuilt (create, copy, drop, rename). The
+    # migration connection does not enable foreign_keys, so dropping the old
+    # tables neither checks nor cascades. Row IDs are kept, so the todos_fts
+    # index stays valid.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = {}
+    for table, column, referred in FOREIGN_KEYS:
+        tables.setdefault(table, []).append((column, referred))
+
+    for table, keys in tables.items():
+        names = {fk['constrained_columns'][0]: fk['name'] for fk in inspector.get_foreign_keys(table)}
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred in keys:
+                name = f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(names.get(column) or name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    _set_ondelete('CASCADE')
+
+
+def downgrade():
+    _set_ondelete(None)
@@ -0,0 +1,45 @@
+"""hidden users and lists, and background purge jobs
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('todolists', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'purge_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('purged', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_purge_jobs_status', 'purge_jobs', ['status', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_purge_jobs_status', table_name='purge_jobs')
+    op.drop_table('purge_jobs')
+    op.drop_column('todolists', 'deleted_at')
+    op.drop_column('users', 'deleted_at')
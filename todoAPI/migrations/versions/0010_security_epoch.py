@@ -0,0 +1,26 @@
+"""per-user security epoch for revoking issued tokens
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('security_epoch', sa.BigInteger(), nullable=False, server_default='0'))
+    op.create_index('ix_users_security_epoch', 'users', ['security_epoch'])
+
+
+def downgrade():
+    op.drop_index('ix_users_security_epoch', table_name='users')
+    op.drop_column('users', 'security_epoch')
@@ -0,0 +1,27 @@
+"""leases on purge jobs, so concurrent workers never run the same job
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('purge_jobs', sa.Column('owner', sa.String(length=128), nullable=True))
+    op.add_column('purge_jobs', sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('purge_jobs') as batch_op:
+        batch_op.drop_column('lease_until')
+        batch_op.drop_column('owner')
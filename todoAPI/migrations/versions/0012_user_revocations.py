@@ -0,0 +1,32 @@
+"""final security epochs of deleted users
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user_revocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('security_epoch', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_user_revocations_security_epoch', 'user_revocations', ['security_epoch'])
+
+
+def downgrade():
+    op.drop_index('ix_user_revocations_security_epoch', table_name='user_revocations')
+    op.drop_table('user_revocations')
@@ -2,8 +2,18 @@ import enum
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def stats_dict(total, completed):
+    """Todo statistics from a total and completed count"""
+    return {
+        'total': total,
+        'completed': completed,
+        'pending': total - completed,
+        'completion_rate': round((completed / total * 100), 2) if total > 0 else 0
+    }
 
 class UserRole(enum.Enum):
     USER = 'user'
@@ -12,6 +22,14 @@ class UserRole(enum.Enum):
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Admin user listing: each filter reads its matches in id (cursor) order
+        db.Index('ix_users_role_id', 'role', 'id'),
+        db.Index('ix_users_active_id', 'is_active', 'id'),
+        db.Index('ix_users_created_at', 'created_at'),
+        # Each process reloads the recently bumped security epochs
+        db.Index('ix_users_security_epoch', 'security_epoch'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -20,10 +38,19 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     role = db.Column(db.Enum(UserRole), nullable=False, default=UserRole.USER)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
+    # Set when the user is hidden pending a background purge (purge.py)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    # Tokens carrying an older epoch are rejected (principals.py)
+    security_epoch = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     
-    # Relationships
-    todo_lists = db.relationship('TodoList', backref='user', lazy=True, cascade='all, delete-orphan')
-    todos = db.relationship('Todo', backref='user', lazy=True, cascade='all, delete-orphan')
+    # Relationships. Child rows are removed by ON DELETE CASCADE in the database
+    # rather than loaded and deleted one by one (passive_deletes)
+    todo_lists = db.relationship('TodoList', backref='user', lazy=True, cascade='all, delete-orphan',
+                                 passive_deletes=True)
+    todos = db.relationship('Todo', backref='user', lazy=True, cascade='all, delete-orphan',
+                            passive_deletes=True)
+    stats = db.relationship('UserStats', uselist=False, lazy=True, cascade='all, delete-orphan',
+                            passive_deletes=True)
     
     def set_password(self, password):
         """Hash and set the user's password"""
@@ -44,29 +71,58 @@ class User(db.Model):
             'is_active': self.is_active
         }
 
+class UserStats(db.Model):
+    """Per-user todo counters (counters.py) and change sequence (sync.py)"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    todo_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Last change sequence handed out to this user's lists and todos
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        """Convert counters to the /todos/stats response shape"""
+        return stats_dict(self.todo_count, self.completed_count)
+
 class PasswordResetToken(db.Model):
     __tablename__ = 'password_reset_tokens'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     token = db.Column(db.String(128), unique=True, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
 
-    user = db.relationship('User')
+    user = db.relationship('User', backref=db.backref('reset_tokens', lazy=True, cascade='all, delete-orphan',
+                                                      passive_deletes=True))
 
     def is_expired(self):
         return datetime.utcnow() > self.expires_at
 
 class TodoList(db.Model):
     __tablename__ = 'todolists'
+    __table_args__ = (
+        # Also serves lookups by user_id alone
+        db.Index('ix_todolists_user_change_seq', 'user_id', 'change_seq'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized counters, kept in step with the todos table by counters.py
+    todo_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Owner's change sequence at the last write, for GET /sync
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Owner's change sequence at the last write to the list or any of its todos, for ETags
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set when the list is hidden pending a background purge (purge.py)
+    deleted_at = db.Column(db.DateTime, nullable=True)
 
     # Relationship to Todos
-    todos = db.relationship('Todo', backref='todo_list', lazy=True, cascade='all, delete-orphan')
+    todos = db.relationship('Todo', backref='todo_list', lazy=True, cascade='all, delete-orphan',
+                            passive_deletes=True, order_by='(Todo.order, Todo.id)')
 
     def to_dict(self):
         """Convert todolist object to dictionary"""
@@ -78,18 +134,51 @@ class TodoList(db.Model):
             'todos': [todo.to_dict() for todo in self.todos]
         }
 
+    def to_summary_dict(self):
+        """Convert todolist object to dictionary with counts instead of todos"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat(),
+            'todo_count': self.todo_count,
+            'completed_count': self.completed_count
+        }
+
+    def stats_dict(self):
+        """Convert counters to the same shape as /todos/stats"""
+        return stats_dict(self.todo_count, self.completed_count)
+
+    def to_sync_dict(self):
+        """Convert todolist object to dictionary without todos or counters, which sync separately"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat()
+        }
+
 class Todo(db.Model):
     __tablename__ = 'todos'
+    __table_args__ = (
+        # Hot paths: list views ordered by position, per-user views and stats
+        db.Index('ix_todos_list_order', 'todo_list_id', 'order'),
+        db.Index('ix_todos_user_order', 'user_id', 'order'),
+        db.Index('ix_todos_user_completed', 'user_id', 'completed'),
+        db.Index('ix_todos_user_change_seq', 'user_id', 'change_seq'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    todo_list_id = db.Column(db.Integer, db.ForeignKey('todolists.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    todo_list_id = db.Column(db.Integer, db.ForeignKey('todolists.id', ondelete='CASCADE'), nullable=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     completed = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     order = db.Column(db.Integer, nullable=False, default=0)
+    # Owner's change sequence at the last write, for GET /sync
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def to_dict(self):
         """Convert todo object to dictionary"""
@@ -104,3 +193,82 @@ class Todo(db.Model):
             'updated_at': self.updated_at.isoformat(),
             'order': self.order
         }
+
+class Tombstone(db.Model):
+    """A deleted list or todo, kept for the sync retention window so /sync can report it"""
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_user_change_seq', 'user_id', 'change_seq'),
+        db.Index('ix_tombstones_deleted_at', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity = db.Column(db.String(16), nullable=False)  # 'todo' or 'todolist'
+    entity_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('tombstones', lazy=True, cascade='all, delete-orphan',
+                                                      passive_deletes=True))
+
+class PurgeJob(db.Model):
+    """A user or todo list being deleted in the background by purge.py"""
+    __tablename__ = 'purge_jobs'
+    __table_args__ = (
+        # The worker takes the oldest unfinished job
+        db.Index('ix_purge_jobs_status', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(16), nullable=False)  # 'user' or 'todolist'
+    entity_id = db.Column(db.Integer, nullable=False)
+    # Owner of the deleted rows; not a foreign key, as the job outlives a purged user
+    user_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, running, done, failed
+    # Todos to delete, from the counters when the job was queued, and todos deleted so far
+    total = db.Column(db.Integer, nullable=False, default=0)
+    purged = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    # The worker running a chunk of the job, until lease_until (purge.py)
+    owner = db.Column(db.String(128), nullable=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        """Convert purge job to dictionary, with progress as a percentage of the todos"""
+        if self.status == 'done':
+            progress = 100.0
+        else:
+            progress = round(min(self.purged / self.total, 1) * 100, 2) if self.total else 0.0
+        return {
+            'id': self.id,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'total': self.total,
+            'purged': self.purged,
+            'progress': progress,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class UserRevocation(db.Model):
+    """The final security epoch of a deleted user, so their tokens stay revoked once the row is gone"""
+    __tablename__ = 'user_revocations'
+    __table_args__ = (
+        # Loaded with the recently bumped epochs (principals.py)
+        db.Index('ix_user_revocations_security_epoch', 'security_epoch'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key, as the revocation outlives the user
+    user_id = db.Column(db.Integer, nullable=False)
+    security_epoch = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,172 @@
+"""
+Sparse ordering for Todo.order.
+
+Order keys are spaced ORDER_GAP apart, so appending, inserting between two
+todos and moving one todo only write the todo being placed. When two
+neighbours run out of room the scope is renumbered once and placement carries
+on; `flask rebalance-orders` does the same ahead of time for every list, and
+for each user's todos that are in no list.
+
+A scope is a filter on Todo: todos in one list, or all of a user's todos for
+the simple /todos endpoints.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, tuple_, update
+from models import db, Todo
+from sync import next_change_seq, touch_lists
+from logging_config import logger
+
+ORDER_GAP = 1024
+
+# Keeps CASE ... WHEN statements under SQLite's bound parameter limit
+REORDER_CHUNK_SIZE = 2000
+
+class PlacementError(ValueError):
+    """Raised when a todo cannot be placed next to the requested neighbour"""
+
+def list_scope(list_id):
+    return Todo.todo_list_id == list_id
+
+def user_scope(user_id):
+    return Todo.user_id == user_id
+
+def unlisted_scope(user_id):
+    """A user's todos that are in no list"""
+    return db.and_(Todo.user_id == user_id, Todo.todo_list_id.is_(None))
+
+def tail_order(scope):
+    """Highest order key in a scope, or None if it is empty (an index seek, not an aggregate)"""
+    return db.session.query(Todo.order).filter(scope).order_by(Todo.order.desc()).limit(1).scalar()
+
+def append_order(scope):
+    """Order key that places a todo after every other todo in the scope"""
+    last = tail_order(scope)
+    return ORDER_GAP if last is None else last + ORDER_GAP
+
+def key_between(lower, upper):
+    """
+    Order key strictly between two neighbouring keys, either of which may be
+    None for the ends of the scope. Returns None when there is no room left.
+    """
+    if lower is None and upper is None:
+        return ORDER_GAP
+    if lower is None:
+        return upper - ORDER_GAP
+    if upper is None:
+        return lower + ORDER_GAP
+    if upper - lower < 2:
+        return None
+    return (lower + upper) // 2
+
+def rebalance(scope):
+    """Renumber a scope ORDER_GAP apart, keeping the current (order, id) sequence"""
+    rows = db.session.query(Todo.id, Todo.user_id).filter(scope).order_by(Todo.order, Todo.id).all()
+    if rows:
+        seqs = {user_id: next_change_seq(user_id) for user_id in sorted({row.user_id for row in rows})}
+        db.session.execute(
+            update(Todo),
+            [{'id': row.id, 'order': (index + 1) * ORDER_GAP, 'change_seq': seqs[row.user_id]}
+             for index, row in enumerate(rows)]
+        )
+        for user_id, seq in seqs.items():
+            touch_lists(seq, scope, Todo.user_id == user_id)
+    logger.info(f"Rebalanced order keys for {len(rows)} todos")
+    return len(rows)
+
+def gapped_orders(count):
+    """Order keys for `count` todos laid out from scratch, e.g. after a full reorder"""
+    return [(index + 1) * ORDER_GAP for index in range(count)]
+
+def apply_order(scope, ordered_ids, change_seq):
+    """
+    Give `ordered_ids` gapped order keys with set-based UPDATEs that only match
+    todos inside the scope, so ownership is checked by the same statement.
+    The rows are stamped with `change_seq` from sync.next_change_seq.
+    Returns the number of todos updated.
+    """
+    keys = dict(zip(ordered_ids, gapped_orders(len(ordered_ids))))
+    updated = 0
+    for start in range(0, len(ordered_ids), REORDER_CHUNK_SIZE):
+        chunk = ordered_ids[start:start + REORDER_CHUNK_SIZE]
+        stmt = update(Todo).where(scope, Todo.id.in_(chunk)).values(
+            order=case({todo_id: keys[todo_id] for todo_id in chunk}, value=Todo.id),
+            change_seq=change_seq
+        ).execution_options(synchronize_session=False)
+        updated += db.session.execute(stmt).rowcount
+    touch_lists(change_seq, scope, Todo.change_seq == change_seq)
+    return updated
+
+def _neighbour_key(scope, anchor, exclude_id, after):
+    """Order key of the todo next to `anchor` (or the scope's first/last todo when anchor is None)"""
+    query = db.session.query(Todo.order).filter(scope, Todo.id != exclude_id)
+    if anchor is not None:
+        position = tuple_(Todo.order, Todo.id)
+        anchor_position = tuple_(anchor.order, anchor.id)
+        query = query.filter(position > anchor_position if after else position < anchor_position)
+    if after:
+        query = query.order_by(Todo.order.asc(), Todo.id.asc())
+    else:
+        query = query.order_by(Todo.order.desc(), Todo.id.desc())
+    return query.limit(1).scalar()
+
+def _placement_key(todo, scope, anchor_id, after):
+    anchor = None
+    if anchor_id is not None:
+        anchor = db.session.query(Todo.id, Todo.order).filter(scope, Todo.id == anchor_id).first()
+        if anchor is None:
+            raise PlacementError('Neighbour todo not found')
+
+    if after:
+        # after_id=None places the todo first
+        lower = anchor.order if anchor else None
+        upper = _neighbour_key(scope, anchor, todo.id, after=True)
+    else:
+        # before_id=None places the todo last
+        lower = _neighbour_key(scope, anchor, todo.id, after=False)
+        upper = anchor.order if anchor else None
+    return key_between(lower, upper)
+
+def move_todo(todo, scope, anchor_id, after):
+    """
+    Place one todo directly after (or before) the todo `anchor_id`. Only the
+    moved todo is written unless its neighbours have run out of room.
+    """
+    if anchor_id == todo.id:
+        raise PlacementError('A todo cannot be placed next to itself')
+
+    key = _placement_key(todo, scope, anchor_id, after)
+    if key is None:
+        rebalance(scope)
+        key = _placement_key(todo, scope, anchor_id, after)
+    todo.order = key
+    return key
+
+@click.command('rebalance-orders')
+@click.option('--min-gap', default=2, show_default=True,
+              help='Rebalance lists where two neighbours are closer than this.')
+@with_appcontext
+def rebalance_orders_command(min_gap):
+    """Respace todo order keys in lists, and users' unlisted todos, that are running out of room."""
+    from models import TodoList
+
+    # Each list is a scope, and so are each user's todos outside any list
+    unlisted_user = case((Todo.todo_list_id.is_(None), Todo.user_id))
+    gap = db.func.lead(Todo.order).over(
+        partition_by=(Todo.todo_list_id, unlisted_user), order_by=(Todo.order, Todo.id)
+    ) - Todo.order
+    gaps = db.session.query(
+        Todo.todo_list_id.label('list_id'), unlisted_user.label('user_id'), gap.label('gap')
+    ).subquery()
+    crowded = db.session.query(gaps.c.list_id, gaps.c.user_id).filter(gaps.c.gap < min_gap).distinct().all()
+
+    lists = users = 0
+    for list_id, user_id in crowded:
+        if list_id is not None:
+            rebalance(list_scope(list_id))
+            lists += 1
+        else:
+            rebalance(unlisted_scope(user_id))
+            users += 1
+        db.session.commit()
+    click.echo(f"Rebalanced {lists} of {TodoList.query.count()} lists and {users} users' unlisted todos")
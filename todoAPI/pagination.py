@@ -0,0 +1,87 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+MAX_PAGE_SIZE = 500
+
+# JSON types a cursor value may have for each Python type of a sort key
+CURSOR_JSON_TYPES = {int: (int,), float: (int, float), str: (str,)}
+
+class PaginationError(ValueError):
+    """Raised when the limit or cursor query parameters are invalid"""
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values],
+                     separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _cursor_value(value, python_type):
+    if python_type is datetime and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    # bool is an int subclass, but true/false are never valid keys
+    elif not isinstance(value, bool) and isinstance(value, CURSOR_JSON_TYPES.get(python_type, ())):
+        return value
+    raise PaginationError('Invalid cursor')
+
+def decode_cursor(cursor, types):
+    """
+    Decode a cursor produced by encode_cursor back into its sort key.
+    `types` are the Python types of the key's columns; every value is checked
+    against its column before it can reach a query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types):
+        raise PaginationError('Invalid cursor')
+    return [_cursor_value(value, python_type) for value, python_type in zip(values, types)]
+
+def get_page_args(args, default_limit=None):
+    """
+    Read `limit` and `cursor` from the request args.
+    Returns (None, None) when the client did not ask for pagination, unless
+    the endpoint always pages with `default_limit`.
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    if limit is None:
+        if default_limit is not None:
+            return default_limit, cursor
+        if cursor is not None:
+            raise PaginationError('cursor requires limit')
+        return None, None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise PaginationError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit, cursor
+
+def paginate(query, keys, limit, cursor):
+    """
+    Apply keyset pagination to a query.
+
+    `keys` are the model columns the page is ordered by (the last one must be
+    unique, e.g. the primary key). Returns (items, next_cursor); next_cursor is
+    None on the last page.
+    """
+    if cursor is not None:
+        after = decode_cursor(cursor, [key.type.python_type for key in keys])
+        query = query.filter(tuple_(*keys) > tuple_(*after))
+
+    items = query.order_by(*[key.asc() for key in keys]).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], key.key) for key in keys)
+    return items, next_cursor
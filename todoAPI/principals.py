@@ -0,0 +1,195 @@
+"""
+Per-process cache of authenticated principals, and token revocation.
+
+token_required and role_required need the caller's id, role and is_active on
+every request. They read them from a bounded LRU cache whose entries expire
+after PRINCIPAL_CACHE_TTL seconds, instead of querying users each time.
+
+Writes that change a user's role or is_active, delete the user or reset
+their password call `invalidate_principal` once they have committed. The
+cache lives in one process, so other processes see the change when their
+entry expires. Hit rates are reported at GET /admin/cache/principals.
+PRINCIPAL_CACHE_SIZE=0 turns the cache off.
+
+Each user has a security epoch, bumped when their role changes, when they are
+deactivated and when their password is reset. Tokens carry the epoch they
+were issued under, and a token with an older epoch is rejected. So demotion
+and deactivation revoke existing tokens, and with AUTHZ_FROM_CLAIMS=true
+role_required can trust the token's role claim instead of looking the user
+up. Only epochs bumped within the token lifetime can reject a token that has
+not expired anyway. Each process keeps just those epochs in memory and
+reloads them every SECURITY_EPOCH_REFRESH_SECONDS with two indexed queries, so
+a change made in another process takes effect within that interval. That
+query always goes to the primary, even in @replica_read views, so a lagging
+replica cannot bring a revoked token back. A deleted user's final epoch is
+kept in user_revocations for the token lifetime, so their tokens stay
+revoked after the row is gone.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select
+from models import db, User, UserRevocation
+
+Principal = namedtuple('Principal', ['id', 'role', 'is_active'])
+
+class PrincipalCache:
+    """Thread-safe LRU cache of principals by user ID, each entry valid for `ttl` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, user_id):
+        """The cached principal, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                principal, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return principal
+                del self._entries[user_id]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, principal):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        """Size, hit rate and eviction counts since the process started"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+class SecurityEpochs:
+    """The security epochs bumped within the token lifetime, by user ID, reloaded every `refresh` seconds"""
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self._epochs = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def current(self, user_id):
+        """The user's epoch; 0 if it has not changed within the token lifetime"""
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh
+        if stale:
+            self.reload()
+        with self._lock:
+            return self._epochs.get(user_id, 0)
+
+    def reload(self):
+        oldest = oldest_live_epoch()
+        # On its own primary connection, not the request's session, which may
+        # read from the replica; Core queries also see hidden users
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(User.id, User.security_epoch).where(User.security_epoch >= oldest)
+            ).all()
+            rows += connection.execute(
+                select(UserRevocation.user_id, UserRevocation.security_epoch)
+                .where(UserRevocation.security_epoch >= oldest)
+            ).all()
+        epochs = {}
+        for user_id, epoch in rows:
+            epochs[user_id] = max(epoch, epochs.get(user_id, 0))
+        with self._lock:
+            self._epochs = epochs
+            self._loaded_at = time.monotonic()
+
+    def expire(self):
+        """Reload at the next lookup"""
+        with self._lock:
+            self._loaded_at = None
+
+def oldest_live_epoch():
+    """The oldest epoch that can still revoke an unexpired token"""
+    lifetime = current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    # Tokens that never expire can be revoked by any bump
+    return int(time.time() - lifetime.total_seconds()) if isinstance(lifetime, timedelta) else 1
+
+def init_principal_cache(app):
+    app.extensions['principal_cache'] = PrincipalCache(
+        app.config['PRINCIPAL_CACHE_SIZE'], app.config['PRINCIPAL_CACHE_TTL']
+    )
+    app.extensions['security_epochs'] = SecurityEpochs(app.config['SECURITY_EPOCH_REFRESH_SECONDS'])
+
+def principal_cache():
+    return current_app.extensions['principal_cache']
+
+def load_principal(user_id):
+    """The principal for a JWT identity, from the cache or the users table; None if there is no such user"""
+    user_id = int(user_id)
+    cache = principal_cache()
+    principal = cache.get(user_id)
+    if principal is None:
+        row = db.session.query(User.id, User.role, User.is_active).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        principal = Principal(*row)
+        cache.put(principal)
+    return principal
+
+def invalidate_principal(user_id):
+    """Drop a user's cached principal and epoch after a committed change to their account"""
+    principal_cache().invalidate(int(user_id))
+    current_app.extensions['security_epochs'].expire()
+
+def bump_security_epoch(user):
+    """Revoke every token issued to the user so far; the caller commits and then calls invalidate_principal"""
+    # A timestamp, so old epochs can be told apart, but always moving forward
+    user.security_epoch = max(int(time.time()), (user.security_epoch or 0) + 1)
+
+def revoke_deleted_user(user):
+    """Revoke the tokens of a user about to be deleted, in a way that outlives the row; the caller commits"""
+    bump_security_epoch(user)
+    db.session.add(UserRevocation(user_id=user.id, security_epoch=user.security_epoch))
+    # Older revocations can no longer match an unexpired token
+    db.session.query(UserRevocation).filter(
+        UserRevocation.security_epoch < oldest_live_epoch()
+    ).delete(synchronize_session=False)
+
+def clear_reused_revocation(user):
+    """Start a new user past the revocation of a deleted user whose ID they were given; the caller commits"""
+    if db.session.query(UserRevocation.id).filter_by(user_id=user.id).first() is not None:
+        bump_security_epoch(user)
+
+def token_claims(user):
+    """Claims for a new access token: the role for role_required and the epoch it is issued under"""
+    return {'role': user.role.value, 'epoch': user.security_epoch or 0}
+
+def token_revoked(jwt_payload):
+    """Whether a token was issued before its user's current security epoch"""
+    epochs = current_app.extensions['security_epochs']
+    return jwt_payload.get('epoch', 0) < epochs.current(int(jwt_payload['sub']))
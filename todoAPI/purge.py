@@ -0,0 +1,284 @@
+"""
+Background deletion of large users and todo lists.
+
+Deleting a user or list with many todos in one transaction holds SQLite's
+write lock for as long as the cascade takes and stalls every other writer.
+In async mode the request only hides the user or list (deleted_at) and
+queues a PurgeJob. A worker thread then deletes the rows in chunks of
+PURGE_CHUNK_SIZE and commits after each, so other writers get the lock
+between chunks.
+
+Hidden users and lists, and the todos of hidden lists, are left out of every
+ORM query by a do_orm_execute hook; pass the `include_deleted` execution
+option to see them. Hiding a list takes its todos off the owner's counters at
+once, so stats match what the user can see. Each chunk then leaves sync
+tombstones, like any set-based delete. A hidden user's rows are removed
+without either, as the counters and tombstones go with the user.
+
+Jobs live in the database and each chunk commits together with the job's
+progress, so a restarted worker carries on where the last one stopped.
+Before each chunk a worker leases its job with one conditional UPDATE, so
+any number of workers and `flask run-purges` processes can share the queue
+without running the same job at once; the lease of a worker that died runs
+out after PURGE_LEASE_SECONDS. A chunk that loses to another writer for the
+database lock is retried without counting as a failed attempt.
+
+Admins follow progress at GET /admin/purges. The worker thread is started by
+the `python app.py` server (unless PURGE_WORKER_ENABLED=false), never by
+create_app(), so WSGI servers and CLI commands do not each start one. There,
+`flask run-purges` runs queued jobs to completion.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, exists, or_, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import with_loader_criteria
+import counters
+from models import db, PurgeJob, Todo, TodoList, Tombstone, User, UserStats
+from ordering import list_scope
+from principals import revoke_deleted_user
+from sync import next_change_seq, record_deletes
+from todos import delete_todos
+from logging_config import logger
+
+PURGE_MODES = ('auto', 'sync', 'async')
+# Let other writers take the lock between chunks
+PURGE_CHUNK_PAUSE_SECONDS = 0.05
+# A chunk that fails this many times in a row marks its job failed
+PURGE_MAX_ATTEMPTS = 5
+# Far longer than a chunk takes; a dead worker's job is picked up after this
+PURGE_LEASE_SECONDS = 300
+ACTIVE_STATUSES = ('pending', 'running')
+
+class PurgeModeError(ValueError):
+    """Raised when a delete request asks for an unknown mode"""
+
+_lists = TodoList.__table__
+# On the table rather than the model, so the TodoList criteria below leave it alone
+_in_hidden_list = exists().where(_lists.c.id == Todo.todo_list_id, _lists.c.deleted_at.is_not(None))
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _hide_deleted(execute_state):
+    if execute_state.is_select and not execute_state.is_column_load \
+            and not execute_state.is_relationship_load \
+            and not execute_state.execution_options.get('include_deleted', False):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(User, User.deleted_at.is_(None), include_aliases=True),
+            with_loader_criteria(TodoList, TodoList.deleted_at.is_(None), include_aliases=True),
+            with_loader_criteria(Todo, ~_in_hidden_list, include_aliases=True),
+        )
+
+def purge_in_background(args, todo_count):
+    """Whether a delete request should hide and purge rather than delete at once"""
+    mode = args.get('mode', 'auto')
+    if mode not in PURGE_MODES:
+        raise PurgeModeError(f"mode must be one of: {', '.join(PURGE_MODES)}")
+    if mode == 'auto':
+        return todo_count >= current_app.config['PURGE_ASYNC_THRESHOLD']
+    return mode == 'async'
+
+def _queue(entity, entity_id, user_id, total):
+    job = PurgeJob(entity=entity, entity_id=entity_id, user_id=user_id, total=total, status='pending')
+    db.session.add(job)
+    db.session.flush()
+    logger.info(f"Queued purge job {job.id} for {entity} {entity_id} ({total} todos)")
+    return job
+
+def hide_todolist(todolist):
+    """Hide a list from its owner and queue its purge; the caller commits"""
+    seq = next_change_seq(todolist.user_id)
+    lists = TodoList.__table__
+    db.session.execute(lists.update().where(lists.c.id == todolist.id).values(
+        deleted_at=datetime.utcnow(), change_seq=seq, version=seq
+    ))
+    # Sync clients drop the list now; its todos follow chunk by chunk
+    record_deletes(todolist.user_id, 'todolist', [todolist.id], seq)
+    # The todos are hidden with the list; the chunks leave the counters alone
+    counters.adjust(todolist.user_id, total=-todolist.todo_count, completed=-todolist.completed_count)
+    return _queue('todolist', todolist.id, todolist.user_id, todolist.todo_count)
+
+def hide_user(user):
+    """Hide and deactivate a user and queue the purge of their data; the caller commits"""
+    user.deleted_at = datetime.utcnow()
+    user.is_active = False
+    # The user row goes at the end of the purge; the revocation stays
+    revoke_deleted_user(user)
+    stats = db.session.get(UserStats, user.id)
+    return _queue('user', user.id, user.id, stats.todo_count if stats else 0)
+
+def _delete_chunk(table, *criteria):
+    # Core statements: hidden rows are not filtered and no flush hooks run
+    chunk = select(table.c.id).where(*criteria).limit(current_app.config['PURGE_CHUNK_SIZE'])
+    return db.session.execute(table.delete().where(table.c.id.in_(chunk.scalar_subquery()))).rowcount
+
+def _purge_todolist_chunk(job):
+    chunk = select(Todo.id).where(list_scope(job.entity_id)).limit(current_app.config['PURGE_CHUNK_SIZE'])
+    deleted = delete_todos(job.entity_id, job.user_id, Todo.id.in_(chunk.scalar_subquery()), count=False)
+    job.purged = PurgeJob.purged + len(deleted)
+    if deleted:
+        return False
+    db.session.execute(TodoList.__table__.delete().where(TodoList.__table__.c.id == job.entity_id))
+    return True
+
+def _purge_user_chunk(job):
+    # Todos first, so the lists and the user row go without a large cascade
+    for table in (Todo.__table__, TodoList.__table__, Tombstone.__table__):
+        deleted = _delete_chunk(table, table.c.user_id == job.entity_id)
+        if deleted:
+            if table is Todo.__table__:
+                job.purged = PurgeJob.purged + deleted
+            return False
+    users = User.__table__
+    db.session.execute(users.delete().where(users.c.id == job.entity_id))
+    return True
+
+PURGERS = {
+    'todolist': _purge_todolist_chunk,
+    'user': _purge_user_chunk,
+}
+
+def _worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+def _lock_contention(error):
+    """Whether a database error means another writer held the lock, rather than a broken chunk"""
+    if not isinstance(error, OperationalError):
+        return False
+    # SQLite busy/locked; PostgreSQL serialization failure, deadlock and lock timeout
+    return getattr(error.orig, 'pgcode', None) in ('40001', '40P01', '55P03') \
+        or 'locked' in str(error.orig) or 'busy' in str(error.orig)
+
+def _claimable(now):
+    return PurgeJob.status.in_(ACTIVE_STATUSES), or_(PurgeJob.owner.is_(None), PurgeJob.lease_until < now)
+
+def _claim_job(owner):
+    """Lease the oldest unleased job to `owner` and commit; returns its ID, or None if there is none"""
+    now = datetime.utcnow()
+    job_id = db.session.query(PurgeJob.id).filter(*_claimable(now)).order_by(PurgeJob.id).limit(1).scalar()
+    if job_id is None:
+        return None
+    jobs = PurgeJob.__table__
+    # Only one worker's UPDATE can match while the job is unleased
+    claimed = db.session.execute(jobs.update().where(jobs.c.id == job_id, *_claimable(now)).values(
+        status='running', owner=owner, lease_until=now + timedelta(seconds=PURGE_LEASE_SECONDS)
+    )).rowcount
+    db.session.commit()
+    return job_id if claimed else None
+
+def _release_job(job_id, owner, **values):
+    jobs = PurgeJob.__table__
+    db.session.execute(jobs.update().where(jobs.c.id == job_id, jobs.c.owner == owner).values(
+        owner=None, lease_until=None, updated_at=datetime.utcnow(), **values
+    ))
+    db.session.commit()
+
+def purge_next_chunk():
+    """Purge one chunk of the oldest unleased job; returns False when no job is left to run"""
+    owner = _worker_name()
+    try:
+        job_id = _claim_job(owner)
+    except OperationalError as e:
+        db.session.rollback()
+        if not _lock_contention(e):
+            raise
+        # Another writer has the lock; try again on the next pass
+        return True
+    if job_id is None:
+        # Either nothing is queued or another worker lost the race for the same job
+        return db.session.query(PurgeJob.id).filter(*_claimable(datetime.utcnow())).first() is not None
+
+    db.session.expire_all()
+    job = db.session.get(PurgeJob, job_id)
+    try:
+        finished = PURGERS[job.entity](job)
+        job.status = 'done' if finished else 'running'
+        job.attempts = 0
+        job.owner = job.lease_until = None
+        if finished:
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if finished:
+            logger.info(f"Purge job {job_id} finished: {job.entity} {job.entity_id}, {job.purged} todos")
+    except Exception as e:
+        db.session.rollback()
+        if _lock_contention(e):
+            logger.warning(f"Purge job {job_id} chunk lost the database lock; retrying")
+            try:
+                _release_job(job_id, owner)
+            except OperationalError:
+                # The lease runs out by itself
+                db.session.rollback()
+            return True
+        _release_job(job_id, owner, attempts=PurgeJob.attempts + 1, error=str(e))
+        job = db.session.get(PurgeJob, job_id)
+        if job.attempts >= PURGE_MAX_ATTEMPTS:
+            job.status = 'failed'
+            db.session.commit()
+        logger.error(f"Purge job {job_id} failed (attempt {job.attempts}): {e}")
+    return True
+
+def run_purges():
+    """Run queued jobs until none is left; returns the number of chunks run"""
+    chunks = 0
+    while purge_next_chunk():
+        chunks += 1
+        time.sleep(PURGE_CHUNK_PAUSE_SECONDS)
+    return chunks
+
+class PurgeWorker:
+    """Daemon thread that runs an app's purge jobs"""
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='purge-worker', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wake(self):
+        """Start on newly queued jobs now rather than at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    run_purges()
+                except Exception as e:
+                    # E.g. the database is unreachable; try again at the next poll
+                    logger.error(f"Purge worker error: {e}")
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.app.config['PURGE_POLL_SECONDS'])
+            self._wake.clear()
+
+def init_purge_worker(app):
+    """Start the purge worker for this app unless PURGE_WORKER_ENABLED is off; call from the server entry point only"""
+    if not app.config['PURGE_WORKER_ENABLED']:
+        return
+    worker = PurgeWorker(app)
+    app.extensions['purge_worker'] = worker
+    # Jobs left by a previous process are picked up on the first pass
+    worker.start()
+
+def wake_purge_worker():
+    worker = current_app.extensions.get('purge_worker')
+    if worker is not None:
+        worker.wake()
+
+@click.command('run-purges')
+@with_appcontext
+def run_purges_command():
+    """Run queued background deletions to completion."""
+    chunks = run_purges()
+    failed = PurgeJob.query.filter_by(status='failed').count()
+
+    logger.info(f"Ran {chunks} purge chunks ({failed} failed jobs)")
+    click.echo(f'Ran {chunks} purge chunks; {failed} failed jobs')
@@ -0,0 +1,82 @@
+"""
+Read-replica routing.
+
+When REPLICA_DATABASE_URL is set it becomes the 'replica' bind. Views marked
+with @replica_read run their queries on it; everything else, and anything
+that flushes, uses the primary.
+
+Successful writes return an X-Read-Your-Writes token. Clients echo it back
+on later requests, and while it is younger than REPLICA_PIN_SECONDS their
+reads stay on the primary so they never see a replica that has not caught up
+with their own change yet.
+"""
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+REPLICA_BIND = 'replica'
+TOKEN_HEADER = 'X-Read-Your-Writes'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind when the request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('read_from_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def replica_read(f):
+    """Mark a view as safe to serve from the read replica"""
+    f.replica_read = True
+    return f
+
+def use_primary():
+    """Send the rest of this request's queries to the primary, e.g. before a read-then-write"""
+    if has_app_context():
+        g.read_from_replica = False
+
+def _serializer():
+    # Tokens only choose where reads go; signing stops clients pinning themselves forever
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'] or 'read-your-writes',
+                                  salt='read-your-writes')
+
+def _recently_wrote():
+    token = request.headers.get(TOKEN_HEADER)
+    if not token:
+        return False
+    try:
+        _serializer().loads(token, max_age=current_app.config['REPLICA_PIN_SECONDS'])
+    except BadSignature:
+        # Covers expired tokens too
+        return False
+    return True
+
+def replica_binds_from_env(replica_url, engine_options):
+    """SQLALCHEMY_BINDS entry for the replica, with the same pool options as the primary"""
+    if not replica_url:
+        return {}
+    return {REPLICA_BIND: {'url': replica_url, **engine_options}}
+
+def init_routing(app):
+    """Register the hooks that choose a bind per request and hand out tokens"""
+    @app.before_request
+    def choose_bind():
+        if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+            return
+        view = app.view_functions.get(request.endpoint)
+        g.read_from_replica = (
+            request.method == 'GET'
+            and getattr(view, 'replica_read', False)
+            and not _recently_wrote()
+        )
+
+    @app.after_request
+    def issue_read_your_writes_token(response):
+        if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+            return response
+        if request.method in WRITE_METHODS and response.status_code < 400:
+            response.headers[TOKEN_HEADER] = _serializer().dumps(0)
+        return response
@@ -0,0 +1,130 @@
+"""
+Full-text search over todo titles and descriptions.
+
+SQLite uses an external-content FTS5 table, todos_fts, that triggers keep in
+step with todos, so set-based writes are indexed as well as ORM ones and the
+text is not stored twice. Postgres uses a GIN index on a weighted tsvector
+expression. Both rank title matches above description matches and treat every
+search term as a prefix, so "gro" finds "groceries".
+"""
+import re
+from sqlalchemy import DDL, column, event, literal_column, or_, table, tuple_
+from sqlalchemy.orm import load_only
+from models import db, Todo
+from pagination import decode_cursor, encode_cursor
+
+FTS_TABLE = 'todos_fts'
+SEARCH_DEFAULT_LIMIT = 20
+
+# Longer queries are truncated rather than turned into huge MATCH expressions
+MAX_TERMS = 10
+
+# bm25() column weights, in todos_fts column order (title, description)
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, content='todos', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    # Completing or reordering a todo does not touch the index
+    f"CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+# Queries must use this exact expression for Postgres to pick the index
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+PG_DDL = [f"CREATE INDEX IF NOT EXISTS ix_todos_search ON todos USING gin (({PG_DOCUMENT}))"]
+
+for statement in SQLITE_DDL:
+    event.listen(Todo.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in PG_DDL:
+    event.listen(Todo.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+# Triggers go with the table, but a leftover index would point at reused rowids
+event.listen(Todo.__table__, 'before_drop',
+             DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+_fts = table(FTS_TABLE, column('rowid'))
+
+class SearchError(ValueError):
+    """Raised when a search query has no searchable terms"""
+
+def search_terms(q):
+    """Split a user query into plain word terms; operators and quotes are dropped"""
+    return re.findall(r'\w+', q or '')[:MAX_TERMS]
+
+def _sqlite_query(terms):
+    # Every term must match, each as a prefix
+    match = ' '.join(f'"{term}"*' for term in terms)
+    rank = db.func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, DESCRIPTION_WEIGHT)
+    query = db.session.query(Todo, rank.label('rank')).join(_fts, _fts.c.rowid == Todo.id).filter(
+        literal_column(FTS_TABLE).op('MATCH')(match)
+    )
+    return query, rank
+
+def _postgres_query(terms):
+    tsquery = db.func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    document = literal_column(PG_DOCUMENT)
+    # Negated so that, as with bm25, lower ranks sort first
+    rank = -db.func.ts_rank(document, tsquery)
+    query = db.session.query(Todo, rank.label('rank')).filter(document.op('@@')(tsquery))
+    return query, rank
+
+def _scan_query(terms):
+    # Other databases have no index to use; match substrings without ranking
+    rank = literal_column('0')
+    query = db.session.query(Todo, rank.label('rank'))
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(Todo.title.ilike(pattern), Todo.description.ilike(pattern)))
+    return query, rank
+
+def search_todos(user_id, q, list_id=None, limit=None, cursor=None, fields=None):
+    """
+    Best matches for `q` among a user's todos, optionally within one list.
+    `fields` limits the todo columns loaded. Returns (todos, next_cursor);
+    pages are keyed on (rank, id).
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise SearchError('Search query is required')
+
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        query, rank = _sqlite_query(terms)
+    elif dialect == 'postgresql':
+        query, rank = _postgres_query(terms)
+    else:
+        query, rank = _scan_query(terms)
+
+    query = query.filter(Todo.user_id == user_id)
+    if fields is not None:
+        query = query.options(load_only(*(getattr(Todo, field) for field in fields)))
+    if list_id is not None:
+        query = query.filter(Todo.todo_list_id == list_id)
+    if cursor is not None:
+        # bm25 and ts_rank give floats, the scan fallback an integer 0
+        after = decode_cursor(cursor, (float, int))
+        query = query.filter(tuple_(rank, Todo.id) > tuple_(*after))
+
+    limit = limit or SEARCH_DEFAULT_LIMIT
+    rows = query.order_by(rank.asc(), Todo.id.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].rank, rows[-1].Todo.id])
+    return [row.Todo for row in rows], next_cursor
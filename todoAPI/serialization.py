@@ -0,0 +1,142 @@
+"""
+JSON encoding.
+
+`init_json` installs orjson as Flask's JSON provider when it is installed
+(JSON_PROVIDER=orjson|stdlib overrides the choice). Both providers write
+datetimes as ISO 8601, the same strings `to_dict()` produces, so views can
+hand raw column values to jsonify.
+
+For list endpoints, `select_todo_fields` selects just the todo columns, so
+no ORM objects are built, and `rows_to_dicts` pairs them with their keys
+without any per-row isoformat() calls. `rows_to_json` and `rows_to_ndjson`
+encode rows straight to bytes, e.g. for streamed responses.
+
+`?fields=` picks which of a resource's fields a response carries. The same
+field list drives the SELECT (`select_todo_fields` for rows, `load_only_fields`
+for ORM queries) and the serializer, so unrequested columns are neither read
+nor encoded. `id` is always included.
+"""
+import enum
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import load_only
+from models import Todo
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Same keys, in the same order, as Todo.to_dict()
+TODO_FIELDS = ('id', 'user_id', 'todo_list_id', 'title', 'description', 'completed',
+               'created_at', 'updated_at', 'order')
+TODO_COLUMNS = tuple(getattr(Todo, field) for field in TODO_FIELDS)
+
+# Same keys as TodoList.to_dict() and to_summary_dict() respectively
+TODOLIST_FIELDS = ('id', 'name', 'user_id', 'created_at', 'todos')
+TODOLIST_SUMMARY_FIELDS = ('id', 'name', 'user_id', 'created_at', 'todo_count', 'completed_count')
+
+class FieldsError(ValueError):
+    """Raised when ?fields= names a field the resource does not have"""
+
+def _default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, enum.Enum):
+        return o.value
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    return DefaultJSONProvider.default(o)
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider, writing datetimes as ISO 8601 instead of HTTP dates"""
+
+    default = staticmethod(_default)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which encodes straight to bytes"""
+
+    # Non-string dict keys are converted like the stdlib does; keys are not sorted
+    OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def json_provider_class(name=None):
+    """The provider for JSON_PROVIDER: 'orjson', 'stdlib', or the fastest available"""
+    if name == 'stdlib' or (not name and orjson is None):
+        return StdlibJSONProvider
+    if orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+    return OrjsonProvider
+
+def init_json(app):
+    """Install the configured JSON provider on the app"""
+    app.json = json_provider_class(app.config.get('JSON_PROVIDER'))(app)
+
+def parse_fields(value, allowed):
+    """The fields named in a comma-separated ?fields= value, in `allowed` order; all of them if value is None"""
+    if value is None:
+        return allowed
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise FieldsError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                          f"Allowed: {', '.join(allowed)}")
+    names.add('id')
+    return tuple(field for field in allowed if field in names)
+
+def select_todo_fields(query, fields=TODO_FIELDS, keys=()):
+    """
+    Select `fields` of a Todo query as plain columns instead of ORM objects.
+    `keys` are extra columns the caller needs, e.g. to build a page cursor;
+    they come after `fields`, so rows_to_dicts(rows, fields) leaves them out.
+    """
+    names = fields + tuple(key for key in keys if key not in fields)
+    return query.with_entities(*(getattr(Todo, name) for name in names))
+
+def load_only_fields(model, fields):
+    """Loader option that reads only the columns behind `fields`; relationships are loaded separately"""
+    columns = model.__table__.columns
+    return load_only(*(getattr(model, field) for field in fields if field in columns))
+
+def todo_dict(todo, fields=TODO_FIELDS):
+    """A Todo's `fields` as a dict, touching no other attribute so deferred columns stay unloaded"""
+    return {field: getattr(todo, field) for field in fields}
+
+def todolist_dict(todolist, fields=TODOLIST_FIELDS, todo_fields=TODO_FIELDS):
+    """A TodoList's `fields` as a dict, with its todos limited to `todo_fields`"""
+    data = {field: getattr(todolist, field) for field in fields if field != 'todos'}
+    if 'todos' in fields:
+        data['todos'] = [todo_dict(todo, todo_fields) for todo in todolist.todos]
+    return data
+
+def rows_to_dicts(rows, fields=TODO_FIELDS):
+    """Column rows as dicts with to_dict() keys; datetimes are left for the JSON provider"""
+    return [dict(zip(fields, row)) for row in rows]
+
+def dumps_bytes(obj):
+    """Compact JSON as bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=OrjsonProvider.OPTIONS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+def rows_to_json(rows, fields=TODO_FIELDS):
+    """Column rows as a JSON array of objects, as bytes"""
+    return dumps_bytes(rows_to_dicts(rows, fields))
+
+def rows_to_ndjson(rows, fields, **constants):
+    """Column rows as newline-delimited JSON objects, as bytes; `constants` lead every object"""
+    return b''.join(dumps_bytes({**constants, **dict(zip(fields, row))}) + b'\n' for row in rows)
@@ -1,17 +1,34 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Todo
+from models import db, Todo, TodoList
+from pagination import get_page_args, paginate, PaginationError
+from counters import get_user_stats
+from ordering import append_order, apply_order, move_todo, user_scope, PlacementError
+from routing import replica_read
+from search import search_todos, SearchError, SEARCH_DEFAULT_LIMIT
+from sync import next_change_seq, user_change_seq
+from conditional import etag_for, not_modified, with_etag
+from serialization import (TODO_FIELDS, FieldsError, load_only_fields, parse_fields,
+                           rows_to_dicts, select_todo_fields, todo_dict)
+from validation import is_id
 from logging_config import logger
 
 simple_todos_bp = Blueprint('simple_todos', __name__, url_prefix='/todos')
 
 @simple_todos_bp.route('', methods=['GET'])
+@replica_read
 @jwt_required()
 def get_todos():
     """Get all todos for the current user"""
     try:
         user_id = get_jwt_identity()
+        etag = etag_for(user_id, user_change_seq(user_id))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         completed = request.args.get('completed')
+        fields = parse_fields(request.args.get('fields'), TODO_FIELDS)
         
         query = Todo.query.filter_by(user_id=user_id)
         
@@ -19,13 +36,23 @@ def get_todos():
             completed_bool = completed.lower() in ('true', '1', 'yes')
             query = query.filter_by(completed=completed_bool)
         
-        todos = query.order_by(Todo.order.asc()).all()
-        
-        return jsonify({
-            'todos': [todo.to_dict() for todo in todos],
-            'count': len(todos)
-        }), 200
-        
+        limit, cursor = get_page_args(request.args)
+        if limit is None:
+            todos = select_todo_fields(query, fields).order_by(Todo.order.asc(), Todo.id.asc()).all()
+            return with_etag((jsonify({
+                'todos': rows_to_dicts(todos, fields),
+                'count': len(todos)
+            }), 200), etag)
+        
+        todos, next_cursor = paginate(select_todo_fields(query, fields, ('order', 'id')), (Todo.order, Todo.id), limit, cursor)
+        return with_etag((jsonify({
+            'todos': rows_to_dicts(todos, fields),
+            'count': len(todos),
+            'next_cursor': next_cursor
+        }), 200), etag)
+        
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to get todos: {e}")
         return jsonify({'error': 'Failed to get todos', 'details': str(e)}), 500
@@ -54,14 +81,11 @@ def create_todo():
         if len(title) > 200:
             return jsonify({'error': 'Title must be between 1 and 200 characters'}), 400
         
-        # Get the highest order for this user and increment
-        max_order = db.session.query(db.func.max(Todo.order)).filter_by(user_id=user_id).scalar() or 0
-        
         todo = Todo(
             user_id=user_id,
             title=title,
             description=description if description else None,
-            order=max_order + 1
+            order=append_order(user_scope(user_id))
         )
         
         db.session.add(todo)
@@ -79,18 +103,22 @@ def create_todo():
         return jsonify({'error': 'Failed to create todo', 'details': str(e)}), 500
 
 @simple_todos_bp.route('/<int:todo_id>', methods=['GET'])
+@replica_read
 @jwt_required()
 def get_todo(todo_id):
     """Get a specific todo"""
     try:
         user_id = get_jwt_identity()
-        todo = Todo.query.filter_by(id=todo_id, user_id=user_id).first()
+        fields = parse_fields(request.args.get('fields'), TODO_FIELDS)
+        todo = Todo.query.options(load_only_fields(Todo, fields)).filter_by(id=todo_id, user_id=user_id).first()
         
         if not todo:
             return jsonify({'error': 'Todo not found'}), 404
         
-        return jsonify({'todo': todo.to_dict()}), 200
+        return jsonify({'todo': todo_dict(todo, fields)}), 200
         
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to get todo {todo_id}: {e}")
         return jsonify({'error': 'Failed to get todo', 'details': str(e)}), 500
@@ -168,29 +196,51 @@ def delete_todo(todo_id):
         return jsonify({'error': 'Failed to delete todo', 'details': str(e)}), 500
 
 @simple_todos_bp.route('/stats', methods=['GET'])
+@replica_read
 @jwt_required()
 def get_todo_stats():
     """Get todo statistics for the current user"""
     try:
         user_id = get_jwt_identity()
         
-        total_todos = Todo.query.filter_by(user_id=user_id).count()
-        completed_todos = Todo.query.filter_by(user_id=user_id, completed=True).count()
-        pending_todos = total_todos - completed_todos
+        # Counters are kept up to date on every write, so this is a primary key read
+        stats = get_user_stats(user_id)
         
-        return jsonify({
-            'stats': {
-                'total': total_todos,
-                'completed': completed_todos,
-                'pending': pending_todos,
-                'completion_rate': round((completed_todos / total_todos * 100), 2) if total_todos > 0 else 0
-            }
-        }), 200
+        return jsonify({'stats': stats.to_dict()}), 200
         
     except Exception as e:
         logger.error(f"Failed to get todo stats: {e}")
         return jsonify({'error': 'Failed to get todo stats', 'details': str(e)}), 500
 
+@simple_todos_bp.route('/search', methods=['GET'])
+@replica_read
+@jwt_required()
+def search_user_todos():
+    """Search the current user's todos by title and description"""
+    try:
+        user_id = get_jwt_identity()
+        list_id = request.args.get('list_id', type=int)
+        
+        if list_id is not None and not TodoList.query.filter_by(id=list_id, user_id=user_id).first():
+            return jsonify({'error': 'TodoList not found or you do not have permission to access it'}), 404
+        
+        fields = parse_fields(request.args.get('fields'), TODO_FIELDS)
+        # Searches always return one page, so its cursor works without a limit too
+        limit, cursor = get_page_args(request.args, default_limit=SEARCH_DEFAULT_LIMIT)
+        todos, next_cursor = search_todos(user_id, request.args.get('q'), list_id, limit, cursor, fields)
+        
+        return jsonify({
+            'todos': [todo_dict(todo, fields) for todo in todos],
+            'count': len(todos),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except (PaginationError, SearchError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to search todos: {e}")
+        return jsonify({'error': 'Failed to search todos', 'details': str(e)}), 500
+
 @simple_todos_bp.route('/reorder', methods=['PUT'])
 @jwt_required()
 def reorder_todos():
@@ -210,18 +260,55 @@ def reorder_todos():
         if not isinstance(ordered_ids, list):
             return jsonify({'error': 'ordered_ids must be a list'}), 400
         
-        # Update the order of each todo
-        for index, todo_id in enumerate(ordered_ids):
-            todo = Todo.query.filter_by(id=todo_id, user_id=user_id).first()
-            if todo:
-                todo.order = index
+        if not all(is_id(todo_id) for todo_id in ordered_ids):
+            return jsonify({'error': 'ordered_ids must be a list of integers'}), 400
+        
+        # One UPDATE; IDs the user does not own are skipped by its WHERE clause
+        updated = apply_order(user_scope(user_id), ordered_ids, next_change_seq(user_id))
         
         db.session.commit()
         
-        logger.info(f"Todos reordered successfully for user {user_id}")
+        logger.info(f"Todos reordered successfully for user {user_id} ({updated} updated)")
         return jsonify({'message': 'Todos reordered successfully'}), 200
         
     except Exception as e:
         db.session.rollback()
         logger.error(f"Failed to reorder todos: {e}")
-        return jsonify({'error': 'Failed to reorder todos', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to reorder todos', 'details': str(e)}), 500
+
+@simple_todos_bp.route('/<int:todo_id>/move', methods=['PATCH'])
+@jwt_required()
+def move_todo_for_user(todo_id):
+    """Move one todo directly after or before another of the user's todos"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or ('after_id' in data) == ('before_id' in data):
+            return jsonify({'error': 'Provide exactly one of: after_id, before_id'}), 400
+        
+        after = 'after_id' in data
+        anchor_id = data['after_id'] if after else data['before_id']
+        if anchor_id is not None and not is_id(anchor_id):
+            return jsonify({'error': 'after_id and before_id must be integers or null'}), 400
+        
+        todo = Todo.query.filter_by(id=todo_id, user_id=user_id).first()
+        if not todo:
+            return jsonify({'error': 'Todo not found'}), 404
+        
+        try:
+            move_todo(todo, user_scope(user_id), anchor_id, after)
+        except PlacementError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        db.session.commit()
+        
+        logger.info(f"Todo {todo_id} moved to order {todo.order} for user {user_id}")
+        return jsonify({
+            'message': 'Todo moved successfully',
+            'todo': todo.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to move todo {todo_id}: {e}")
+        return jsonify({'error': 'Failed to move todo', 'details': str(e)}), 500
@@ -0,0 +1,220 @@
+"""
+Delta sync for clients that keep a local copy of their lists and todos.
+
+Every write to a user's lists or todos takes the next value of that user's
+change sequence (user_stats.change_seq) and stamps it on the row; deletes
+leave a tombstone stamped the same way. GET /sync?since=<cursor> then reads
+only the rows and tombstones stamped after the cursor, through
+(user_id, change_seq) indexes, so a poll costs O(changes) rather than
+O(todos). The same sequence versions each list (todolists.version) and
+all of a user's data for ETags.
+
+Taking a sequence updates the user's stats row, so concurrent writers for
+one user queue on that row and sequences become visible in order; a change
+that commits late can never be skipped by a client that synced meanwhile.
+
+ORM writes are stamped by a flush hook. Set-based statements must take a
+sequence with `next_change_seq`, write it to the rows they change, call
+`touch_lists` for the lists those rows are in, and call `record_deletes` for
+rows they delete. The todos of a deleted list, which the database removes with
+it (ON DELETE CASCADE), get their tombstones from one INSERT ... SELECT.
+
+Tombstones are kept for SYNC_RETENTION_DAYS and removed by
+`flask purge-tombstones`; clients with an older cursor get a full resync.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, current_app, jsonify, request
+from flask.cli import with_appcontext
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import event, inspect, literal, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, Todo, TodoList, Tombstone, User, UserStats
+from counters import insert_user_stats
+from pagination import decode_cursor, encode_cursor, PaginationError
+from routing import replica_read
+from logging_config import logger
+
+sync_bp = Blueprint('sync', __name__)
+
+_ENTITIES = {Todo: 'todo', TodoList: 'todolist'}
+_COLLECTIONS = {'todo': 'todos', 'todolist': 'todolists'}
+
+def next_change_seq(user_id, connection=None):
+    """Take the user's next change sequence; the stats row stays locked until commit"""
+    connection = connection or db.session.connection()
+    user_id = int(user_id)
+    stats = UserStats.__table__
+    result = connection.execute(stats.update().where(stats.c.user_id == user_id).values(
+        change_seq=stats.c.change_seq + 1
+    ))
+    if result.rowcount == 0:
+        insert_user_stats(connection, user_id, change_seq=1)
+        return 1
+    return connection.execute(select(stats.c.change_seq).where(stats.c.user_id == user_id)).scalar_one()
+
+def record_deletes(user_id, entity, ids, change_seq, connection=None):
+    """Leave tombstones for rows removed by a set-based DELETE"""
+    if not ids:
+        return
+    connection = connection or db.session.connection()
+    now = datetime.utcnow()
+    connection.execute(Tombstone.__table__.insert(), [
+        {'user_id': int(user_id), 'entity': entity, 'entity_id': entity_id,
+         'change_seq': change_seq, 'deleted_at': now}
+        for entity_id in ids
+    ])
+
+def record_todo_deletes(user_id, change_seq, *criteria, connection=None):
+    """Leave tombstones for the todos that match `criteria`, before a cascading DELETE removes them"""
+    connection = connection or db.session.connection()
+    rows = select(
+        literal(int(user_id)), literal('todo'), Todo.id, literal(change_seq), literal(datetime.utcnow(), db.DateTime)
+    ).where(*criteria)
+    connection.execute(Tombstone.__table__.insert().from_select(
+        ['user_id', 'entity', 'entity_id', 'change_seq', 'deleted_at'], rows
+    ))
+
+def _owner(obj):
+    return int(obj.user_id) if obj.user_id is not None else None
+
+@event.listens_for(db.session, 'before_flush')
+def _stamp_changes(session, flush_context, instances):
+    changed = defaultdict(list)
+    deleted = defaultdict(list)
+    for obj in session.new:
+        if type(obj) in _ENTITIES:
+            changed[_owner(obj)].append(obj)
+    for obj in session.dirty:
+        if type(obj) in _ENTITIES and obj not in session.deleted \
+                and session.is_modified(obj, include_collections=False):
+            changed[_owner(obj)].append(obj)
+    for obj in session.deleted:
+        if type(obj) in _ENTITIES:
+            deleted[_owner(obj)].append(obj)
+
+    # A deleted user takes their stats row and tombstones with them
+    skip = {obj.id for obj in session.deleted if isinstance(obj, User)} | {None}
+    users = (set(changed) | set(deleted)) - skip
+    if not users:
+        return
+
+    connection = session.connection()
+    # Lock stats rows in a fixed order so two flushes cannot deadlock
+    for user_id in sorted(users):
+        seq = next_change_seq(user_id, connection)
+        list_ids = set()
+        for obj in changed.get(user_id, ()):
+            obj.change_seq = seq
+            if isinstance(obj, TodoList):
+                obj.version = seq
+            else:
+                list_ids.update(_list_ids(obj))
+        by_entity = defaultdict(list)
+        for obj in deleted.get(user_id, ()):
+            by_entity[_ENTITIES[type(obj)]].append(obj.id)
+            if isinstance(obj, Todo):
+                list_ids.update(_list_ids(obj))
+        for entity, ids in by_entity.items():
+            record_deletes(user_id, entity, ids, seq, connection)
+        for obj in deleted.get(user_id, ()):
+            if isinstance(obj, TodoList):
+                record_todo_deletes(user_id, seq, Todo.todo_list_id == obj.id,
+                                    Todo.id.notin_(by_entity['todo']), connection=connection)
+        _set_list_versions(session, connection, list_ids - {None}, seq)
+
+def _list_ids(todo):
+    # The list a todo is in now and, if it moved, the one it left
+    history = inspect(todo).attrs.todo_list_id.history
+    return set(history.deleted) | {todo.todo_list_id}
+
+def _set_list_versions(session, connection, list_ids, seq):
+    if not list_ids:
+        return
+    lists = TodoList.__table__
+    connection.execute(lists.update().where(lists.c.id.in_(list_ids)).values(version=seq))
+    # Loaded lists would otherwise report the old version for the rest of the transaction
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, TodoList) and inspect(obj).identity[0] in list_ids and obj not in session.dirty:
+            set_committed_value(obj, 'version', seq)
+
+def touch_lists(change_seq, *criteria):
+    """Give the lists holding the todos that match `criteria` the version `change_seq` after a set-based write"""
+    holding = select(Todo.todo_list_id).where(*criteria)
+    db.session.execute(
+        update(TodoList).where(TodoList.id.in_(holding)).values(version=change_seq)
+        .execution_options(synchronize_session=False)
+    )
+
+def user_change_seq(user_id):
+    """The user's current change sequence, which is also the version of all their data"""
+    return db.session.query(UserStats.change_seq).filter_by(user_id=int(user_id)).scalar() or 0
+
+def encode_sync_cursor(change_seq):
+    """Cursor for the next sync: the sequence read and when it was read"""
+    return encode_cursor([change_seq, int(time.time())])
+
+def decode_sync_cursor(cursor):
+    """
+    The change sequence in a cursor, or None when the client needs a full
+    resync because tombstones it has not seen may have been purged.
+    """
+    change_seq, issued_at = decode_cursor(cursor, (int, int))
+    retention = current_app.config['SYNC_RETENTION_DAYS'] * 86400
+    if issued_at < time.time() - retention:
+        return None
+    return change_seq
+
+@sync_bp.route('/sync', methods=['GET'])
+@replica_read
+@jwt_required()
+def sync():
+    """Get the current user's lists and todos changed or deleted since a cursor"""
+    try:
+        user_id = int(get_jwt_identity())
+        since = request.args.get('since')
+        since = decode_sync_cursor(since) if since else None
+
+        # Read the sequence before the rows: a change committed in between is
+        # sent again on the next sync rather than skipped
+        current = user_change_seq(user_id)
+        full = since is None or since > current
+
+        lists = TodoList.query.filter_by(user_id=user_id)
+        todos = Todo.query.filter_by(user_id=user_id)
+        deleted = {'todolists': [], 'todos': []}
+        if not full:
+            lists = lists.filter(TodoList.change_seq > since)
+            todos = todos.filter(Todo.change_seq > since)
+            tombstones = db.session.query(Tombstone.entity, Tombstone.entity_id).filter(
+                Tombstone.user_id == user_id, Tombstone.change_seq > since
+            ).order_by(Tombstone.change_seq, Tombstone.id)
+            for entity, entity_id in tombstones:
+                deleted[_COLLECTIONS[entity]].append(entity_id)
+
+        return jsonify({
+            'full': full,
+            'todolists': [l.to_sync_dict() for l in lists.order_by(TodoList.id)],
+            'todos': [todo.to_dict() for todo in todos.order_by(Todo.id)],
+            'deleted': deleted,
+            'cursor': encode_sync_cursor(current)
+        }), 200
+
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to sync: {e}")
+        return jsonify({'error': 'Failed to sync', 'details': str(e)}), 500
+
+@click.command('purge-tombstones')
+@with_appcontext
+def purge_tombstones_command():
+    """Delete sync tombstones older than SYNC_RETENTION_DAYS."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SYNC_RETENTION_DAYS'])
+    purged = db.session.query(Tombstone).filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+
+    logger.info(f"Purged {purged} tombstones older than {cutoff.isoformat()}")
+    click.echo(f'Purged {purged} tombstones')
@@ -0,0 +1,128 @@
+"""
+Tests for the POST /batch endpoint
+"""
+from sqlalchemy import event
+from models import Todo, TodoList, db
+
+
+def batch(client, headers, operations, **options):
+    return client.post('/batch', json={'operations': operations, **options}, headers=headers)
+
+
+class TestBatch:
+    """Test POST /batch"""
+
+    def test_mixed_operations(self, app, client, auth_headers, sample_todolist):
+        """Test list and todo operations run in order and report per-item results"""
+        with app.app_context():
+            milk, eggs, bread = [t.id for t in Todo.query.filter_by(todo_list_id=sample_todolist.id).order_by(Todo.order)]
+
+        response = batch(client, auth_headers, [
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': '  Butter  '},
+            {'op': 'update_todo', 'todo_id': milk, 'completed': True},
+            {'op': 'delete_todo', 'todo_id': eggs},
+            {'op': 'update_list', 'list_id': sample_todolist.id, 'name': 'Shopping'},
+            {'op': 'create_todo', 'title': 'No list'},
+        ])
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['committed'] is True
+        assert [r['status'] for r in data['results']] == [201, 200, 200, 200, 201]
+        assert data['results'][0]['todo']['title'] == 'Butter'
+        assert data['results'][4]['todo']['todo_list_id'] is None
+
+        todos = client.get(f'/todolists/{sample_todolist.id}/todos', headers=auth_headers).get_json()['todos']
+        # Completing a todo moves it to the end of its list, as PUT does
+        assert [t['title'] for t in todos] == ['Bread', 'Butter', 'Milk']
+        with app.app_context():
+            todolist = db.session.get(TodoList, sample_todolist.id)
+            assert (todolist.name, todolist.todo_count, todolist.completed_count) == ('Shopping', 3, 1)
+            assert bread in [t.id for t in todolist.todos]
+
+    def test_atomic_failure_rolls_back(self, app, client, auth_headers, sample_todolist):
+        """Test a failing operation undoes the whole batch by default"""
+        response = batch(client, auth_headers, [
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': 'Butter'},
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': ''},
+        ])
+
+        assert response.status_code == 400
+        data = response.get_json()
+        assert (data['committed'], data['failed_index']) == (False, 1)
+        assert data['results'][-1]['error'] == 'Title must be between 1 and 200 characters'
+        with app.app_context():
+            assert Todo.query.filter_by(title='Butter').count() == 0
+
+    def test_per_item_failures(self, app, client, auth_headers, sample_todolist, sample_todo):
+        """Test atomic=false commits the operations that succeed"""
+        response = batch(client, auth_headers, [
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': 'Butter'},
+            {'op': 'update_todo', 'todo_id': 999999, 'title': 'Nope'},
+            {'op': 'update_todo', 'todo_id': sample_todo.id, 'completed': 'yes'},
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': 'Jam'},
+        ], atomic=False)
+
+        assert response.status_code == 200
+        assert [r['status'] for r in response.get_json()['results']] == [201, 404, 400, 201]
+        with app.app_context():
+            assert Todo.query.filter(Todo.title.in_(['Butter', 'Jam'])).count() == 2
+            assert db.session.get(TodoList, sample_todolist.id).todo_count == 5
+
+    def test_other_users_data_is_not_found(self, client, auth_headers, auth_headers2, sample_todolist):
+        """Test operations on another user's lists and todos fail with 404"""
+        response = batch(client, auth_headers2, [
+            {'op': 'create_todo', 'list_id': sample_todolist.id, 'title': 'Intruder'},
+        ], atomic=False)
+
+        assert response.get_json()['results'][0]['status'] == 404
+
+    def test_list_refs(self, app, client, auth_headers):
+        """Test todos can be added to a list created earlier in the same batch"""
+        response = batch(client, auth_headers, [
+            {'op': 'create_list', 'name': 'Trip', 'ref': 'trip'},
+            {'op': 'create_todo', 'list_ref': 'trip', 'title': 'Passport'},
+            {'op': 'create_todo', 'list_ref': 'trip', 'title': 'Tickets'},
+        ])
+
+        results = response.get_json()['results']
+        list_id = results[0]['todolist']['id']
+        assert [r['todo']['todo_list_id'] for r in results[1:]] == [list_id, list_id]
+        assert results[2]['todo']['order'] > results[1]['todo']['order']
+
+    def test_deleted_list_takes_its_todos(self, client, auth_headers, sample_todolist):
+        """Test operations on todos of a list deleted earlier in the batch fail"""
+        todos = client.get(f'/todolists/{sample_todolist.id}/todos', headers=auth_headers).get_json()['todos']
+
+        response = batch(client, auth_headers, [
+            {'op': 'update_todo', 'todo_id': todos[0]['id'], 'title': 'Oat milk'},
+            {'op': 'delete_list', 'list_id': sample_todolist.id},
+            {'op': 'update_todo', 'todo_id': todos[1]['id'], 'title': 'Gone'},
+        ], atomic=False)
+
+        assert [r['status'] for r in response.get_json()['results']] == [200, 200, 404]
+
+    def test_ownership_is_resolved_once(self, app, client, auth_headers, sample_todolist):
+        """Test the batch loads the lists it references with one query, not one per operation"""
+        statements = []
+        list_id = sample_todolist.id
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        batch(client, auth_headers, [
+            {'op': 'create_todo', 'list_id': list_id, 'title': f'Item {i}'} for i in range(5)
+        ])
+
+        # Todo queries name todolists too, in the check that the todo's list is not hidden
+        list_queries = [s for s in statements if s.startswith('SELECT') and 'FROM todolists' in s]
+        assert sum(1 for s in list_queries if 'FROM todos' not in s) == 1
+
+    def test_invalid_requests(self, client, auth_headers):
+        """Test malformed batches are rejected before anything runs"""
+        assert batch(client, auth_headers, []).status_code == 400
+        assert batch(client, auth_headers, [{'op': 'create_todo', 'title': 'x'}], atomic='no').status_code == 400
+        assert client.post('/batch', json={'operations': 'x'}, headers=auth_headers).status_code == 400
+        assert batch(client, auth_headers, [{'op': 'explode'}]).status_code == 400
+        assert client.post('/batch', json={'operations': []}).status_code == 401
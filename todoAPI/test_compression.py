@@ -0,0 +1,108 @@
+"""
+Tests for response compression and compressed request bodies
+"""
+import gzip
+import json
+import zlib
+from flask import Response
+from compression import compress_response
+
+
+def add_todos(client, headers, count):
+    for index in range(count):
+        client.post('/todos', json={'title': f'Todo number {index}', 'description': 'x' * 40},
+                    headers=headers)
+
+
+class TestResponseCompression:
+    """Test negotiated response compression"""
+
+    def test_large_response_is_gzipped(self, client, auth_headers):
+        """Test bodies over the threshold are gzipped when the client accepts it"""
+        add_todos(client, auth_headers, 20)
+
+        response = client.get('/todos', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert json.loads(gzip.decompress(response.data))['count'] == 20
+
+    def test_small_response_is_not_compressed(self, client, auth_headers, sample_todo):
+        """Test bodies under COMPRESS_MIN_SIZE are sent as they are"""
+        response = client.get(f'/todos/{sample_todo.id}', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json()['todo']['id'] == sample_todo.id
+
+    def test_client_must_accept_encoding(self, client, auth_headers):
+        """Test no compression without Accept-Encoding or with q=0"""
+        add_todos(client, auth_headers, 20)
+
+        assert 'Content-Encoding' not in client.get('/todos', headers=auth_headers).headers
+        refused = client.get('/todos', headers={**auth_headers, 'Accept-Encoding': 'gzip;q=0'})
+        assert 'Content-Encoding' not in refused.headers
+
+    def test_compressed_etag_revalidates(self, client, auth_headers):
+        """Test the compressed variant has its own ETag that still gets 304"""
+        add_todos(client, auth_headers, 20)
+        headers = {**auth_headers, 'Accept-Encoding': 'gzip'}
+
+        etag = client.get('/todos', headers=headers).headers['ETag']
+        assert etag.endswith('-gzip"')
+
+        cached = client.get('/todos', headers={**headers, 'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+
+    def test_streamed_response_flushes_each_chunk(self, app):
+        """Test streamed bodies are compressed incrementally"""
+        lines = [json.dumps({'id': index}).encode() + b'\n' for index in range(3)]
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = compress_response(Response(iter(lines), mimetype='application/x-ndjson'), 1024, 6)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        decompressor = zlib.decompressobj(31)
+        chunks = iter(response.response)
+        # Each line is readable as soon as its chunk arrives
+        for line in lines:
+            assert decompressor.decompress(next(chunks)) == line
+        decompressor.decompress(b''.join(chunks))
+        assert decompressor.eof
+
+
+class TestCompressedRequests:
+    """Test gzip request bodies"""
+
+    def post_gzip(self, client, headers, body, encoding='gzip'):
+        return client.post('/todos', data=body, content_type='application/json',
+                           headers={**headers, 'Content-Encoding': encoding})
+
+    def test_gzip_body_is_accepted(self, client, auth_headers):
+        """Test a gzipped JSON body is decompressed transparently"""
+        body = gzip.compress(json.dumps({'title': 'Compressed'}).encode())
+
+        response = self.post_gzip(client, auth_headers, body)
+
+        assert response.status_code == 201
+        assert response.get_json()['todo']['title'] == 'Compressed'
+
+    def test_decompressed_size_is_limited(self, app, client, auth_headers):
+        """Test a body that inflates past the limit is rejected"""
+        app.wsgi_app.max_size = 1024
+        body = gzip.compress(json.dumps({'title': 'x', 'description': ' ' * 100000}).encode())
+        assert len(body) < 1024
+
+        response = self.post_gzip(client, auth_headers, body)
+
+        assert response.status_code == 413
+
+    def test_invalid_gzip(self, client, auth_headers):
+        """Test a corrupt gzip body is rejected"""
+        assert self.post_gzip(client, auth_headers, b'not gzip').status_code == 400
+
+    def test_unsupported_encoding(self, client, auth_headers):
+        """Test request encodings other than gzip are refused"""
+        response = self.post_gzip(client, auth_headers, b'{}', encoding='compress')
+
+        assert response.status_code == 415
@@ -0,0 +1,93 @@
+"""
+Tests for ETag / If-None-Match on polled list endpoints
+"""
+from sqlalchemy import event
+from models import db
+
+
+def revalidate(client, url, headers, etag):
+    return client.get(url, headers={**headers, 'If-None-Match': etag})
+
+
+class TestConditionalGet:
+    """Test version-based ETags and 304 responses"""
+
+    def test_unchanged_poll_returns_304(self, client, auth_headers, sample_todolist):
+        """Test a matching If-None-Match gets an empty 304"""
+        response = client.get('/todolists', headers=auth_headers)
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+
+        cached = revalidate(client, '/todolists', auth_headers, etag)
+
+        assert cached.status_code == 304
+        assert cached.data == b''
+        assert cached.headers['ETag'] == etag
+
+    def test_304_does_not_read_todos(self, app, client, auth_headers, sample_todolist):
+        """Test revalidation costs a version lookup and never touches todos"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        detail = f'/todolists/{sample_todolist.id}'
+        etag = client.get(url, headers=auth_headers).headers['ETag']
+
+        statements = []
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            for poll in ('/todolists', '/todos', url, detail, f'{detail}?fields=name,todos&todo_fields=title'):
+                etag = client.get(poll, headers=auth_headers).headers['ETag']
+                statements.clear()
+                assert revalidate(client, poll, auth_headers, etag).status_code == 304
+                assert len(statements) == 1
+                assert 'FROM todos' not in statements[0]
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+    def test_writes_change_the_etag(self, client, auth_headers, sample_todolist):
+        """Test creating and updating todos invalidates the user's ETags"""
+        etag = client.get('/todos', headers=auth_headers).headers['ETag']
+        todo = client.post('/todos', json={'title': 'New'}, headers=auth_headers).get_json()['todo']
+        assert revalidate(client, '/todos', auth_headers, etag).status_code == 200
+
+        etag = client.get('/todolists', headers=auth_headers).headers['ETag']
+        client.put(f"/todos/{todo['id']}", json={'completed': True}, headers=auth_headers)
+        assert revalidate(client, '/todolists', auth_headers, etag).status_code == 200
+
+    def test_list_version_is_per_list(self, client, auth_headers, sample_todolist):
+        """Test writes to one list leave another list's ETag valid"""
+        other = client.post('/todolists', json={'name': 'Other'}, headers=auth_headers).get_json()
+        url = f'/todolists/{sample_todolist.id}/todos'
+        etag = client.get(url, headers=auth_headers).headers['ETag']
+
+        client.post(f"/todolists/{other['id']}/todos", json={'title': 'Elsewhere'}, headers=auth_headers)
+        assert revalidate(client, url, auth_headers, etag).status_code == 304
+
+        client.post(url, json={'title': 'Here'}, headers=auth_headers)
+        assert revalidate(client, url, auth_headers, etag).status_code == 200
+
+    def test_set_based_reorder_changes_list_etag(self, client, auth_headers, sample_todolist):
+        """Test a reorder, which bypasses the ORM, still bumps the list version"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        response = client.get(url, headers=auth_headers)
+        etag = response.headers['ETag']
+        ids = [todo['id'] for todo in response.get_json()['todos']]
+
+        client.put(f'{url}/reorder', json={'ordered_ids': ids[::-1]}, headers=auth_headers)
+
+        assert revalidate(client, url, auth_headers, etag).status_code == 200
+        detail = f'/todolists/{sample_todolist.id}'
+        etag = client.get(detail, headers=auth_headers).headers['ETag']
+        assert revalidate(client, detail, auth_headers, etag).status_code == 304
+
+    def test_etag_depends_on_query_and_user(self, client, auth_headers, auth_headers2):
+        """Test different views and different users never share an ETag"""
+        full = client.get('/todolists', headers=auth_headers).headers['ETag']
+        summary = client.get('/todolists?view=summary', headers=auth_headers).headers['ETag']
+        other_user = client.get('/todolists', headers=auth_headers2).headers['ETag']
+
+        assert len({full, summary, other_user}) == 3
+        assert revalidate(client, '/todolists?view=summary', auth_headers, full).status_code == 200
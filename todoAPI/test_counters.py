@@ -0,0 +1,92 @@
+"""
+Tests for the denormalized list and user todo counters
+"""
+from models import Todo, TodoList, UserStats, db
+
+
+def list_stats(client, headers, list_id):
+    return client.get(f'/todolists/{list_id}/stats', headers=headers).get_json()['stats']
+
+
+class TestListCounters:
+    """Test per-list counters follow creates, updates and deletes"""
+
+    def test_counts_follow_writes(self, client, auth_headers, sample_todolist):
+        """Test create, complete and delete keep list stats in step"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        assert list_stats(client, auth_headers, sample_todolist.id)['total'] == 3
+
+        todo = client.post(url, json={'title': 'Butter'}, headers=auth_headers).get_json()['todo']
+        client.put(f"{url}/{todo['id']}", json={'completed': True}, headers=auth_headers)
+        stats = list_stats(client, auth_headers, sample_todolist.id)
+        assert (stats['total'], stats['completed'], stats['pending']) == (4, 1, 3)
+        assert stats['completion_rate'] == 25.0
+
+        client.delete(f"{url}/{todo['id']}", headers=auth_headers)
+        stats = list_stats(client, auth_headers, sample_todolist.id)
+        assert (stats['total'], stats['completed']) == (3, 0)
+
+    def test_list_stats_user_isolation(self, client, auth_headers2, sample_todolist):
+        """Test users cannot read another user's list stats"""
+        response = client.get(f'/todolists/{sample_todolist.id}/stats', headers=auth_headers2)
+
+        assert response.status_code == 404
+
+    def test_moving_todo_between_lists(self, app, sample_todolist, test_user):
+        """Test changing todo_list_id moves the counts with it"""
+        with app.app_context():
+            other = TodoList(name='Other', user_id=test_user.id)
+            db.session.add(other)
+            db.session.commit()
+            todo = Todo.query.filter_by(todo_list_id=sample_todolist.id).first()
+            todo.todo_list_id = other.id
+            todo.completed = True
+            db.session.commit()
+
+            assert (db.session.get(TodoList, sample_todolist.id).todo_count,
+                    db.session.get(TodoList, other.id).todo_count,
+                    db.session.get(TodoList, other.id).completed_count) == (2, 1, 1)
+            stats = db.session.get(UserStats, test_user.id)
+            assert (stats.todo_count, stats.completed_count) == (3, 1)
+
+
+class TestUserCounters:
+    """Test the per-user stats row"""
+
+    def test_deleting_list_updates_user_stats(self, client, auth_headers, sample_todolist):
+        """Test deleting a list removes its todos from the user's stats"""
+        client.post('/todos', json={'title': 'Loose'}, headers=auth_headers)
+        assert client.get('/todos/stats', headers=auth_headers).get_json()['stats']['total'] == 4
+
+        client.delete(f'/todolists/{sample_todolist.id}', headers=auth_headers)
+
+        assert client.get('/todos/stats', headers=auth_headers).get_json()['stats']['total'] == 1
+
+    def test_failed_flush_does_not_leak_deltas(self, app, sample_todo, test_user):
+        """Test counters collected by a rolled back flush are discarded"""
+        with app.app_context():
+            db.session.delete(db.session.get(Todo, sample_todo.id))
+            db.session.add(Todo(user_id=test_user.id, title=None))
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+            db.session.add(Todo(user_id=test_user.id, title='Fine'))
+            db.session.commit()
+            stats = db.session.get(UserStats, test_user.id)
+            assert stats.todo_count == 2
+
+    def test_recount_command(self, app, runner, sample_todolist, test_user):
+        """Test the repair command rebuilds drifted counters"""
+        with app.app_context():
+            db.session.query(TodoList).update({'todo_count': 99})
+            db.session.query(UserStats).update({'completed_count': 42})
+            db.session.commit()
+
+        result = runner.invoke(args=['recount-stats'])
+
+        assert 'Recounted 1 non-empty lists' in result.output
+        with app.app_context():
+            assert db.session.get(TodoList, sample_todolist.id).todo_count == 3
+            assert db.session.get(UserStats, test_user.id).completed_count == 0
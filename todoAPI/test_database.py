@@ -0,0 +1,61 @@
+"""
+Tests for engine configuration: SQLite pragmas and connection pool settings
+"""
+from sqlalchemy import text
+from models import db
+from database import InstrumentedQueuePool, engine_options_from_env
+
+
+class TestSqlitePragmas:
+    """Test the SQLite pragma profile is applied to connections"""
+
+    def test_profile_active(self, app):
+        """Test new connections use WAL and enforce foreign keys"""
+        with app.app_context():
+            assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
+            assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+
+
+class TestEngineOptions:
+    """Test pool options are read from the environment"""
+
+    def test_server_database_options(self, monkeypatch):
+        """Test pool sizing, recycle and pre-ping for server databases"""
+        monkeypatch.setenv('DB_POOL_SIZE', '20')
+        monkeypatch.setenv('DB_MAX_OVERFLOW', '5')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+
+        options = engine_options_from_env('postgresql://user:pass@db/todo')
+
+        assert options['poolclass'] is InstrumentedQueuePool
+        assert (options['pool_size'], options['max_overflow']) == (20, 5)
+        assert options['pool_pre_ping'] is False
+        assert options['pool_recycle'] == 1800
+
+    def test_sqlite_options(self):
+        """Test SQLite files are pooled without server-only settings"""
+        assert 'pool_pre_ping' not in engine_options_from_env('sqlite:///todo.db')
+        assert engine_options_from_env('sqlite://') == {}
+
+
+class TestPoolMetrics:
+    """Test the admin pool metrics endpoint"""
+
+    def test_pool_metrics(self, client, admin_headers):
+        """Test checkouts, saturation and churn are reported"""
+        response = client.get('/admin/db/pool', headers=admin_headers)
+
+        assert response.status_code == 200
+        metrics = response.get_json()['pools']['default']['metrics']
+        assert metrics['checkouts'] > 0
+        assert metrics['capacity'] == 15
+        assert 0 <= metrics['saturation'] <= 1
+        assert metrics['connections_opened'] >= 1
+        assert set(metrics['checkout_wait_ms']) == {'avg', 'max'}
+
+    def test_pool_metrics_admin_only(self, client, auth_headers):
+        """Test regular users cannot read pool metrics"""
+        response = client.get('/admin/db/pool', headers=auth_headers)
+
+        assert response.status_code == 403
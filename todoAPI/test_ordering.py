@@ -0,0 +1,213 @@
+"""
+Tests for sparse todo ordering
+"""
+import pytest
+from models import Todo, db
+from ordering import ORDER_GAP, key_between, rebalance, list_scope
+
+
+class TestKeyBetween:
+    """Test order key placement between neighbours"""
+
+    @pytest.mark.parametrize('lower, upper, expected', [
+        (None, None, ORDER_GAP),
+        (None, 1024, 0),
+        (1024, None, 2048),
+        (1024, 2048, 1536),
+        (1024, 1026, 1025),
+        (1024, 1025, None),
+    ])
+    def test_key_between(self, lower, upper, expected):
+        """Test keys land strictly between neighbours or report no room"""
+        assert key_between(lower, upper) == expected
+
+
+class TestAppendOrder:
+    """Test todos are appended with gapped order keys"""
+
+    def test_create_appends_with_gap(self, client, auth_headers, sample_todolist):
+        """Test a new todo is placed one gap after the last todo"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        first = client.post(url, json={'title': 'Butter'}, headers=auth_headers).get_json()['todo']
+        second = client.post(url, json={'title': 'Jam'}, headers=auth_headers).get_json()['todo']
+
+        assert first['order'] == 3 + ORDER_GAP
+        assert second['order'] == first['order'] + ORDER_GAP
+
+    def test_completing_moves_to_end(self, client, auth_headers, sample_todolist):
+        """Test completing a todo moves it after every other todo"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        todo_id = sample_todolist.todos[0].id
+
+        client.put(f'{url}/{todo_id}', json={'completed': True}, headers=auth_headers)
+        titles = [t['title'] for t in client.get(url, headers=auth_headers).get_json()['todos']]
+
+        assert titles == ['Eggs', 'Bread', 'Milk']
+
+    def test_reorder_assigns_gapped_keys(self, client, auth_headers, sample_todolist):
+        """Test a full reorder lays the list out ORDER_GAP apart"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        ids = [todo.id for todo in sample_todolist.todos][::-1]
+
+        client.put(f'{url}/reorder', json={'ordered_ids': ids}, headers=auth_headers)
+        todos = client.get(url, headers=auth_headers).get_json()['todos']
+
+        assert [t['id'] for t in todos] == ids
+        assert [t['order'] for t in todos] == [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP]
+
+
+class TestRebalance:
+    """Test renumbering a crowded scope"""
+
+    def test_rebalance_keeps_sequence(self, app, sample_todolist):
+        """Test rebalance respaces keys without changing the order"""
+        with app.app_context():
+            scope = list_scope(sample_todolist.id)
+            before = [t.id for t in Todo.query.filter(scope).order_by(Todo.order, Todo.id)]
+            assert rebalance(scope) == 3
+            db.session.commit()
+
+            todos = Todo.query.filter(scope).order_by(Todo.order, Todo.id).all()
+            assert [t.id for t in todos] == before
+            assert [t.order for t in todos] == [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP]
+
+    def test_rebalance_command(self, app, runner, sample_todolist):
+        """Test the CLI only respaces lists that have run out of room"""
+        result = runner.invoke(args=['rebalance-orders'])
+
+        assert 'Rebalanced 1 of 1 lists' in result.output
+        with app.app_context():
+            orders = [t.order for t in Todo.query.filter_by(todo_list_id=sample_todolist.id).order_by(Todo.order)]
+            assert orders == [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP]
+
+        result = runner.invoke(args=['rebalance-orders'])
+        assert 'Rebalanced 0 of 1 lists' in result.output
+
+    def test_rebalance_command_unlisted_todos(self, app, runner, test_user, test_user2, sample_todolist):
+        """Test each user's todos outside any list are respaced as a scope of their own"""
+        with app.app_context():
+            for user, orders in ((test_user, [5, 6, 7]), (test_user2, [ORDER_GAP, 2 * ORDER_GAP])):
+                for index, order in enumerate(orders):
+                    db.session.add(Todo(user_id=user.id, title=f'Loose {index}', order=order))
+            db.session.commit()
+
+        result = runner.invoke(args=['rebalance-orders'])
+
+        assert "Rebalanced 1 of 1 lists and 1 users' unlisted todos" in result.output
+        with app.app_context():
+            def unlisted(user):
+                query = Todo.query.filter_by(user_id=user.id, todo_list_id=None).order_by(Todo.order)
+                return [(t.title, t.order) for t in query]
+            assert unlisted(test_user) == [(f'Loose {i}', (i + 1) * ORDER_GAP) for i in range(3)]
+            assert unlisted(test_user2) == [('Loose 0', ORDER_GAP), ('Loose 1', 2 * ORDER_GAP)]
+
+
+class TestReorder:
+    """Test set-based reorder endpoints"""
+
+    def test_reorder_rejects_foreign_ids(self, client, auth_headers, auth_headers2, sample_todolist):
+        """Test IDs outside the list are rejected without changing anything"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        other = client.post('/todos', json={'title': 'Other'}, headers=auth_headers).get_json()['todo']
+        ids = [todo.id for todo in sample_todolist.todos]
+
+        response = client.put(f'{url}/reorder', json={'ordered_ids': ids[:2] + [other['id']]}, headers=auth_headers)
+        assert response.status_code == 400
+
+        response = client.put(f'{url}/reorder', json={'ordered_ids': ids + ids[:1]}, headers=auth_headers)
+        assert response.status_code == 400
+
+        titles = [t['title'] for t in client.get(url, headers=auth_headers).get_json()['todos']]
+        assert titles == ['Milk', 'Eggs', 'Bread']
+
+    def test_reorder_rejects_booleans(self, client, auth_headers, sample_todolist):
+        """Test true/false are not taken as todo IDs 1 and 0"""
+        ids = [todo.id for todo in sample_todolist.todos]
+        ordered = [True if todo_id == 1 else todo_id for todo_id in ids]
+        assert True in ordered
+
+        response = client.put(f'/todolists/{sample_todolist.id}/todos/reorder', json={'ordered_ids': ordered},
+                              headers=auth_headers)
+        assert response.status_code == 400
+        response = client.put('/todos/reorder', json={'ordered_ids': [True]}, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_simple_reorder_skips_other_users(self, client, auth_headers, auth_headers2):
+        """Test the simple reorder only touches the caller's todos"""
+        mine = [client.post('/todos', json={'title': f'Mine {i}'}, headers=auth_headers).get_json()['todo']['id']
+                for i in range(2)]
+        theirs = client.post('/todos', json={'title': 'Theirs'}, headers=auth_headers2).get_json()['todo']
+
+        response = client.put('/todos/reorder', json={'ordered_ids': [theirs['id']] + mine[::-1]},
+                              headers=auth_headers)
+        assert response.status_code == 200
+
+        assert [t['id'] for t in client.get('/todos', headers=auth_headers).get_json()['todos']] == mine[::-1]
+        assert client.get(f"/todos/{theirs['id']}", headers=auth_headers2).get_json()['todo']['order'] == theirs['order']
+
+
+class TestMoveTodo:
+    """Test moving a single todo next to a neighbour"""
+
+    def titles(self, client, auth_headers, list_id):
+        todos = client.get(f'/todolists/{list_id}/todos', headers=auth_headers).get_json()['todos']
+        return [t['title'] for t in todos]
+
+    @pytest.mark.parametrize('moving, body, expected', [
+        ('Milk', {'after_id': 'Eggs'}, ['Eggs', 'Milk', 'Bread']),
+        ('Bread', {'before_id': 'Milk'}, ['Bread', 'Milk', 'Eggs']),
+        ('Bread', {'after_id': None}, ['Bread', 'Milk', 'Eggs']),
+        ('Milk', {'before_id': None}, ['Eggs', 'Bread', 'Milk']),
+    ])
+    def test_move(self, client, auth_headers, sample_todolist, moving, body, expected):
+        """Test after/before a neighbour and to the top/bottom"""
+        ids = {todo.title: todo.id for todo in sample_todolist.todos}
+        body = {key: ids.get(value) for key, value in body.items()}
+
+        response = client.patch(f'/todolists/{sample_todolist.id}/todos/{ids[moving]}/move',
+                                json=body, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert self.titles(client, auth_headers, sample_todolist.id) == expected
+
+    def test_move_only_writes_moved_todo(self, client, auth_headers, sample_todolist):
+        """Test a move into an open gap leaves the neighbours' keys alone"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        ids = [todo.id for todo in sample_todolist.todos]
+        client.put(f'{url}/reorder', json={'ordered_ids': ids}, headers=auth_headers)
+
+        response = client.patch(f'{url}/{ids[2]}/move', json={'after_id': ids[0]}, headers=auth_headers)
+
+        assert response.get_json()['todo']['order'] == ORDER_GAP + ORDER_GAP // 2
+        orders = {t['id']: t['order'] for t in client.get(url, headers=auth_headers).get_json()['todos']}
+        assert orders[ids[0]] == ORDER_GAP
+        assert orders[ids[1]] == 2 * ORDER_GAP
+
+    @pytest.mark.parametrize('body', [{}, {'after_id': 1, 'before_id': 2}, {'after_id': 'x'}, {'after_id': 999},
+                                      {'after_id': True}, {'before_id': False}])
+    def test_move_invalid(self, client, auth_headers, sample_todolist, body):
+        """Test invalid move requests are rejected"""
+        todo_id = sample_todolist.todos[0].id
+        response = client.patch(f'/todolists/{sample_todolist.id}/todos/{todo_id}/move',
+                                json=body, headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_simple_move(self, client, auth_headers):
+        """Test moving a todo with the simple /todos endpoint"""
+        ids = [client.post('/todos', json={'title': f'Todo {i}'}, headers=auth_headers).get_json()['todo']['id']
+               for i in range(3)]
+
+        response = client.patch(f'/todos/{ids[0]}/move', json={'before_id': None}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert [t['id'] for t in client.get('/todos', headers=auth_headers).get_json()['todos']] == ids[1:] + ids[:1]
+
+    def test_simple_move_rejects_booleans(self, client, auth_headers):
+        """Test true/false are not taken as todo IDs 1 and 0"""
+        ids = [client.post('/todos', json={'title': f'Todo {i}'}, headers=auth_headers).get_json()['todo']['id']
+               for i in range(2)]
+
+        response = client.patch(f'/todos/{ids[1]}/move', json={'after_id': True}, headers=auth_headers)
+
+        assert response.status_code == 400
@@ -0,0 +1,186 @@
+"""
+Tests for the authenticated-user cache used by token_required and role_required
+"""
+import time
+import pytest
+from sqlalchemy import event
+from models import User, UserRole, db
+from principals import Principal, PrincipalCache, bump_security_epoch
+
+
+class TestPrincipalCache:
+    """Test the LRU/TTL cache itself"""
+
+    def test_lru_eviction_and_stats(self):
+        """Test the least recently used entry is evicted once the cache is full"""
+        cache = PrincipalCache(maxsize=2, ttl=60)
+        for user_id in (1, 2):
+            cache.put(Principal(user_id, UserRole.USER, True))
+        assert cache.get(1) is not None
+        cache.put(Principal(3, UserRole.USER, True))
+
+        assert cache.get(2) is None
+        assert cache.get(1).id == 1
+        stats = cache.stats()
+        assert (stats['size'], stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 1, 1)
+        assert stats['hit_rate'] == 0.6667
+
+    def test_expiry_and_invalidation(self):
+        """Test entries expire after the TTL and can be dropped explicitly"""
+        cache = PrincipalCache(maxsize=10, ttl=0)
+        cache.put(Principal(1, UserRole.USER, True))
+        time.sleep(0.01)
+        assert cache.get(1) is None
+
+        cache.ttl = 60
+        cache.put(Principal(1, UserRole.USER, True))
+        cache.invalidate(1)
+        assert cache.get(1) is None
+        assert (cache.stats()['expirations'], cache.stats()['invalidations']) == (1, 1)
+
+
+class TestCachedAuthorization:
+    """Test the decorators read principals from the cache"""
+
+    def test_repeat_requests_skip_user_lookup(self, app, client, admin_headers):
+        """Test only the first admin request reads the users table"""
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        for _ in range(3):
+            assert client.get('/admin/db/pool', headers=admin_headers).status_code == 200
+
+        # The security epoch snapshot is read separately, by epoch rather than by user
+        assert sum(1 for s in statements if s.startswith('SELECT') and 'users.role' in s) == 1
+        stats = client.get('/admin/cache/principals', headers=admin_headers).get_json()['principals']
+        assert (stats['hits'], stats['misses']) == (3, 1)
+
+    def test_demotion_takes_effect_immediately(self, client, admin_headers, test_user):
+        """Test changing a role through the API invalidates the cached principal"""
+        test_user.role = UserRole.ADMIN
+        db.session.commit()
+        response = client.post('/auth/login', json={'username': 'testuser', 'password': 'testpass123'})
+        headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+        assert client.get('/users', headers=headers).status_code == 200
+
+        client.put(f'/users/{test_user.id}', json={'role': 'user'}, headers=admin_headers)
+
+        # The demotion bumps the security epoch, so the old token is revoked outright
+        assert client.get('/users', headers=headers).status_code == 401
+        response = client.post('/auth/login', json={'username': 'testuser', 'password': 'testpass123'})
+        headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+        assert client.get('/users', headers=headers).status_code == 403
+        assert client.get('/auth/me', headers=headers).get_json()['user']['role'] == 'user'
+
+
+class TestSecurityEpoch:
+    """Test tokens issued before a user's security epoch are revoked"""
+
+    def _login(self, client, username, password):
+        response = client.post('/auth/login', json={'username': username, 'password': password})
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def test_password_reset_revokes_tokens(self, client, admin_headers, test_user, auth_headers):
+        """Test a token from before a password reset is rejected and a new login works"""
+        assert client.get('/auth/me', headers=auth_headers).status_code == 200
+
+        response = client.post(f'/users/{test_user.id}/reset-password', json={'password': 'newpass12345'},
+                               headers=admin_headers)
+        assert response.status_code == 200
+
+        response = client.get('/auth/me', headers=auth_headers)
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'Token has been revoked'
+        headers = self._login(client, 'testuser', 'newpass12345')
+        assert client.get('/auth/me', headers=headers).status_code == 200
+
+    def test_profile_changes_keep_tokens(self, client, admin_headers, test_user, auth_headers):
+        """Test edits that do not touch role or is_active leave tokens valid"""
+        client.put(f'/users/{test_user.id}', json={'email': 'new@example.com', 'role': 'user'},
+                   headers=admin_headers)
+
+        assert client.get('/auth/me', headers=auth_headers).status_code == 200
+
+    def test_other_processes_see_bumps_after_refresh(self, app, client, test_user, auth_headers):
+        """Test an epoch bumped behind this process's back is picked up at the next refresh"""
+        assert client.get('/auth/me', headers=auth_headers).status_code == 200
+        user = db.session.get(User, test_user.id)
+        bump_security_epoch(user)
+        db.session.commit()
+
+        assert client.get('/auth/me', headers=auth_headers).status_code == 200
+        app.extensions['security_epochs'].refresh = 0
+        assert client.get('/auth/me', headers=auth_headers).status_code == 401
+
+
+class TestClaimsAuthorization:
+    """Test role_required with AUTHZ_FROM_CLAIMS"""
+
+    def test_admin_requests_skip_user_lookup(self, app, client, admin_headers):
+        """Test role checks read the token's role claim rather than the users table"""
+        app.config['AUTHZ_FROM_CLAIMS'] = True
+        app.config['PRINCIPAL_CACHE_SIZE'] = 0
+        app.extensions['security_epochs'].refresh = 3600
+        client.get('/admin/db/pool', headers=admin_headers)
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        for _ in range(3):
+            assert client.get('/admin/db/pool', headers=admin_headers).status_code == 200
+
+        assert [s for s in statements if 'FROM users' in s] == []
+
+    def test_demotion_revokes_admin_token(self, app, client, admin_headers, test_user):
+        """Test a demoted admin's old token, whose role claim is stale, is rejected"""
+        app.config['AUTHZ_FROM_CLAIMS'] = True
+        test_user.role = UserRole.ADMIN
+        db.session.commit()
+        headers = self._login(client)
+        assert client.get('/users', headers=headers).status_code == 200
+
+        client.put(f'/users/{test_user.id}', json={'role': 'user'}, headers=admin_headers)
+
+        assert client.get('/users', headers=headers).status_code == 401
+        assert client.get('/users', headers=self._login(client)).status_code == 403
+
+    @pytest.mark.parametrize('mode', ['sync', 'async'])
+    def test_deleted_admin_token_refused(self, app, client, admin_headers, test_user, mode):
+        """Test a deleted admin's token is revoked although the user row is gone"""
+        from purge import run_purges
+        app.config['AUTHZ_FROM_CLAIMS'] = True
+        test_user.role = UserRole.ADMIN
+        db.session.commit()
+        headers = self._login(client)
+        assert client.get('/users', headers=headers).status_code == 200
+
+        client.delete(f'/users/{test_user.id}?mode={mode}', headers=admin_headers)
+        run_purges()
+
+        assert client.get('/users', headers=headers).status_code == 401
+        assert client.get('/admin/cache/principals', headers=headers).status_code == 401
+
+    def test_reused_id_is_not_revoked(self, client, admin_headers):
+        """Test a new user given a deleted user's ID can use their tokens"""
+        def register(name):
+            response = client.post('/auth/register', json={
+                'username': name, 'email': f'{name}@example.com', 'password': 'secret123'
+            })
+            data = response.get_json()
+            return data['user']['id'], {'Authorization': f"Bearer {data['access_token']}"}
+
+        user_id, _ = register('first')
+        client.delete(f'/users/{user_id}?mode=sync', headers=admin_headers)
+        reused_id, headers = register('second')
+
+        assert reused_id == user_id
+        assert client.get('/auth/me', headers=headers).status_code == 200
+
+    def _login(self, client):
+        response = client.post('/auth/login', json={'username': 'testuser', 'password': 'testpass123'})
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
@@ -0,0 +1,179 @@
+"""
+Tests for background deletion of users and todo lists
+"""
+from models import PurgeJob, Todo, TodoList, Tombstone, User, UserStats, db
+from purge import purge_next_chunk, run_purges
+
+
+class TestListPurge:
+    """Test DELETE /todolists/<id> in async mode"""
+
+    def test_list_is_hidden_then_purged(self, app, client, auth_headers, sample_todolist, sample_todo):
+        """Test the list disappears at once and its todos are purged in committed chunks"""
+        list_id = sample_todolist.id
+        app.config['PURGE_CHUNK_SIZE'] = 2
+
+        response = client.delete(f'/todolists/{list_id}?mode=async', headers=auth_headers)
+
+        assert response.status_code == 202
+        job = response.get_json()['purge']
+        assert (job['entity'], job['entity_id'], job['status'], job['total']) == ('todolist', list_id, 'pending', 3)
+        assert client.get(f'/todolists/{list_id}', headers=auth_headers).status_code == 404
+        assert client.get('/todolists', headers=auth_headers).get_json() == []
+        sync = client.get('/sync', query_string={'since': None}, headers=auth_headers).get_json()
+        assert [l['id'] for l in sync['todolists']] == []
+
+        assert purge_next_chunk()
+        with app.app_context():
+            job = db.session.get(PurgeJob, job['id'])
+            assert (job.status, job.purged) == ('running', 2)
+            assert Todo.query.execution_options(include_deleted=True).filter_by(todo_list_id=list_id).count() == 1
+
+        run_purges()
+        with app.app_context():
+            job = db.session.get(PurgeJob, job.id)
+            assert (job.status, job.purged) == ('done', 3)
+            assert TodoList.query.execution_options(include_deleted=True).filter_by(id=list_id).count() == 0
+            tombstones = Tombstone.query.filter_by(user_id=sample_todolist.user_id)
+            assert sorted((t.entity for t in tombstones)) == ['todo'] * 3 + ['todolist']
+        stats = client.get('/todos/stats', headers=auth_headers).get_json()['stats']
+        assert stats['total'] == 1
+
+    def test_todos_are_hidden_with_list(self, client, auth_headers, sample_todolist, sample_todo):
+        """Test a hidden list's todos leave every user-wide view, edit and count before they are purged"""
+        todo_id = sample_todolist.todos[0].id
+        client.delete(f'/todolists/{sample_todolist.id}?mode=async', headers=auth_headers)
+
+        todos = client.get('/todos', headers=auth_headers).get_json()['todos']
+        assert [t['title'] for t in todos] == ['Test Todo']
+        assert client.get('/todos/search', query_string={'q': 'milk'}, headers=auth_headers).get_json()['count'] == 0
+        assert client.get(f'/todos/{todo_id}', headers=auth_headers).status_code == 404
+        response = client.put(f'/todos/{todo_id}', json={'title': 'Changed'}, headers=auth_headers)
+        assert response.status_code == 404
+        stats = client.get('/todos/stats', headers=auth_headers).get_json()['stats']
+        assert (stats['total'], stats['completed']) == (1, 0)
+
+        run_purges()
+        stats = client.get('/todos/stats', headers=auth_headers).get_json()['stats']
+        assert (stats['total'], stats['completed']) == (1, 0)
+
+    def test_auto_mode_uses_threshold(self, app, client, auth_headers, sample_todolist):
+        """Test lists with at least PURGE_ASYNC_THRESHOLD todos are purged in the background"""
+        empty = client.post('/todolists', json={'name': 'Empty'}, headers=auth_headers).get_json()['id']
+        app.config['PURGE_ASYNC_THRESHOLD'] = 3
+
+        assert client.delete(f'/todolists/{empty}', headers=auth_headers).status_code == 200
+        assert client.delete(f'/todolists/{sample_todolist.id}', headers=auth_headers).status_code == 202
+        assert client.delete(f'/todolists/{sample_todolist.id}', headers=auth_headers).status_code == 404
+
+    def test_invalid_mode(self, client, auth_headers, sample_todolist):
+        """Test unknown modes are rejected"""
+        response = client.delete(f'/todolists/{sample_todolist.id}?mode=later', headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestUserPurge:
+    """Test DELETE /users/<id> in async mode"""
+
+    def test_user_is_hidden_then_purged(self, app, client, admin_headers, test_user, sample_todolist, sample_todo):
+        """Test the user can no longer log in or be listed, and their rows are purged"""
+        user_id = test_user.id
+        app.config['PURGE_CHUNK_SIZE'] = 2
+
+        response = client.delete(f'/users/{user_id}?mode=async', headers=admin_headers)
+
+        assert response.status_code == 202
+        assert response.get_json()['purge']['total'] == 4
+        assert user_id not in [u['id'] for u in client.get('/users', headers=admin_headers).get_json()]
+        assert client.post('/auth/login', json={'username': 'testuser', 'password': 'testpass123'}).status_code == 401
+        # The username stays taken until the purge is done
+        response = client.post('/auth/register', json={
+            'username': 'testuser', 'email': 'other@example.com', 'password': 'testpass123'
+        })
+        assert response.status_code == 409
+
+        assert run_purges() > 2
+        with app.app_context():
+            for model in (Todo, TodoList, Tombstone, UserStats):
+                query = model.query.execution_options(include_deleted=True)
+                assert query.filter_by(user_id=user_id).count() == 0
+            assert User.query.execution_options(include_deleted=True).filter_by(id=user_id).count() == 0
+            assert PurgeJob.query.one().to_dict()['progress'] == 100.0
+
+    def test_failing_job_is_marked_failed(self, app, client, admin_headers, test_user, monkeypatch):
+        """Test a job whose chunks keep failing stops after PURGE_MAX_ATTEMPTS"""
+        import purge
+        client.delete(f'/users/{test_user.id}?mode=async', headers=admin_headers)
+
+        def broken(job):
+            raise RuntimeError('disk full')
+        monkeypatch.setitem(purge.PURGERS, 'user', broken)
+        run_purges()
+
+        with app.app_context():
+            job = PurgeJob.query.one()
+            assert (job.status, job.attempts, job.error) == ('failed', purge.PURGE_MAX_ATTEMPTS, 'disk full')
+
+
+class TestPurgeProgress:
+    """Test GET /admin/purges"""
+
+    def test_admins_see_progress(self, client, admin_headers, auth_headers, sample_todolist):
+        """Test admins can list jobs and filter them by status"""
+        client.delete(f'/todolists/{sample_todolist.id}?mode=async', headers=auth_headers)
+
+        data = client.get('/admin/purges', headers=admin_headers).get_json()
+        assert [(j['entity'], j['status'], j['progress']) for j in data['purges']] == [('todolist', 'pending', 0.0)]
+        job_id = data['purges'][0]['id']
+
+        run_purges()
+        assert client.get(f'/admin/purges/{job_id}', headers=admin_headers).get_json()['purge']['status'] == 'done'
+        assert client.get('/admin/purges?status=pending', headers=admin_headers).get_json()['count'] == 0
+        assert client.get('/admin/purges/999', headers=admin_headers).status_code == 404
+        assert client.get('/admin/purges', headers=auth_headers).status_code == 403
+
+
+class TestPurgeLeases:
+    """Test workers lease jobs and keep lock contention apart from failures"""
+
+    def test_leased_job_is_skipped(self, app, client, auth_headers, sample_todolist, sample_todo):
+        """Test a job leased by another worker is not run until its lease runs out"""
+        from datetime import datetime, timedelta
+        client.delete(f'/todolists/{sample_todolist.id}?mode=async', headers=auth_headers)
+        with app.app_context():
+            job = PurgeJob.query.one()
+            job.owner, job.lease_until = 'other-host:1:1', datetime.utcnow() + timedelta(minutes=5)
+            db.session.commit()
+
+        assert not purge_next_chunk()
+        with app.app_context():
+            job = PurgeJob.query.one()
+            assert (job.status, job.purged) == ('pending', 0)
+            job.lease_until = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+
+        run_purges()
+        with app.app_context():
+            job = PurgeJob.query.one()
+            assert (job.status, job.purged, job.owner) == ('done', 3, None)
+
+    def test_lock_contention_is_not_an_attempt(self, app, client, admin_headers, test_user, monkeypatch):
+        """Test a chunk that loses the database lock is retried without counting against the job"""
+        import purge
+        from sqlalchemy.exc import OperationalError
+        client.delete(f'/users/{test_user.id}?mode=async', headers=admin_headers)
+
+        def locked(job):
+            raise OperationalError('DELETE FROM todos', {}, Exception('database is locked'))
+        monkeypatch.setitem(purge.PURGERS, 'user', locked)
+        for _ in range(purge.PURGE_MAX_ATTEMPTS + 1):
+            assert purge_next_chunk()
+
+        with app.app_context():
+            job = PurgeJob.query.one()
+            assert (job.status, job.attempts, job.owner) == ('running', 0, None)
+
+    def test_create_app_starts_no_worker(self, app):
+        """Test only the server entry point starts a worker thread"""
+        assert 'purge_worker' not in app.extensions
@@ -0,0 +1,98 @@
+"""
+Tests that the hot todo queries are served by the composite indexes
+"""
+import pytest
+from sqlalchemy import text
+from models import db, Todo, TodoList, User, UserRole
+
+
+def explain(query):
+    """Return the database query plan for a Flask-SQLAlchemy query as text"""
+    statement = query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'literal_binds': True}
+    )
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+    if db.engine.dialect.name == 'postgresql':
+        # Tiny test tables always favour a sequential scan, so take it off the table
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+        rows = db.session.execute(text(f'EXPLAIN {statement}')).fetchall()
+        return '\n'.join(row[0] for row in rows)
+    pytest.skip(f'No query plan check for {db.engine.dialect.name}')
+
+
+class TestTodoQueryPlans:
+    """Test that list, user and stats queries use the composite indexes"""
+
+    def test_list_view_uses_list_order_index(self, app, test_user):
+        """Test todos in a list ordered by position use (todo_list_id, order)"""
+        with app.app_context():
+            query = Todo.query.filter_by(todo_list_id=1).order_by(Todo.order.asc())
+            plan = explain(query)
+            assert 'ix_todos_list_order' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_user_view_uses_user_order_index(self, app, test_user):
+        """Test a user's todos ordered by position use (user_id, order)"""
+        with app.app_context():
+            query = Todo.query.filter_by(user_id=test_user.id).order_by(Todo.order.asc())
+            plan = explain(query)
+            assert 'ix_todos_user_order' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_completed_count_uses_user_completed_index(self, app, test_user):
+        """Test completed stats count uses (user_id, completed)"""
+        with app.app_context():
+            query = db.session.query(db.func.count(Todo.id)).filter_by(
+                user_id=test_user.id, completed=True
+            )
+            assert 'ix_todos_user_completed' in explain(query)
+
+    def test_todolists_by_user_uses_index(self, app, test_user):
+        """Test a user's lists are looked up through todolists(user_id, change_seq)"""
+        with app.app_context():
+            query = TodoList.query.filter_by(user_id=test_user.id)
+            assert 'ix_todolists_user_change_seq' in explain(query)
+
+    def test_sync_delta_uses_change_seq_index(self, app, test_user):
+        """Test a user's todos changed since a sequence use (user_id, change_seq)"""
+        with app.app_context():
+            query = Todo.query.filter(Todo.user_id == test_user.id, Todo.change_seq > 10)
+            assert 'ix_todos_user_change_seq' in explain(query)
+
+    def test_export_uses_user_order_index(self, app, test_user):
+        """Test the export's todo scan reads (user_id, order) in index order without sorting"""
+        with app.app_context():
+            query = Todo.query.filter_by(user_id=test_user.id).order_by(Todo.order, Todo.id)
+            plan = explain(query)
+            assert 'ix_todos_user_order' in plan
+            assert 'TEMP B-TREE' not in plan
+
+
+class TestUserQueryPlans:
+    """Test that the admin user listing filters are served by indexes"""
+
+    def test_role_filter_uses_role_index(self, app, test_user):
+        """Test a role filter reads (role, id) in cursor order without sorting"""
+        with app.app_context():
+            query = User.query.filter(User.role == UserRole.ADMIN, User.id > 10).order_by(User.id)
+            plan = explain(query)
+            assert 'ix_users_role_id' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_active_filter_uses_active_index(self, app, test_user):
+        """Test an is_active filter reads (is_active, id) in cursor order without sorting"""
+        with app.app_context():
+            query = User.query.filter(User.is_active == False).order_by(User.id)
+            plan = explain(query)
+            assert 'ix_users_active_id' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_username_prefix_uses_username_index(self, app, test_user):
+        """Test a username prefix range is a seek on the unique username index"""
+        with app.app_context():
+            query = User.query.filter(User.username >= 'abc', User.username < 'abc\U0010ffff')
+            plan = explain(query)
+            assert 'USING INDEX' in plan and 'username' in plan
@@ -0,0 +1,135 @@
+"""
+Tests for read-replica routing with read-your-writes tokens
+"""
+import os
+import sqlite3
+import tempfile
+import pytest
+from app import create_app
+from models import db, User
+from principals import bump_security_epoch
+from routing import TOKEN_HEADER
+
+
+@pytest.fixture
+def replicated(monkeypatch):
+    """An app with a primary and a replica SQLite file and a manual replicate() step"""
+    directory = tempfile.mkdtemp()
+    primary = os.path.join(directory, 'primary.db')
+    replica = os.path.join(directory, 'replica.db')
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{primary}')
+    monkeypatch.setenv('REPLICA_DATABASE_URL', f'sqlite:///{replica}')
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-jwt-secret-that-is-long-enough')
+    monkeypatch.setenv('SECRET_KEY', 'test-secret-key')
+
+    app = create_app()
+    app.config['TESTING'] = True
+
+    def replicate():
+        """Copy the primary onto the replica, i.e. let the replica catch up"""
+        source = sqlite3.connect(primary)
+        target = sqlite3.connect(replica)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    with app.app_context():
+        db.create_all()
+    replicate()
+    yield app, app.test_client(), replicate
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def register(client):
+    response = client.post('/auth/register', json={
+        'username': 'replicauser', 'email': 'replica@example.com', 'password': 'secret123'
+    })
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+class TestReplicaRouting:
+    """Test GETs go to the replica unless the client just wrote"""
+
+    def test_lagging_replica_serves_reads(self, replicated):
+        """Test a read without a token is served from the (stale) replica"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+
+        client.post('/todos', json={'title': 'Not replicated yet'}, headers=headers)
+
+        assert client.get('/todos', headers=headers).get_json()['count'] == 0
+        replicate()
+        assert client.get('/todos', headers=headers).get_json()['count'] == 1
+
+    def test_token_pins_reads_to_primary(self, replicated):
+        """Test a client echoing its write token reads its own write"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+
+        response = client.post('/todos', json={'title': 'Mine'}, headers=headers)
+        token = response.headers[TOKEN_HEADER]
+
+        data = client.get('/todos', headers={**headers, TOKEN_HEADER: token}).get_json()
+        assert data['count'] == 1
+
+    def test_expired_or_forged_token_uses_replica(self, replicated):
+        """Test tokens older than REPLICA_PIN_SECONDS or not signed by us are ignored"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+
+        token = client.post('/todos', json={'title': 'Mine'}, headers=headers).headers[TOKEN_HEADER]
+        app.config['REPLICA_PIN_SECONDS'] = -1
+        assert client.get('/todos', headers={**headers, TOKEN_HEADER: token}).get_json()['count'] == 0
+
+        app.config['REPLICA_PIN_SECONDS'] = 60
+        assert client.get('/todos', headers={**headers, TOKEN_HEADER: 'forged'}).get_json()['count'] == 0
+
+    def test_writes_always_use_primary(self, replicated):
+        """Test non-GET requests never touch the replica"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+
+        todo = client.post('/todos', json={'title': 'Mine'}, headers=headers).get_json()['todo']
+        response = client.put(f"/todos/{todo['id']}", json={'completed': True}, headers=headers)
+
+        assert response.status_code == 200
+
+    def test_missing_stats_row_created_on_primary(self, replicated):
+        """Test a stats read that has to create the row does so on the primary"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+
+        response = client.get('/todos/stats', headers=headers)
+
+        assert response.status_code == 200
+        assert response.get_json()['stats']['total'] == 0
+
+
+class TestRevocationOnReplica:
+    """Test token revocation does not depend on the replica"""
+
+    def test_revoked_token_rejected_while_replica_lags(self, replicated):
+        """Test security epochs are read from the primary in replica-read views"""
+        app, client, replicate = replicated
+        headers = register(client)
+        replicate()
+        with app.app_context():
+            user = User.query.filter_by(username='replicauser').one()
+            bump_security_epoch(user)
+            db.session.commit()
+        app.extensions['security_epochs'].refresh = 0
+
+        # The replica still has the old epoch; the token must be refused anyway
+        response = client.get('/todolists', headers=headers)
+
+        assert response.status_code == 401
+        assert response.get_json()['error'] == 'Token has been revoked'
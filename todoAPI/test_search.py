@@ -0,0 +1,125 @@
+"""
+Tests for full-text todo search
+"""
+import pytest
+from models import Todo, db
+from pagination import encode_cursor
+
+
+def search(client, headers, **params):
+    return client.get('/todos/search', query_string=params, headers=headers)
+
+
+class TestSearchTodos:
+    """Test GET /todos/search"""
+
+    def test_search_matches_title_and_description(self, client, auth_headers, sample_todo, completed_todo):
+        """Test terms match titles and descriptions"""
+        data = search(client, auth_headers, q='completed').get_json()
+
+        assert [todo['id'] for todo in data['todos']] == [completed_todo.id]
+        assert search(client, auth_headers, q='test todo').get_json()['count'] == 1
+
+    def test_prefix_matching(self, client, auth_headers, sample_todolist):
+        """Test every term is matched as a prefix"""
+        data = search(client, auth_headers, q='bre').get_json()
+
+        assert [todo['title'] for todo in data['todos']] == ['Bread']
+
+    def test_title_matches_rank_first(self, client, auth_headers):
+        """Test a title match outranks a description match"""
+        client.post('/todos', json={'title': 'Call plumber', 'description': 'About the garden tap'},
+                    headers=auth_headers)
+        client.post('/todos', json={'title': 'Garden', 'description': 'Weeding'}, headers=auth_headers)
+
+        data = search(client, auth_headers, q='garden').get_json()
+
+        assert [todo['title'] for todo in data['todos']] == ['Garden', 'Call plumber']
+
+    def test_index_follows_updates_and_deletes(self, client, auth_headers, sample_todo):
+        """Test edits and deletes are reflected in results"""
+        client.put(f'/todos/{sample_todo.id}', json={'title': 'Renamed'}, headers=auth_headers)
+        assert search(client, auth_headers, q='renamed').get_json()['count'] == 1
+        assert search(client, auth_headers, q='test').get_json()['count'] == 1  # still in description
+
+        client.delete(f'/todos/{sample_todo.id}', headers=auth_headers)
+        assert search(client, auth_headers, q='renamed').get_json()['count'] == 0
+
+    def test_set_based_writes_are_indexed(self, app, client, auth_headers, sample_todo):
+        """Test statements that bypass the ORM keep the index in step"""
+        with app.app_context():
+            db.session.query(Todo).filter_by(id=sample_todo.id).update(
+                {'title': 'Bulk edited'}, synchronize_session=False
+            )
+            db.session.commit()
+
+        assert search(client, auth_headers, q='bulk').get_json()['count'] == 1
+
+    def test_restrict_to_list(self, client, auth_headers, sample_todolist):
+        """Test list_id limits results to one list"""
+        client.post('/todos', json={'title': 'Milk the cow'}, headers=auth_headers)
+
+        assert search(client, auth_headers, q='milk').get_json()['count'] == 2
+        data = search(client, auth_headers, q='milk', list_id=sample_todolist.id).get_json()
+        assert [todo['todo_list_id'] for todo in data['todos']] == [sample_todolist.id]
+
+    def test_pagination(self, client, auth_headers):
+        """Test pages follow rank order without gaps or repeats"""
+        for index in range(5):
+            client.post('/todos', json={'title': f'Report {index}'}, headers=auth_headers)
+
+        seen, cursor = [], None
+        while True:
+            params = {'q': 'report', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = search(client, auth_headers, **params).get_json()
+            seen.extend(todo['id'] for todo in data['todos'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+
+        assert len(seen) == 5
+        assert len(set(seen)) == 5
+
+    @pytest.mark.parametrize('cursor', [encode_cursor([{'a': 1}, 1]), encode_cursor(['0', 1]),
+                                        encode_cursor([0.5, True]), encode_cursor([0.5])])
+    def test_malformed_cursor(self, client, auth_headers, sample_todo, cursor):
+        """Test cursors whose values have the wrong types are rejected"""
+        response = search(client, auth_headers, q='milk', limit=2, cursor=cursor)
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid cursor'
+
+    def test_default_page_cursor(self, client, auth_headers):
+        """Test the cursor of a search without a limit leads to the next default-sized page"""
+        from search import SEARCH_DEFAULT_LIMIT
+        for index in range(SEARCH_DEFAULT_LIMIT + 3):
+            client.post('/todos', json={'title': f'Report {index}'}, headers=auth_headers)
+
+        first = search(client, auth_headers, q='report').get_json()
+        assert first['count'] == SEARCH_DEFAULT_LIMIT
+        response = search(client, auth_headers, q='report', cursor=first['next_cursor'])
+
+        assert response.status_code == 200
+        second = response.get_json()
+        assert second['count'] == 3
+        assert second['next_cursor'] is None
+        assert not {t['id'] for t in first['todos']} & {t['id'] for t in second['todos']}
+
+    def test_user_isolation(self, client, auth_headers2, sample_todo, sample_todolist):
+        """Test users only find their own todos and lists"""
+        assert search(client, auth_headers2, q='test').get_json()['count'] == 0
+        response = search(client, auth_headers2, q='milk', list_id=sample_todolist.id)
+        assert response.status_code == 404
+
+    def test_query_syntax_is_not_interpreted(self, client, auth_headers, sample_todo):
+        """Test quotes and FTS operators in the query are treated as plain words"""
+        response = search(client, auth_headers, q='"test" OR NEAR( todo* -')
+
+        assert response.status_code == 200
+
+    def test_empty_query(self, client, auth_headers):
+        """Test a query without words is rejected"""
+        assert search(client, auth_headers, q='  ').status_code == 400
+        assert search(client, auth_headers).status_code == 400
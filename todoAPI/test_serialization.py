@@ -0,0 +1,142 @@
+"""
+Tests for the JSON providers and the row serialization path
+"""
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from models import db, Todo
+from serialization import (OrjsonProvider, StdlibJSONProvider, FieldsError, TODO_FIELDS,
+                           json_provider_class, parse_fields, rows_to_dicts, rows_to_json,
+                           select_todo_fields, orjson)
+
+
+class TestJSONProviders:
+    """Test both providers produce the same documents"""
+
+    @pytest.mark.parametrize('provider', [StdlibJSONProvider, OrjsonProvider])
+    def test_datetimes_are_iso_8601(self, app, provider):
+        """Test datetimes serialize the same way as to_dict()'s isoformat()"""
+        if provider is OrjsonProvider and orjson is None:
+            pytest.skip('orjson is not installed')
+        moment = datetime(2025, 7, 27, 10, 35, 0, 123456)
+
+        with app.app_context():
+            body = provider(app).dumps({'at': moment})
+
+        assert json.loads(body) == {'at': moment.isoformat()}
+
+    @pytest.mark.parametrize('provider', [StdlibJSONProvider, OrjsonProvider])
+    def test_list_responses_match_to_dict(self, app, client, auth_headers, sample_todolist, provider):
+        """Test row-based list responses equal the ORM to_dict() output under either provider"""
+        if provider is OrjsonProvider and orjson is None:
+            pytest.skip('orjson is not installed')
+        app.json = provider(app)
+
+        data = client.get(f'/todolists/{sample_todolist.id}/todos', headers=auth_headers).get_json()
+
+        with app.app_context():
+            expected = [todo.to_dict() for todo in
+                        Todo.query.filter_by(todo_list_id=sample_todolist.id).order_by(Todo.order)]
+        assert data['todos'] == expected
+
+    def test_invalid_json_body(self, client, auth_headers):
+        """Test malformed request JSON is still rejected with 400"""
+        response = client.post('/todos', data='{"title": ', content_type='application/json',
+                               headers=auth_headers)
+
+        assert response.status_code == 400
+
+    def test_provider_selection(self):
+        """Test JSON_PROVIDER picks the provider"""
+        assert json_provider_class('stdlib') is StdlibJSONProvider
+        if orjson is not None:
+            assert json_provider_class('orjson') is OrjsonProvider
+            assert json_provider_class('') is OrjsonProvider
+
+
+class TestRowSerialization:
+    """Test the column-row serialization path"""
+
+    def test_rows_to_json_matches_to_dict(self, app, sample_todolist):
+        """Test encoded rows decode to the same objects as to_dict()"""
+        with app.app_context():
+            query = Todo.query.filter_by(todo_list_id=sample_todolist.id).order_by(Todo.id)
+            expected = [todo.to_dict() for todo in query]
+            rows = select_todo_fields(query).all()
+
+            assert json.loads(rows_to_json(rows)) == expected
+            assert [list(d) for d in rows_to_dicts(rows)] == [list(d) for d in expected]
+
+
+class TestSparseFieldsets:
+    """Test ?fields= limits both the columns read and the keys returned"""
+
+    def capture_statements(self, app):
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        return statements
+
+    def test_parse_fields(self):
+        """Test fields come back in canonical order with id always included"""
+        assert parse_fields(None, TODO_FIELDS) == TODO_FIELDS
+        assert parse_fields('completed, title', TODO_FIELDS) == ('id', 'title', 'completed')
+        with pytest.raises(FieldsError):
+            parse_fields('title,password_hash', TODO_FIELDS)
+
+    def test_todo_list_fields(self, app, client, auth_headers, sample_todolist):
+        """Test list views return and select only the requested todo fields"""
+        statements = self.capture_statements(app)
+        for url in (f'/todolists/{sample_todolist.id}/todos?fields=title,completed,order',
+                    '/todos?fields=title,completed,order&limit=2'):
+            statements.clear()
+            data = client.get(url, headers=auth_headers).get_json()
+
+            assert [list(todo) for todo in data['todos']] == [['id', 'title', 'completed', 'order']] * len(data['todos'])
+            assert data['todos'][0]['title'] == 'Milk'
+            select = next(s for s in statements if 'FROM todos' in s)
+            assert 'description' not in select and 'created_at' not in select
+
+    def test_pagination_keys_without_order(self, client, auth_headers, sample_todolist):
+        """Test cursors still work when the page's sort keys are not requested"""
+        url = f'/todolists/{sample_todolist.id}/todos?fields=title&limit=2'
+        first = client.get(url, headers=auth_headers).get_json()
+        second = client.get(f"{url}&cursor={first['next_cursor']}", headers=auth_headers).get_json()
+
+        assert [todo['title'] for todo in first['todos'] + second['todos']] == ['Milk', 'Eggs', 'Bread']
+        assert list(second['todos'][0]) == ['id', 'title']
+
+    def test_single_todo_fields(self, app, client, auth_headers, sample_todo):
+        """Test detail views defer the columns that were not requested"""
+        todo_id = sample_todo.id
+        statements = self.capture_statements(app)
+        response = client.get(f'/todos/{todo_id}?fields=completed', headers=auth_headers)
+
+        assert response.get_json()['todo'] == {'id': todo_id, 'completed': False}
+        assert not any('description' in s for s in statements)
+
+    def test_todolist_fields(self, app, client, auth_headers, sample_todolist):
+        """Test list endpoints take fields for lists and todo_fields for their todos"""
+        data = client.get('/todolists?fields=name,todos&todo_fields=title', headers=auth_headers).get_json()
+        assert data == [{'id': sample_todolist.id, 'name': 'Groceries', 'todos': [
+            {'id': todo['id'], 'title': todo['title']} for todo in data[0]['todos']
+        ]}]
+
+        list_id = sample_todolist.id
+        statements = self.capture_statements(app)
+        data = client.get(f'/todolists/{list_id}?fields=name', headers=auth_headers).get_json()
+        assert data == {'id': list_id, 'name': 'Groceries'}
+        assert not any('FROM todos' in s for s in statements)
+
+        data = client.get('/todolists?view=summary&fields=todo_count', headers=auth_headers).get_json()
+        assert data == [{'id': sample_todolist.id, 'todo_count': 3}]
+
+    def test_unknown_field(self, client, auth_headers, sample_todolist):
+        """Test unknown fields are rejected with 400"""
+        for url in ('/todos?fields=secret', f'/todolists/{sample_todolist.id}/todos/1?fields=secret',
+                    '/todolists?fields=todo_count', f'/todolists/{sample_todolist.id}?todo_fields=x',
+                    '/todos/search?q=milk&fields=rank'):
+            assert client.get(url, headers=auth_headers).status_code == 400
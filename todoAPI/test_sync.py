@@ -0,0 +1,121 @@
+"""
+Tests for delta sync with change sequences and tombstones
+"""
+from datetime import datetime, timedelta
+from models import Todo, Tombstone, db
+from pagination import encode_cursor
+
+
+def sync(client, headers, since=None):
+    query = {'since': since} if since else {}
+    return client.get('/sync', query_string=query, headers=headers)
+
+
+class TestSync:
+    """Test GET /sync"""
+
+    def test_first_sync_is_full(self, client, auth_headers, sample_todolist, sample_todo):
+        """Test a sync without a cursor returns everything"""
+        data = sync(client, auth_headers).get_json()
+
+        assert data['full'] is True
+        assert [l['name'] for l in data['todolists']] == ['Groceries']
+        assert 'todos' not in data['todolists'][0]
+        assert len(data['todos']) == 4
+        assert data['deleted'] == {'todolists': [], 'todos': []}
+
+    def test_nothing_changed(self, client, auth_headers, sample_todolist):
+        """Test a sync right after another returns no rows"""
+        cursor = sync(client, auth_headers).get_json()['cursor']
+
+        data = sync(client, auth_headers, cursor).get_json()
+
+        assert data['full'] is False
+        assert (data['todolists'], data['todos']) == ([], [])
+
+    def test_only_changes_are_returned(self, client, auth_headers, sample_todolist, sample_todo):
+        """Test creates and updates after the cursor, and nothing else, are returned"""
+        cursor = sync(client, auth_headers).get_json()['cursor']
+        url = f'/todolists/{sample_todolist.id}/todos'
+        created = client.post(url, json={'title': 'Butter'}, headers=auth_headers).get_json()['todo']
+        client.put(f'/todos/{sample_todo.id}', json={'completed': True}, headers=auth_headers)
+        client.put(f'/todolists/{sample_todolist.id}', json={'name': 'Shopping'}, headers=auth_headers)
+
+        data = sync(client, auth_headers, cursor).get_json()
+
+        assert sorted(todo['id'] for todo in data['todos']) == sorted([created['id'], sample_todo.id])
+        assert [l['name'] for l in data['todolists']] == ['Shopping']
+
+        assert sync(client, auth_headers, data['cursor']).get_json()['todos'] == []
+
+    def test_deletes_leave_tombstones(self, client, auth_headers, sample_todolist, sample_todo):
+        """Test deleted todos and lists, including cascaded todos, are reported"""
+        cursor = sync(client, auth_headers).get_json()['cursor']
+        with client.application.app_context():
+            list_todo_ids = [t.id for t in Todo.query.filter_by(todo_list_id=sample_todolist.id)]
+
+        client.delete(f'/todos/{sample_todo.id}', headers=auth_headers)
+        client.delete(f'/todolists/{sample_todolist.id}', headers=auth_headers)
+
+        data = sync(client, auth_headers, cursor).get_json()
+        assert data['deleted']['todolists'] == [sample_todolist.id]
+        assert sorted(data['deleted']['todos']) == sorted([sample_todo.id] + list_todo_ids)
+        assert data['todos'] == []
+
+    def test_reorder_is_synced(self, client, auth_headers, sample_todolist):
+        """Test set-based reorders stamp the todos they move"""
+        cursor = sync(client, auth_headers).get_json()['cursor']
+        url = f'/todolists/{sample_todolist.id}/todos'
+        ids = [todo['id'] for todo in client.get(url, headers=auth_headers).get_json()['todos']]
+
+        client.put(f'{url}/reorder', json={'ordered_ids': ids[::-1]}, headers=auth_headers)
+
+        data = sync(client, auth_headers, cursor).get_json()
+        assert sorted(todo['id'] for todo in data['todos']) == sorted(ids)
+
+    def test_user_isolation(self, client, auth_headers, auth_headers2, sample_todo):
+        """Test users only sync their own data"""
+        cursor = sync(client, auth_headers2).get_json()['cursor']
+        client.put(f'/todos/{sample_todo.id}', json={'title': 'Changed'}, headers=auth_headers)
+
+        assert sync(client, auth_headers2).get_json()['todos'] == []
+        assert sync(client, auth_headers2, cursor).get_json()['todos'] == []
+
+    def test_expired_cursor_forces_full_sync(self, app, client, auth_headers, sample_todo):
+        """Test a cursor older than the retention window gets a full resync"""
+        old = int((datetime.utcnow() - timedelta(days=app.config['SYNC_RETENTION_DAYS'] + 1)).timestamp())
+
+        data = sync(client, auth_headers, encode_cursor([1, old])).get_json()
+
+        assert data['full'] is True
+        assert [todo['id'] for todo in data['todos']] == [sample_todo.id]
+
+    def test_invalid_cursor(self, client, auth_headers):
+        """Test malformed cursors are rejected"""
+        assert sync(client, auth_headers, 'not-a-cursor').status_code == 400
+        assert sync(client, auth_headers, encode_cursor(['a', 'b'])).status_code == 400
+        assert sync(client, auth_headers, encode_cursor([True, 1])).status_code == 400
+        assert sync(client, auth_headers, encode_cursor([{'a': 1}, 1])).status_code == 400
+
+    def test_requires_auth(self, client):
+        """Test sync requires a token"""
+        assert client.get('/sync').status_code == 401
+
+
+class TestPurgeTombstones:
+    """Test the purge-tombstones command"""
+
+    def test_purges_only_expired(self, app, runner, client, auth_headers, sample_todo, completed_todo):
+        """Test tombstones past the retention window are removed"""
+        client.delete(f'/todos/{sample_todo.id}', headers=auth_headers)
+        client.delete(f'/todos/{completed_todo.id}', headers=auth_headers)
+        with app.app_context():
+            old = Tombstone.query.filter_by(entity_id=sample_todo.id).one()
+            old.deleted_at = datetime.utcnow() - timedelta(days=app.config['SYNC_RETENTION_DAYS'] + 1)
+            db.session.commit()
+
+        result = runner.invoke(args=['purge-tombstones'])
+
+        assert 'Purged 1 tombstones' in result.output
+        with app.app_context():
+            assert [t.entity_id for t in Tombstone.query.all()] == [completed_todo.id]
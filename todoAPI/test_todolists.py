@@ -0,0 +1,191 @@
+"""
+Tests for todo list endpoints and todos nested under a list
+"""
+import pytest
+from models import Todo, db
+from pagination import encode_cursor
+
+# Well-formed cursors whose values do not fit the sort key's columns
+MALFORMED_CURSORS = [encode_cursor([{'a': 1}]), encode_cursor(['1']), encode_cursor([True]),
+                     encode_cursor([{'a': 1}, 1]), encode_cursor([1, '2']), encode_cursor([None, 1])]
+
+
+class TestGetTodoLists:
+    """Test get todo lists endpoint"""
+
+    def test_get_todolists_unpaginated(self, client, auth_headers, sample_todolist):
+        """Test lists are returned as a bare array when no limit is given"""
+        response = client.get('/todolists', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert isinstance(data, list)
+        assert data[0]['name'] == 'Groceries'
+        assert len(data[0]['todos']) == 3
+
+    def test_get_todolists_paginated(self, client, auth_headers):
+        """Test walking the lists with limit and next_cursor"""
+        for name in ['A', 'B', 'C']:
+            client.post('/todolists', json={'name': name}, headers=auth_headers)
+
+        response = client.get('/todolists?limit=2', headers=auth_headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [l['name'] for l in data['todolists']] == ['A', 'B']
+        assert data['next_cursor']
+
+        response = client.get(f"/todolists?limit=2&cursor={data['next_cursor']}", headers=auth_headers)
+        data = response.get_json()
+        assert [l['name'] for l in data['todolists']] == ['C']
+        assert data['next_cursor'] is None
+
+    @pytest.mark.parametrize('cursor', MALFORMED_CURSORS)
+    def test_malformed_cursor(self, client, auth_headers, sample_todolist, cursor):
+        """Test cursors whose values have the wrong types are rejected"""
+        response = client.get(f'/todolists?limit=2&cursor={cursor}', headers=auth_headers)
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid cursor'
+
+
+class TestListTodosPagination:
+    """Test cursor pagination of todos in a list"""
+
+    def test_pages_follow_order(self, client, auth_headers, sample_todolist):
+        """Test pages are keyed on (order, id) and cover the list once"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+
+        response = client.get(f'{url}?limit=2', headers=auth_headers)
+        assert response.status_code == 200
+        first = response.get_json()
+        assert [t['title'] for t in first['todos']] == ['Milk', 'Eggs']
+        assert first['count'] == 2
+
+        response = client.get(f"{url}?limit=2&cursor={first['next_cursor']}", headers=auth_headers)
+        second = response.get_json()
+        assert [t['title'] for t in second['todos']] == ['Bread']
+        assert second['next_cursor'] is None
+
+    def test_unpaginated_shape_unchanged(self, client, auth_headers, sample_todolist):
+        """Test responses without limit have no next_cursor"""
+        response = client.get(f'/todolists/{sample_todolist.id}/todos', headers=auth_headers)
+
+        data = response.get_json()
+        assert data['count'] == 3
+        assert 'next_cursor' not in data
+
+    @pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'limit=2&cursor=!!!', 'cursor=abc'])
+    def test_invalid_page_args(self, client, auth_headers, sample_todolist, query):
+        """Test invalid limit and cursor values are rejected"""
+        response = client.get(f'/todolists/{sample_todolist.id}/todos?{query}', headers=auth_headers)
+
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('cursor', MALFORMED_CURSORS)
+    def test_malformed_cursor(self, client, auth_headers, sample_todolist, cursor):
+        """Test cursors whose values have the wrong types are rejected"""
+        response = client.get(f'/todolists/{sample_todolist.id}/todos?limit=2&cursor={cursor}', headers=auth_headers)
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid cursor'
+
+
+class TestTodoListViews:
+    """Test the full and summary views of GET /todolists"""
+
+    def test_full_view_loads_todos_without_n_plus_one(self, client, auth_headers, app, test_user):
+        """Test embedded todos are loaded with a fixed number of queries"""
+        from sqlalchemy import event
+        for name in ['A', 'B', 'C', 'D']:
+            list_id = client.post('/todolists', json={'name': name}, headers=auth_headers).get_json()['id']
+            client.post(f'/todolists/{list_id}/todos', json={'title': f'{name} todo'}, headers=auth_headers)
+
+        statements = []
+        def count_selects(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count_selects)
+        try:
+            response = client.get('/todolists', headers=auth_headers)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_selects)
+
+        assert response.status_code == 200
+        assert all(len(l['todos']) == 1 for l in response.get_json())
+        # The ETag version lookup, one query for the lists and one for all of their todos
+        assert len(statements) == 3
+
+    def test_summary_view(self, client, auth_headers, sample_todolist):
+        """Test summary view returns counts instead of todos"""
+        todo = sample_todolist.todos[0]
+        client.put(f'/todolists/{sample_todolist.id}/todos/{todo.id}',
+                   json={'completed': True}, headers=auth_headers)
+        client.post('/todolists', json={'name': 'Empty'}, headers=auth_headers)
+
+        response = client.get('/todolists?view=summary', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'todos' not in data[0]
+        assert (data[0]['todo_count'], data[0]['completed_count']) == (3, 1)
+        assert (data[1]['todo_count'], data[1]['completed_count']) == (0, 0)
+
+    def test_invalid_view(self, client, auth_headers):
+        """Test unknown views are rejected"""
+        response = client.get('/todolists?view=everything', headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestTodoListNames:
+    """Test list names are validated as in /batch and /import"""
+
+    @pytest.mark.parametrize('name, error', [
+        (None, 'Name is required'), ('   ', 'Name is required'), (42, 'Name is required'),
+        ('x' * 101, 'Name must be at most 100 characters'),
+    ])
+    def test_invalid_names(self, client, auth_headers, sample_todolist, name, error):
+        """Test creates and renames reject the same names with the same messages"""
+        created = client.post('/todolists', json={'name': name}, headers=auth_headers)
+        renamed = client.put(f'/todolists/{sample_todolist.id}', json={'name': name}, headers=auth_headers)
+
+        for response in (created, renamed):
+            assert response.status_code == 400
+            assert response.get_json() == {'error': error}
+
+    def test_names_are_stripped(self, client, auth_headers, sample_todolist):
+        """Test surrounding whitespace is dropped on create and rename"""
+        created = client.post('/todolists', json={'name': '  Work  '}, headers=auth_headers)
+        renamed = client.put(f'/todolists/{sample_todolist.id}', json={'name': ' Food '}, headers=auth_headers)
+
+        assert created.get_json()['name'] == 'Work'
+        assert renamed.get_json()['name'] == 'Food'
+
+
+class TestDeleteTodoList:
+    """Test DELETE /todolists/<id>"""
+
+    def test_delete_cascades_in_the_database(self, app, client, auth_headers, sample_todolist, sample_todo):
+        """Test a list's todos are deleted by the database without being loaded"""
+        from sqlalchemy import event
+        list_id = sample_todolist.id
+        client.put(f'/todolists/{list_id}/todos/{sample_todolist.todos[0].id}',
+                   json={'completed': True}, headers=auth_headers)
+
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        response = client.delete(f'/todolists/{list_id}', headers=auth_headers)
+
+        assert response.status_code == 200
+        assert not [s for s in statements if s.startswith('SELECT') and 'FROM todos' in s]
+        with app.app_context():
+            assert Todo.query.filter_by(todo_list_id=list_id).count() == 0
+        stats = client.get('/todos/stats', headers=auth_headers).get_json()['stats']
+        assert (stats['total'], stats['completed']) == (1, 0)
@@ -4,6 +4,7 @@ Tests for todo endpoints
 import pytest
 import json
 from models import Todo, db
+from test_todolists import MALFORMED_CURSORS
 
 
 class TestGetTodos:
@@ -74,6 +75,34 @@ class TestGetTodos:
         assert response.status_code == 200
         assert response.get_json()['count'] == 0
 
+    def test_get_todos_paginated(self, client, auth_headers, app, test_user):
+        """Test keyset pagination with limit and next_cursor"""
+        with app.app_context():
+            for index in range(5):
+                db.session.add(Todo(user_id=test_user.id, title=f'Todo {index}', order=index))
+            db.session.commit()
+        
+        titles = []
+        cursor = None
+        while True:
+            url = '/todos?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url, headers=auth_headers).get_json()
+            assert data['count'] <= 2
+            titles.extend(todo['title'] for todo in data['todos'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        
+        assert titles == [f'Todo {index}' for index in range(5)]
+
+    @pytest.mark.parametrize('cursor', MALFORMED_CURSORS)
+    def test_malformed_cursor(self, client, auth_headers, sample_todo, cursor):
+        """Test cursors whose values have the wrong types are rejected without reaching the query"""
+        response = client.get(f'/todos?limit=2&cursor={cursor}', headers=auth_headers)
+
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
+
 
 class TestCreateTodo:
     """Test create todo endpoint"""
@@ -479,3 +508,131 @@ class TestTodoEdgeCases:
         data = response.get_json()
         assert data['todo']['title'] == '测试待办事项 🚀'
         assert data['todo']['description'] == 'Тест описание with émojis 📝'
+
+
+class TestBulkCreate:
+    """Test POST /todolists/<id>/todos/bulk"""
+
+    def test_bulk_create(self, app, client, auth_headers, sample_todolist):
+        """Test todos are appended in request order and counters, versions and search follow"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        etag = client.get(url, headers=auth_headers).headers['ETag']
+
+        response = client.post(f'{url}/bulk', json={'todos': [
+            {'title': ' Butter '}, {'title': 'Jam', 'description': 'Strawberry'}, {'title': 'Tea'}
+        ]}, headers=auth_headers)
+
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['count'] == 3
+
+        listing = client.get(url, headers=auth_headers)
+        assert listing.headers['ETag'] != etag
+        todos = listing.get_json()['todos']
+        assert [t['title'] for t in todos] == ['Milk', 'Eggs', 'Bread', 'Butter', 'Jam', 'Tea']
+        assert [t['id'] for t in todos[3:]] == data['ids']
+        assert todos[4]['description'] == 'Strawberry'
+        assert len({t['order'] for t in todos}) == 6
+
+        stats = client.get(f'/todolists/{sample_todolist.id}/stats', headers=auth_headers).get_json()['stats']
+        assert stats['total'] == 6
+        search = client.get('/todos/search?q=strawb', headers=auth_headers).get_json()
+        assert [t['id'] for t in search['todos']] == [data['ids'][1]]
+
+    def test_bulk_create_is_all_or_nothing(self, app, client, auth_headers, sample_todolist):
+        """Test one invalid item rejects the whole request and reports every bad index"""
+        response = client.post(f'/todolists/{sample_todolist.id}/todos/bulk', json={'todos': [
+            {'title': 'Butter'}, {'title': ''}, {'description': 'no title'}
+        ]}, headers=auth_headers)
+
+        assert response.status_code == 400
+        assert [e['index'] for e in response.get_json()['errors']] == [1, 2]
+        with app.app_context():
+            assert Todo.query.filter_by(title='Butter').count() == 0
+
+    def test_bulk_create_limits(self, client, auth_headers, auth_headers2, sample_todolist):
+        """Test empty or oversized batches and other users' lists are rejected"""
+        url = f'/todolists/{sample_todolist.id}/todos/bulk'
+        assert client.post(url, json={'todos': []}, headers=auth_headers).status_code == 400
+        assert client.post(url, json={'todos': [{'title': 'x'}] * 1001}, headers=auth_headers).status_code == 400
+        assert client.post(url, json={'todos': [{'title': 'x'}]}, headers=auth_headers2).status_code == 404
+
+
+class TestBulkUpdateDelete:
+    """Test set-based complete, clear-completed and delete-by-ids"""
+
+    def list_todos(self, client, headers, list_id):
+        return client.get(f'/todolists/{list_id}/todos', headers=headers).get_json()['todos']
+
+    def stats(self, client, headers, list_id):
+        return client.get(f'/todolists/{list_id}/stats', headers=headers).get_json()['stats']
+
+    def test_complete_selected(self, client, auth_headers, sample_todolist):
+        """Test completing some todos moves them to the end in their relative order"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        milk, eggs, bread = [t['id'] for t in self.list_todos(client, auth_headers, sample_todolist.id)]
+
+        response = client.patch(f'{url}/bulk', json={'completed': True, 'ids': [milk, eggs, 999999]},
+                                headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.get_json()['updated'] == 2
+        todos = self.list_todos(client, auth_headers, sample_todolist.id)
+        assert [(t['title'], t['completed']) for t in todos] == [('Bread', False), ('Milk', True), ('Eggs', True)]
+        assert self.stats(client, auth_headers, sample_todolist.id)['completed'] == 2
+
+        # Already-complete todos are not counted or moved again
+        response = client.patch(f'{url}/bulk', json={'completed': True}, headers=auth_headers)
+        assert response.get_json()['updated'] == 1
+        assert [t['title'] for t in self.list_todos(client, auth_headers, sample_todolist.id)] == ['Milk', 'Eggs', 'Bread']
+
+    def test_reopen_all(self, client, auth_headers, sample_todolist):
+        """Test reopening every todo keeps positions and resets the completed count"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        client.patch(f'{url}/bulk', json={'completed': True}, headers=auth_headers)
+        before = self.list_todos(client, auth_headers, sample_todolist.id)
+
+        response = client.patch(f'{url}/bulk', json={'completed': False}, headers=auth_headers)
+
+        assert response.get_json()['updated'] == 3
+        after = self.list_todos(client, auth_headers, sample_todolist.id)
+        assert [t['order'] for t in after] == [t['order'] for t in before]
+        assert self.stats(client, auth_headers, sample_todolist.id)['completed'] == 0
+
+    def test_delete_completed(self, app, client, auth_headers, sample_todolist):
+        """Test clearing completed todos deletes them with tombstones and counters updated"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        milk = self.list_todos(client, auth_headers, sample_todolist.id)[0]['id']
+        client.patch(f'{url}/bulk', json={'completed': True, 'ids': [milk]}, headers=auth_headers)
+        cursor = client.get('/sync', headers=auth_headers).get_json()['cursor']
+
+        response = client.delete(f'{url}/completed', headers=auth_headers)
+
+        assert response.get_json()['deleted'] == 1
+        assert [t['title'] for t in self.list_todos(client, auth_headers, sample_todolist.id)] == ['Eggs', 'Bread']
+        stats = self.stats(client, auth_headers, sample_todolist.id)
+        assert (stats['total'], stats['completed']) == (2, 0)
+        sync = client.get('/sync', query_string={'since': cursor}, headers=auth_headers).get_json()
+        assert sync['deleted']['todos'] == [milk]
+
+    def test_delete_by_ids(self, client, auth_headers, sample_todolist):
+        """Test deleting by IDs only removes todos in the list and empties it cleanly"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        ids = [t['id'] for t in self.list_todos(client, auth_headers, sample_todolist.id)]
+        etag = client.get(url, headers=auth_headers).headers['ETag']
+
+        response = client.delete(f'{url}/bulk', json={'ids': ids + [999999]}, headers=auth_headers)
+
+        assert response.get_json()['deleted'] == 3
+        assert self.list_todos(client, auth_headers, sample_todolist.id) == []
+        assert client.get(url, headers=auth_headers).headers['ETag'] != etag
+        assert self.stats(client, auth_headers, sample_todolist.id)['total'] == 0
+
+    def test_bulk_validation(self, client, auth_headers, auth_headers2, sample_todolist):
+        """Test malformed bulk requests and other users' lists are rejected"""
+        url = f'/todolists/{sample_todolist.id}/todos'
+        assert client.patch(f'{url}/bulk', json={'completed': 'yes'}, headers=auth_headers).status_code == 400
+        assert client.patch(f'{url}/bulk', json={'completed': True, 'ids': []}, headers=auth_headers).status_code == 400
+        assert client.delete(f'{url}/bulk', json={}, headers=auth_headers).status_code == 400
+        assert client.delete(f'{url}/bulk', json={'ids': ['1']}, headers=auth_headers).status_code == 400
+        assert client.delete(f'{url}/completed', headers=auth_headers2).status_code == 404
@@ -0,0 +1,146 @@
+"""
+Tests for account export and import
+"""
+import json
+import transfer
+
+
+def export_records(client, headers):
+    response = client.get('/export', headers=headers)
+    assert response.status_code == 200
+    return response, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestExport:
+    """Test GET /export"""
+
+    def test_export_records(self, client, auth_headers, sample_todolist, sample_todo):
+        """Test the export holds a header, then every list, then every todo in position order"""
+        response, records = export_records(client, auth_headers)
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert 'attachment' in response.headers['Content-Disposition']
+        assert records[0]['type'] == 'export' and records[0]['version'] == 1
+        assert records[1] == {'type': 'todolist', 'id': sample_todolist.id, 'name': 'Groceries',
+                              'created_at': records[1]['created_at']}
+        todos = [r for r in records if r['type'] == 'todo']
+        assert len(records) == 2 + len(todos)
+        listed = [t['title'] for t in todos if t['todo_list_id'] == sample_todolist.id]
+        assert listed == ['Milk', 'Eggs', 'Bread']
+        assert {'Test Todo'} < {t['title'] for t in todos}
+        assert set(todos[0]) == {'type', 'id', 'todo_list_id', 'title', 'description', 'completed',
+                                 'created_at', 'updated_at', 'order'}
+
+    def test_export_is_streamed_in_batches(self, client, auth_headers, sample_todolist, monkeypatch):
+        """Test rows are sent in chunks of EXPORT_BATCH_SIZE as they are read"""
+        monkeypatch.setattr(transfer, 'EXPORT_BATCH_SIZE', 2)
+
+        response = client.get('/export', headers=auth_headers, buffered=False)
+
+        assert response.is_streamed
+        chunks = list(response.response)
+        # Header, one list, then three todos in batches of two
+        assert [chunk.count(b'\n') for chunk in chunks] == [1, 1, 2, 1]
+        response.close()
+
+    def test_export_is_per_user(self, client, auth_headers2, sample_todolist):
+        """Test another user's export holds none of the first user's data"""
+        _, records = export_records(client, auth_headers2)
+
+        assert [r['type'] for r in records] == ['export']
+
+    def test_export_requires_auth(self, client):
+        """Test exporting without a token fails"""
+        assert client.get('/export').status_code == 401
+
+
+def run_import(client, headers, body, content_type='application/x-ndjson'):
+    response = client.post('/import', data=body, content_type=content_type, headers=headers)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestImport:
+    """Test POST /import"""
+
+    def test_export_round_trip(self, app, client, auth_headers, auth_headers2, sample_todolist, completed_todo):
+        """Test another account can import an export and gets the same lists, todos and order"""
+        export = client.get('/export', headers=auth_headers).get_data()
+
+        records = run_import(client, auth_headers2, export)
+
+        assert records[-1] == {'type': 'summary', 'rows': 1 + 4, 'created': 4, 'failed': 0, 'todolists': 1}
+        todolists = client.get('/todolists', headers=auth_headers2).get_json()
+        assert [l['name'] for l in todolists] == ['Groceries']
+        assert [t['title'] for t in todolists[0]['todos']] == ['Milk', 'Eggs', 'Bread']
+        todos = client.get('/todos', headers=auth_headers2).get_json()['todos']
+        assert [(t['title'], t['completed']) for t in todos if t['todo_list_id'] is None] == [('Completed Todo', True)]
+        stats = client.get('/todos/stats', headers=auth_headers2).get_json()['stats']
+        assert (stats['total'], stats['completed']) == (4, 1)
+
+    def test_csv_with_row_errors(self, app, client, auth_headers, sample_todolist):
+        """Test CSV rows go into lists by name and bad rows are reported by line without stopping the import"""
+        body = ('Title,Description,List,Completed\n'
+                'Butter,,Groceries,\n'
+                ',missing title,Groceries,\n'
+                'Passport,Renew,Trip,yes\n'
+                'Tickets,,Trip,maybe\n'
+                'Loose,,,\n')
+
+        records = run_import(client, auth_headers, body, 'text/csv')
+
+        assert [(r['line'], r['error']) for r in records if r['type'] == 'error'] == [
+            (3, 'Title must be between 1 and 200 characters'),
+            (5, 'Completed field must be true or false'),
+        ]
+        assert records[-1] == {'type': 'summary', 'rows': 5, 'created': 3, 'failed': 2, 'todolists': 1}
+        groceries = client.get(f'/todolists/{sample_todolist.id}/todos', headers=auth_headers).get_json()['todos']
+        assert [t['title'] for t in groceries] == ['Milk', 'Eggs', 'Bread', 'Butter']
+        trip = [l for l in client.get('/todolists', headers=auth_headers).get_json() if l['name'] == 'Trip']
+        assert [(t['title'], t['completed']) for t in trip[0]['todos']] == [('Passport', True)]
+
+    def test_chunked_commits_report_progress(self, app, client, auth_headers, sample_todolist, monkeypatch):
+        """Test each full chunk is committed and reported before the next is read"""
+        monkeypatch.setattr(transfer, 'IMPORT_CHUNK_SIZE', 2)
+        body = ''.join(json.dumps({'title': f'Item {i}', 'todo_list_id': None}) + '\n' for i in range(5))
+
+        records = run_import(client, auth_headers, body)
+
+        assert [r['created'] for r in records if r['type'] == 'progress'] == [2, 4]
+        assert records[-1]['created'] == 5
+        titles = [t['title'] for t in client.get('/todos', headers=auth_headers).get_json()['todos']]
+        assert titles[-5:] == [f'Item {i}' for i in range(5)]
+
+    def test_lists_count_towards_chunks(self, client, auth_headers, monkeypatch):
+        """Test an import of many lists and few todos still commits in chunks"""
+        monkeypatch.setattr(transfer, 'IMPORT_CHUNK_SIZE', 2)
+        body = ''.join(json.dumps({'type': 'todolist', 'id': i, 'name': f'List {i}'}) + '\n' for i in range(5))
+        body += json.dumps({'title': 'Only todo', 'todo_list_id': 4}) + '\n'
+
+        records = run_import(client, auth_headers, body)
+
+        assert [r['todolists'] for r in records if r['type'] == 'progress'] == [2, 4, 5]
+        assert records[-1] == {'type': 'summary', 'rows': 6, 'created': 1, 'failed': 0, 'todolists': 5}
+
+    def test_bad_lines(self, client, auth_headers, monkeypatch):
+        """Test invalid JSON, overlong lines and unknown list references fail only their own rows"""
+        monkeypatch.setattr(transfer, 'IMPORT_MAX_LINE_BYTES', 64)
+        body = ('{"title": "ok"}\n'
+                'not json\n'
+                + json.dumps({'title': 'x' * 100}) + '\n'
+                '{"title": "orphan", "todo_list_id": 42}\n'
+                '{"title": "boolean", "todo_list_id": true}\n'
+                '\n'
+                '{"type": "comment"}\n')
+
+        records = run_import(client, auth_headers, body)
+
+        assert [r['line'] for r in records if r['type'] == 'error'] == [2, 3, 4, 5, 7]
+        assert records[-1]['created'] == 1
+
+    def test_rejected_requests(self, client, auth_headers):
+        """Test unsupported content types and CSVs without a title column are refused up front"""
+        assert client.post('/import', json={'title': 'x'}, headers=auth_headers).status_code == 415
+        response = client.post('/import', data='name\nx\n', content_type='text/csv', headers=auth_headers)
+        assert response.status_code == 400
+        assert client.post('/import', data='', content_type='text/csv').status_code == 401
@@ -4,6 +4,7 @@ Tests for user management endpoints (admin only)
 import pytest
 import json
 from models import User, UserRole, db
+from test_todolists import MALFORMED_CURSORS
 
 
 class TestGetUsers:
@@ -48,6 +49,70 @@ class TestGetUsers:
         assert response.status_code == 401
 
 
+class TestUserListing:
+    """Test pagination, filters and NDJSON mode of the users listing"""
+
+    @pytest.fixture
+    def many_users(self, app, admin_headers, test_user, test_user2):
+        """Twelve extra users, every third one inactive"""
+        with app.app_context():
+            for i in range(12):
+                user = User(username=f'member{i:02d}', email=f'member{i:02d}@example.com',
+                            is_active=i % 3 != 0)
+                user.set_password('password123')
+                db.session.add(user)
+            db.session.commit()
+
+    def test_cursor_pagination(self, client, admin_headers, many_users):
+        """Test pages follow each other by ID without gaps or repeats"""
+        seen, cursor = [], None
+        while True:
+            query = {'limit': 5, **({'cursor': cursor} if cursor else {})}
+            data = client.get('/users', query_string=query, headers=admin_headers).get_json()
+            seen += [user['id'] for user in data['users']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+
+        assert len(seen) == 15
+        assert seen == sorted(set(seen))
+
+    def test_filters(self, client, admin_headers, many_users):
+        """Test role, is_active, username prefix and created range filters"""
+        def usernames(**query):
+            data = client.get('/users', query_string=query, headers=admin_headers).get_json()
+            return [user['username'] for user in data]
+
+        assert usernames(role='admin') == ['adminuser']
+        assert usernames(is_active='false') == ['member00', 'member03', 'member06', 'member09']
+        assert usernames(username='member1', is_active='true') == ['member10', 'member11']
+        assert usernames(username='testuser') == ['testuser', 'testuser2']
+        assert len(usernames(created_after='2000-01-01')) == 15
+        assert usernames(created_before='2000-01-01') == []
+
+    def test_ndjson_mode(self, client, admin_headers, many_users):
+        """Test format=ndjson streams every matching user as one JSON object per line"""
+        response = client.get('/users?format=ndjson&is_active=true', headers=admin_headers)
+
+        assert response.mimetype == 'application/x-ndjson'
+        users = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(users) == 11
+        assert list(users[0]) == ['id', 'username', 'email', 'created_at', 'role', 'is_active']
+        assert {user['role'] for user in users} == {'user', 'admin'}
+
+    def test_invalid_filters(self, client, admin_headers):
+        """Test invalid filters are rejected with 400"""
+        for query in ('role=owner', 'created_after=yesterday', 'limit=0', 'cursor=abc'):
+            assert client.get(f'/users?{query}', headers=admin_headers).status_code == 400
+
+    @pytest.mark.parametrize('cursor', MALFORMED_CURSORS)
+    def test_malformed_cursor(self, client, admin_headers, cursor):
+        """Test cursors whose values have the wrong types are rejected"""
+        response = client.get(f'/users?limit=2&cursor={cursor}', headers=admin_headers)
+
+        assert response.status_code == 400
+
+
 class TestUpdateUser:
     """Test update user endpoint"""
     
@@ -151,6 +216,19 @@ class TestDeleteUser:
         deleted_user = User.query.get(user_id)
         assert deleted_user is None
     
+    def test_delete_user_removes_owned_rows(self, app, client, admin_headers, test_user, sample_todolist, sample_todo):
+        """Test deleting a user removes their lists, todos and counters through the database cascade"""
+        from models import Todo, TodoList, Tombstone, UserStats
+        user_id = test_user.id
+        db.session.delete(db.session.get(Todo, sample_todo.id))
+        db.session.commit()
+
+        response = client.delete(f'/users/{user_id}', headers=admin_headers)
+
+        assert response.status_code == 200
+        for model in (TodoList, Todo, Tombstone, UserStats):
+            assert model.query.filter_by(user_id=user_id).count() == 0
+    
     def test_delete_user_not_found(self, client, admin_headers):
         """Test deleting non-existent user"""
         response = client.delete('/users/99999', headers=admin_headers)
@@ -1,6 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
 from models import db, TodoList, Todo
+from pagination import get_page_args, paginate, PaginationError
+from routing import replica_read
+from sync import user_change_seq
+from conditional import etag_for, not_modified, with_etag
+from purge import PurgeModeError, hide_todolist, purge_in_background, wake_purge_worker
+from serialization import (TODO_FIELDS, TODOLIST_FIELDS, TODOLIST_SUMMARY_FIELDS, FieldsError,
+                           load_only_fields, parse_fields, todolist_dict)
+from validation import validate_list_name, ValidationError
 from logging_config import logger
 
 todolists_bp = Blueprint('todolists_bp', __name__)
@@ -19,11 +28,11 @@ def create_todolist():
         logger.error(f"Failed to parse JSON for todolist creation: {e}")
         return jsonify({'error': 'Request body must be JSON'}), 400
     
-    name = data.get('name')
-
-    if not name:
-        logger.warning("Missing name field in todolist creation")
-        return jsonify({'error': 'Name is required'}), 400
+    try:
+        name = validate_list_name(data.get('name') if isinstance(data, dict) else None)
+    except ValidationError as e:
+        logger.warning(f"Invalid name in todolist creation: {e}")
+        return jsonify({'error': str(e)}), 400
 
     try:
         new_list = TodoList(name=name, user_id=user_id)
@@ -36,21 +45,86 @@ def create_todolist():
         db.session.rollback()
         return jsonify({'error': 'Database error creating todolist'}), 500
 
+def field_options(fields, todo_fields):
+    """Loader options reading only the list and todo columns the response needs"""
+    options = [load_only_fields(TodoList, fields)]
+    if 'todos' in fields:
+        # Load the todos of every list in one extra query instead of one per list
+        options.append(selectinload(TodoList.todos).options(load_only_fields(Todo, todo_fields)))
+    return options
+
 @todolists_bp.route('/todolists', methods=['GET'])
+@replica_read
 @jwt_required()
 def get_todolists():
     """Get all todo lists for the current user"""
     user_id = get_jwt_identity()
-    todolists = TodoList.query.filter_by(user_id=user_id).all()
-    return jsonify([l.to_dict() for l in todolists]), 200
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        return jsonify({'error': 'view must be one of: full, summary'}), 400
+
+    # Every write to the user's lists or todos changes their sequence
+    etag = etag_for(user_id, user_change_seq(user_id))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        fields = parse_fields(request.args.get('fields'),
+                              TODOLIST_FIELDS if view == 'full' else TODOLIST_SUMMARY_FIELDS)
+        todo_fields = parse_fields(request.args.get('todo_fields'), TODO_FIELDS)
+        query = TodoList.query.filter_by(user_id=user_id).options(*field_options(fields, todo_fields))
+
+        limit, cursor = get_page_args(request.args)
+        if limit is None:
+            todolists = query.order_by(TodoList.id.asc()).all()
+            return with_etag((jsonify([todolist_dict(l, fields, todo_fields) for l in todolists]), 200), etag)
+
+        # Paginated responses are wrapped so they can carry the cursor
+        todolists, next_cursor = paginate(query, (TodoList.id,), limit, cursor)
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return with_etag((jsonify({
+        'todolists': [todolist_dict(l, fields, todo_fields) for l in todolists],
+        'count': len(todolists),
+        'next_cursor': next_cursor
+    }), 200), etag)
 
 @todolists_bp.route('/todolists/<int:list_id>', methods=['GET'])
+@replica_read
 @jwt_required()
 def get_todolist(list_id):
     """Get a specific todo list"""
     user_id = get_jwt_identity()
+    try:
+        fields = parse_fields(request.args.get('fields'), TODOLIST_FIELDS)
+        todo_fields = parse_fields(request.args.get('todo_fields'), TODO_FIELDS)
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Only the version is read before the ETag check, so a 304 never reads the todos
+    version = db.session.query(TodoList.version).filter_by(id=list_id, user_id=user_id).scalar()
+    if version is None:
+        abort(404)
+    etag = etag_for(user_id, version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    todolist = TodoList.query.options(*field_options(fields, todo_fields)).filter_by(
+        id=list_id, user_id=user_id
+    ).first_or_404()
+    return with_etag((jsonify(todolist_dict(todolist, fields, todo_fields)), 200), etag)
+
+@todolists_bp.route('/todolists/<int:list_id>/stats', methods=['GET'])
+@replica_read
+@jwt_required()
+def get_todolist_stats(list_id):
+    """Get todo statistics for a specific todo list"""
+    user_id = get_jwt_identity()
     todolist = TodoList.query.filter_by(id=list_id, user_id=user_id).first_or_404()
-    return jsonify(todolist.to_dict()), 200
+    return jsonify({'stats': todolist.stats_dict()}), 200
 
 @todolists_bp.route('/todolists/<int:list_id>', methods=['PUT'])
 @jwt_required()
@@ -59,11 +133,11 @@ def update_todolist(list_id):
     user_id = get_jwt_identity()
     todolist = TodoList.query.filter_by(id=list_id, user_id=user_id).first_or_404()
     
-    data = request.get_json()
-    name = data.get('name')
-
-    if not name:
-        return jsonify({'error': 'Name is required'}), 400
+    data = request.get_json(silent=True)
+    try:
+        name = validate_list_name(data.get('name') if isinstance(data, dict) else None)
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
 
     todolist.name = name
     db.session.commit()
@@ -73,9 +147,19 @@ def update_todolist(list_id):
 @todolists_bp.route('/todolists/<int:list_id>', methods=['DELETE'])
 @jwt_required()
 def delete_todolist(list_id):
-    """Delete a todo list"""
+    """Delete a todo list, or hide it and purge it in the background"""
     user_id = get_jwt_identity()
     todolist = TodoList.query.filter_by(id=list_id, user_id=user_id).first_or_404()
+    try:
+        background = purge_in_background(request.args, todolist.todo_count)
+    except PurgeModeError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if background:
+        job = hide_todolist(todolist)
+        db.session.commit()
+        wake_purge_worker()
+        return jsonify({'message': 'Todo list deletion started', 'purge': job.to_dict()}), 202
     
     db.session.delete(todolist)
     db.session.commit()
@@ -1,10 +1,103 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import delete, insert, update
 from models import db, Todo, TodoList
+from pagination import get_page_args, paginate, PaginationError
+import counters
+from ordering import (ORDER_GAP, append_order, apply_order, move_todo, list_scope, tail_order,
+                      user_scope, PlacementError)
+from routing import replica_read
+from sync import next_change_seq, record_deletes, touch_lists
+from conditional import etag_for, not_modified, with_etag
+from serialization import (TODO_FIELDS, FieldsError, load_only_fields, parse_fields,
+                           rows_to_dicts, select_todo_fields, todo_dict)
+from validation import is_id, validate_new_todo, validate_todo_changes, ValidationError
 from logging_config import logger
 
 todos_bp = Blueprint('todos', __name__, url_prefix='/todolists/<int:list_id>/todos')
 
+BULK_MAX_TODOS = 1000
+
+def insert_todos(user_id, list_id, rows):
+    """
+    Append validated todos to a list (or, with list_id None, to the user's
+    todos outside lists) with one multi-row INSERT and return their IDs in
+    the same order. The rows get contiguous order keys from a single tail
+    lookup; they are incomplete unless a row says otherwise.
+    """
+    scope = list_scope(list_id) if list_id is not None else user_scope(user_id)
+    last = tail_order(scope) or 0
+    seq = next_change_seq(user_id)
+    values = [
+        {'completed': False, **row, 'user_id': int(user_id), 'todo_list_id': list_id,
+         'order': last + (index + 1) * ORDER_GAP, 'change_seq': seq}
+        for index, row in enumerate(rows)
+    ]
+    ids = list(db.session.scalars(insert(Todo).returning(Todo.id, sort_by_parameter_order=True), values))
+
+    # The ORM flush hooks do not see bulk inserts
+    counters.adjust(user_id, list_id, total=len(ids), completed=sum(1 for row in values if row['completed']))
+    if list_id is not None:
+        touch_lists(seq, list_scope(list_id))
+    return ids
+
+def set_completed(list_id, user_id, completed, *criteria):
+    """
+    Complete or reopen a list's todos (those matching `criteria`, or all)
+    with one UPDATE and return how many changed. Completed todos move to the
+    end of the list, as single updates do, keeping their relative order.
+    """
+    seq = next_change_seq(user_id)
+    criteria = (list_scope(list_id), Todo.completed == (not completed)) + criteria
+    values = {'completed': completed, 'change_seq': seq}
+    if completed:
+        first = db.session.query(db.func.min(Todo.order)).filter(*criteria).scalar()
+        if first is None:
+            return 0
+        values['order'] = Todo.order + (tail_order(list_scope(list_id)) + ORDER_GAP - first)
+
+    updated = db.session.execute(
+        update(Todo).where(*criteria).values(**values).execution_options(synchronize_session=False)
+    ).rowcount
+    if updated:
+        counters.adjust(user_id, list_id, completed=updated if completed else -updated)
+        touch_lists(seq, list_scope(list_id), Todo.change_seq == seq)
+    return updated
+
+def delete_todos(list_id, user_id, *criteria, count=True):
+    """
+    Delete a list's todos matching `criteria` with one DELETE and return their
+    IDs. `count=False` leaves the counters alone, for todos already taken off them.
+    """
+    seq = next_change_seq(user_id)
+    scope = (list_scope(list_id),) + criteria
+    # Before the DELETE, while the todos still point at the list
+    touch_lists(seq, *scope)
+    rows = db.session.execute(
+        delete(Todo).where(*scope).returning(Todo.id, Todo.completed)
+        .execution_options(synchronize_session=False)
+    ).all()
+    ids = [row.id for row in rows]
+    if ids:
+        if count:
+            counters.adjust(user_id, list_id, total=-len(ids), completed=-sum(1 for row in rows if row.completed))
+        record_deletes(user_id, 'todo', ids, seq)
+    return ids
+
+def apply_todo_changes(todo, changes):
+    """Apply validated changes to a todo; completing a todo in a list moves it to the end of the list"""
+    was_completed = todo.completed
+    for field in ('title', 'description', 'completed'):
+        if field in changes:
+            setattr(todo, field, changes[field])
+
+    if not was_completed and todo.completed and todo.todo_list_id is not None:
+        todo.order = append_order(list_scope(todo.todo_list_id))
+        logger.debug(f"Todo {todo.id} marked complete, moved to order {todo.order}")
+
+    if 'order' in changes:
+        todo.order = changes['order']
+
 @todos_bp.before_request
 def before_request():
     """Check if the user owns the todolist before every request"""
@@ -22,20 +115,29 @@ def before_request():
             if not todolist:
                 logger.warning(f"User {user_id} tried to access non-existent or unauthorized list {list_id}")
                 return jsonify({'error': 'TodoList not found or you do not have permission to access it'}), 404
+            g.todolist = todolist
             logger.debug(f"Access granted to list {list_id} for user {user_id}")
     except Exception as e:
         logger.error(f"Authorization failed for todos endpoint: {e}")
         return jsonify({'error': 'Authorization failed', 'details': str(e)}), 401
 
 @todos_bp.route('', methods=['GET'])
+@replica_read
 def get_todos(list_id):
     """Get all todos for a specific list"""
     user_id = get_jwt_identity()
     logger.info(f"Getting todos for list {list_id} for user {user_id}")
     
+    # The list was loaded by the ownership check; its version covers every todo in it
+    etag = etag_for(user_id, g.todolist.version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     try:
         completed = request.args.get('completed')
         logger.debug(f"Completed filter: {completed}")
+        fields = parse_fields(request.args.get('fields'), TODO_FIELDS)
         
         query = Todo.query.filter_by(todo_list_id=list_id)
         
@@ -44,14 +146,25 @@ def get_todos(list_id):
             query = query.filter_by(completed=completed_bool)
             logger.debug(f"Filtering by completed: {completed_bool}")
         
-        todos = query.order_by(Todo.order.asc()).all()
-        logger.info(f"Found {len(todos)} todos in list {list_id}")
-        
-        return jsonify({
-            'todos': [todo.to_dict() for todo in todos],
-            'count': len(todos)
-        }), 200
+        limit, cursor = get_page_args(request.args)
+        if limit is None:
+            todos = select_todo_fields(query, fields).order_by(Todo.order.asc(), Todo.id.asc()).all()
+            logger.info(f"Found {len(todos)} todos in list {list_id}")
+            return with_etag((jsonify({
+                'todos': rows_to_dicts(todos, fields),
+                'count': len(todos)
+            }), 200), etag)
+
+        todos, next_cursor = paginate(select_todo_fields(query, fields, ('order', 'id')), (Todo.order, Todo.id), limit, cursor)
+        logger.info(f"Found {len(todos)} todos in list {list_id} (page of {limit})")
+        return with_etag((jsonify({
+            'todos': rows_to_dicts(todos, fields),
+            'count': len(todos),
+            'next_cursor': next_cursor
+        }), 200), etag)
         
+    except (PaginationError, FieldsError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to get todos for list {list_id}: {e}")
         return jsonify({'error': 'Failed to get todos', 'details': str(e)}), 500
@@ -72,29 +185,24 @@ def create_todo(list_id):
         if not data:
             return jsonify({'error': 'Request body must be JSON'}), 400
         
-        if 'title' not in data:
-            logger.warning("Missing title field in todo creation request")
-            return jsonify({'error': 'Missing required field: title'}), 400
-        
-        title = data['title'].strip()
-        description = data.get('description', '').strip() if data.get('description') else None
-        
-        logger.debug(f"Creating todo with title: '{title}', description: '{description}'")
+        try:
+            fields = validate_new_todo(data)
+        except ValidationError as e:
+            logger.warning(f"Invalid todo creation request: {e}")
+            return jsonify({'error': str(e)}), 400
         
-        if not title or len(title) > 200:
-            logger.warning(f"Invalid title length: {len(title)}")
-            return jsonify({'error': 'Title must be between 1 and 200 characters'}), 400
+        logger.debug(f"Creating todo with title: '{fields['title']}', description: '{fields['description']}'")
         
-        max_order = db.session.query(db.func.max(Todo.order)).filter_by(todo_list_id=list_id).scalar() or 0
-        logger.debug(f"Max order for list {list_id}: {max_order}")
+        order = append_order(list_scope(list_id))
+        logger.debug(f"Appending to list {list_id} at order {order}")
         
         todo = Todo(
             user_id=user_id,  # Add required user_id field
             todo_list_id=list_id,
-            title=title,
-            description=description,
+            title=fields['title'],
+            description=fields['description'],
             completed=False,
-            order=max_order + 1
+            order=order
         )
         
         try:
@@ -117,17 +225,130 @@ def create_todo(list_id):
         logger.error(f"Failed to create todo for list {list_id}: {e}")
         return jsonify({'error': 'Failed to create todo', 'details': str(e)}), 500
 
+@todos_bp.route('/bulk', methods=['POST'])
+def create_todos_bulk(list_id):
+    """Create many todos at the end of a list with one INSERT"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    items = data.get('todos') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not 1 <= len(items) <= BULK_MAX_TODOS:
+        return jsonify({'error': f'todos must be a list of 1 to {BULK_MAX_TODOS} items'}), 400
+
+    # Nothing is written unless every item is valid
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append(validate_new_todo(item))
+        except ValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        logger.warning(f"Rejected bulk create of {len(items)} todos in list {list_id}: {len(errors)} invalid")
+        return jsonify({'error': 'Invalid todos; none were created', 'errors': errors}), 400
+
+    try:
+        ids = insert_todos(user_id, list_id, rows)
+        db.session.commit()
+
+        logger.info(f"Bulk created {len(ids)} todos in list {list_id} for user {user_id}")
+        return jsonify({
+            'message': 'Todos created successfully',
+            'ids': ids,
+            'count': len(ids)
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to bulk create todos in list {list_id}: {e}")
+        return jsonify({'error': 'Failed to create todos', 'details': str(e)}), 500
+
+def bulk_ids(data, required):
+    """The `ids` of a bulk request, or None when it may be left out to mean every todo"""
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if ids is None and not required:
+        return None
+    if (not isinstance(ids, list) or not 1 <= len(ids) <= BULK_MAX_TODOS
+            or not all(is_id(todo_id) for todo_id in ids)):
+        raise ValidationError(f'ids must be a list of 1 to {BULK_MAX_TODOS} integers')
+    return ids
+
+@todos_bp.route('/bulk', methods=['PATCH'])
+def complete_todos_bulk(list_id):
+    """Mark all of a list's todos, or the given ones, complete or incomplete"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('completed'), bool):
+        return jsonify({'error': 'Completed field must be a boolean'}), 400
+    try:
+        ids = bulk_ids(data, required=False)
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # IDs outside the list are skipped by the UPDATE's WHERE clause
+        criteria = (Todo.id.in_(ids),) if ids is not None else ()
+        updated = set_completed(list_id, user_id, data['completed'], *criteria)
+        db.session.commit()
+
+        logger.info(f"Bulk set completed={data['completed']} on {updated} todos in list {list_id}")
+        return jsonify({'message': 'Todos updated successfully', 'updated': updated}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to bulk update todos in list {list_id}: {e}")
+        return jsonify({'error': 'Failed to update todos', 'details': str(e)}), 500
+
+@todos_bp.route('/bulk', methods=['DELETE'])
+def delete_todos_bulk(list_id):
+    """Delete the given todos from a list"""
+    user_id = get_jwt_identity()
+    try:
+        ids = bulk_ids(request.get_json(silent=True), required=True)
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        deleted = delete_todos(list_id, user_id, Todo.id.in_(ids))
+        db.session.commit()
+
+        logger.info(f"Bulk deleted {len(deleted)} todos from list {list_id}")
+        return jsonify({'message': 'Todos deleted successfully', 'deleted': len(deleted), 'ids': deleted}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to bulk delete todos from list {list_id}: {e}")
+        return jsonify({'error': 'Failed to delete todos', 'details': str(e)}), 500
+
+@todos_bp.route('/completed', methods=['DELETE'])
+def delete_completed_todos(list_id):
+    """Delete every completed todo in a list"""
+    user_id = get_jwt_identity()
+    try:
+        deleted = delete_todos(list_id, user_id, Todo.completed.is_(True))
+        db.session.commit()
+
+        logger.info(f"Cleared {len(deleted)} completed todos from list {list_id}")
+        return jsonify({'message': 'Completed todos deleted successfully', 'deleted': len(deleted), 'ids': deleted}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to clear completed todos from list {list_id}: {e}")
+        return jsonify({'error': 'Failed to delete completed todos', 'details': str(e)}), 500
+
 @todos_bp.route('/<int:todo_id>', methods=['GET'])
+@replica_read
 def get_todo(list_id, todo_id):
     """Get a specific todo from a list"""
     try:
-        todo = Todo.query.filter_by(id=todo_id, todo_list_id=list_id).first()
+        fields = parse_fields(request.args.get('fields'), TODO_FIELDS)
+        todo = Todo.query.options(load_only_fields(Todo, fields)).filter_by(id=todo_id, todo_list_id=list_id).first()
         
         if not todo:
             return jsonify({'error': 'Todo not found'}), 404
         
-        return jsonify({'todo': todo.to_dict()}), 200
+        return jsonify({'todo': todo_dict(todo, fields)}), 200
         
+    except FieldsError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to get todo {todo_id} for list {list_id}: {e}")
         return jsonify({'error': 'Failed to get todo', 'details': str(e)}), 500
@@ -158,34 +379,13 @@ def update_todo(list_id, todo_id):
             
         logger.debug(f"Found todo: {todo.title} (completed: {todo.completed})")
         
-        if 'title' in data:
-            title = data['title'].strip()
-            if not title or len(title) > 200:
-                return jsonify({'error': 'Title must be between 1 and 200 characters'}), 400
-            todo.title = title
-        
-        if 'description' in data:
-            description = data['description'].strip() if data['description'] else None
-            todo.description = description
+        try:
+            changes = validate_todo_changes(data)
+        except ValidationError as e:
+            logger.warning(f"Invalid todo update for {todo_id}: {e}")
+            return jsonify({'error': str(e)}), 400
         
-        if 'completed' in data:
-            if not isinstance(data['completed'], bool):
-                logger.warning(f"Invalid completed value type: {type(data['completed'])}")
-                return jsonify({'error': 'Completed field must be a boolean'}), 400
-            
-            was_completed = todo.completed
-            todo.completed = data['completed']
-            logger.info(f"Updating todo completion: {was_completed} -> {todo.completed}")
-
-            if not was_completed and todo.completed:
-                max_order = db.session.query(db.func.max(Todo.order)).filter_by(todo_list_id=list_id).scalar() or 0
-                todo.order = max_order + 1
-                logger.debug(f"Todo marked complete, moved to order {todo.order}")
-
-        if 'order' in data:
-            if not isinstance(data['order'], int):
-                return jsonify({'error': 'Order field must be an integer'}), 400
-            todo.order = data['order']
+        apply_todo_changes(todo, changes)
         
         try:
             db.session.commit()
@@ -238,15 +438,17 @@ def reorder_todos(list_id):
 
         ordered_ids = data['ordered_ids']
         
-        todos = Todo.query.filter_by(todo_list_id=list_id).all()
-        todo_map = {todo.id: todo for todo in todos}
-
-        if len(ordered_ids) != len(todos) or set(ordered_ids) != set(todo_map.keys()):
+        # Every todo in the list must appear exactly once; the UPDATE itself
+        # only matches IDs that belong to this list
+        total = db.session.query(db.func.count(Todo.id)).filter_by(todo_list_id=list_id).scalar()
+        if (not all(is_id(todo_id) for todo_id in ordered_ids)
+                or len(set(ordered_ids)) != len(ordered_ids) or len(ordered_ids) != total):
             return jsonify({'error': 'Provided IDs do not match todos in this list'}), 400
 
-        for index, todo_id in enumerate(ordered_ids):
-            if todo_id in todo_map:
-                todo_map[todo_id].order = index
+        user_id = get_jwt_identity()
+        if apply_order(list_scope(list_id), ordered_ids, next_change_seq(user_id)) != total:
+            db.session.rollback()
+            return jsonify({'error': 'Provided IDs do not match todos in this list'}), 400
 
         db.session.commit()
 
@@ -257,3 +459,38 @@ def reorder_todos(list_id):
         db.session.rollback()
         logger.error(f"Failed to reorder todos for list {list_id}: {e}")
         return jsonify({'error': 'Failed to reorder todos', 'details': str(e)}), 500
+
+@todos_bp.route('/<int:todo_id>/move', methods=['PATCH'])
+def move_todo_in_list(list_id, todo_id):
+    """Move one todo directly after or before another todo in the list"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or ('after_id' in data) == ('before_id' in data):
+            return jsonify({'error': 'Provide exactly one of: after_id, before_id'}), 400
+
+        after = 'after_id' in data
+        anchor_id = data['after_id'] if after else data['before_id']
+        if anchor_id is not None and not is_id(anchor_id):
+            return jsonify({'error': 'after_id and before_id must be integers or null'}), 400
+
+        todo = Todo.query.filter_by(id=todo_id, todo_list_id=list_id).first()
+        if not todo:
+            return jsonify({'error': 'Todo not found'}), 404
+
+        try:
+            move_todo(todo, list_scope(list_id), anchor_id, after)
+        except PlacementError as e:
+            return jsonify({'error': str(e)}), 400
+
+        db.session.commit()
+
+        logger.info(f"Todo {todo_id} moved to order {todo.order} in list {list_id}")
+        return jsonify({
+            'message': 'Todo moved successfully',
+            'todo': todo.to_dict()
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to move todo {todo_id} in list {list_id}: {e}")
+        return jsonify({'error': 'Failed to move todo', 'details': str(e)}), 500
@@ -0,0 +1,264 @@
+"""
+Account export and import.
+
+GET /export streams all of the current user's lists and todos as NDJSON: a
+header record, then one record per list, then one per todo. Rows are read as
+plain columns in batches of EXPORT_BATCH_SIZE (yield_per, a server-side
+cursor where the driver has one) and each batch is encoded and sent as one
+chunk, so memory stays flat whatever the size of the account, and the first
+bytes leave before the database has read the last row.
+
+Todos are ordered by their position, so the todos of each list appear in
+list order. Every record carries its original IDs, and todos refer to their
+list by todo_list_id.
+
+POST /import reads NDJSON (the export format) or CSV from the request body
+line by line and never holds more than IMPORT_CHUNK_SIZE new lists and todos
+in one transaction: each full chunk is inserted with one multi-row INSERT per
+list and committed. Todos are
+validated like single creates. The response is itself an NDJSON stream of
+per-row errors and per-chunk progress, ending with a summary, so a long
+import shows progress and a failure part-way leaves every earlier chunk in
+place.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from models import db, Todo, TodoList
+from routing import replica_read
+from serialization import dumps_bytes, rows_to_ndjson
+from todos import insert_todos
+from validation import is_id, validate_list_name, validate_new_todo, ValidationError
+from logging_config import logger
+
+transfer_bp = Blueprint('transfer', __name__)
+
+EXPORT_FORMAT_VERSION = 1
+EXPORT_BATCH_SIZE = 1000
+
+IMPORT_CHUNK_SIZE = 500
+# Longer NDJSON lines are reported as errors rather than buffered
+IMPORT_MAX_LINE_BYTES = 64 * 1024
+# Past this many, failed rows are only counted
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+CSV_TRUE = {'true', 'yes', 'y', '1', 'x'}
+CSV_FALSE = {'false', 'no', 'n', '0', ''}
+
+EXPORT_LIST_FIELDS = ('id', 'name', 'created_at')
+EXPORT_TODO_FIELDS = ('id', 'todo_list_id', 'title', 'description', 'completed',
+                      'created_at', 'updated_at', 'order')
+
+def _columns(model, fields):
+    return [getattr(model, field) for field in fields]
+
+def export_chunks(user_id):
+    """The user's data as NDJSON, one chunk of bytes per batch of rows"""
+    yield dumps_bytes({'type': 'export', 'version': EXPORT_FORMAT_VERSION,
+                       'exported_at': datetime.utcnow()}) + b'\n'
+
+    exports = (
+        ('todolist', EXPORT_LIST_FIELDS, select(*_columns(TodoList, EXPORT_LIST_FIELDS))
+         .where(TodoList.user_id == user_id).order_by(TodoList.id)),
+        ('todo', EXPORT_TODO_FIELDS, select(*_columns(Todo, EXPORT_TODO_FIELDS))
+         .where(Todo.user_id == user_id).order_by(Todo.order, Todo.id)),
+    )
+    try:
+        for record_type, fields, query in exports:
+            result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for rows in result.partitions():
+                yield rows_to_ndjson(rows, fields, type=record_type)
+    except Exception as e:
+        # Headers are long gone; all that is left is to cut the stream short
+        logger.error(f"Export for user {user_id} failed: {e}")
+        raise
+
+@transfer_bp.route('/export', methods=['GET'])
+@replica_read
+@jwt_required()
+def export_data():
+    """Stream all of the current user's lists and todos as NDJSON"""
+    user_id = int(get_jwt_identity())
+    logger.info(f"Starting export for user {user_id}")
+
+    response = Response(stream_with_context(export_chunks(user_id)), mimetype='application/x-ndjson')
+    stamp = datetime.utcnow().strftime('%Y%m%d')
+    response.headers['Content-Disposition'] = f'attachment; filename="todo-export-{stamp}.ndjson"'
+    return response
+
+def ndjson_records(stream):
+    """(line number, record) for every non-blank line of an NDJSON stream"""
+    number = 0
+    while True:
+        line = stream.readline(IMPORT_MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > IMPORT_MAX_LINE_BYTES and not line.endswith(b'\n'):
+            # Skip the rest of the line without keeping it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(IMPORT_MAX_LINE_BYTES)
+            yield number, ValidationError(f'Line is longer than {IMPORT_MAX_LINE_BYTES} bytes')
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, ValidationError('Line is not valid JSON')
+
+def csv_records(reader, header):
+    """(line number, record) for every row of a CSV reader whose header row has been read"""
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, ValidationError(f'Invalid CSV: {e}')
+            continue
+        if not any(values):
+            continue
+        record = dict(zip(header, values))
+        completed = (record.get('completed') or '').strip().lower()
+        if completed not in CSV_TRUE | CSV_FALSE:
+            yield reader.line_num, ValidationError('Completed field must be true or false')
+            continue
+        record['completed'] = completed in CSV_TRUE
+        yield reader.line_num, record
+
+class Importer:
+    """Turns import records into lists and chunks of todos for one user"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.pending = defaultdict(list)
+        self.pending_count = 0
+        self.pending_lists = 0
+        self.rows = self.created = self.failed = self.todolists = 0
+        # Exported list IDs and CSV list names, mapped to the lists they became
+        self.list_ids = {}
+        self.list_names = {}
+
+    def add(self, record):
+        """Stage one record; returns True once a chunk of lists and todos is full"""
+        if not isinstance(record, dict):
+            raise ValidationError('Record must be a JSON object')
+        record_type = record.get('type', 'todo')
+        if record_type == 'todolist':
+            list_id = self._create_list(record.get('name'))
+            if is_id(record.get('id')):
+                self.list_ids[record['id']] = list_id
+            return self._full()
+        if record_type != 'todo':
+            raise ValidationError(f'Unknown record type: {record_type}')
+
+        row = validate_new_todo(record)
+        completed = record.get('completed', False)
+        if not isinstance(completed, bool):
+            raise ValidationError('Completed field must be a boolean')
+        row['completed'] = completed
+        self.pending[self._list_id(record)].append(row)
+        self.pending_count += 1
+        return self._full()
+
+    def _full(self):
+        # Lists are flushed as they are created, so they count towards the chunk too
+        return self.pending_count + self.pending_lists >= IMPORT_CHUNK_SIZE
+
+    def _create_list(self, name):
+        todolist = TodoList(name=validate_list_name(name), user_id=self.user_id)
+        db.session.add(todolist)
+        db.session.flush()
+        self.pending_lists += 1
+        return todolist.id
+
+    def _list_id(self, record):
+        if record.get('list'):
+            name = validate_list_name(record['list'])
+            if name not in self.list_names:
+                existing = db.session.query(TodoList.id).filter_by(user_id=self.user_id, name=name).first()
+                self.list_names[name] = existing.id if existing else self._create_list(name)
+            return self.list_names[name]
+        if record.get('todo_list_id') is not None:
+            list_id = record['todo_list_id']
+            if not is_id(list_id) or list_id not in self.list_ids:
+                raise ValidationError(f'Unknown todo_list_id: {list_id}')
+            return self.list_ids[list_id]
+        return None
+
+    def commit(self):
+        """Insert and commit the staged chunk"""
+        created = sum(len(insert_todos(self.user_id, list_id, rows)) for list_id, rows in self.pending.items())
+        db.session.commit()
+        self.created += created
+        self.todolists += self.pending_lists
+        self.pending.clear()
+        self.pending_count = self.pending_lists = 0
+
+    def summary(self):
+        return {'rows': self.rows, 'created': self.created, 'failed': self.failed, 'todolists': self.todolists}
+
+def _line(record):
+    return dumps_bytes(record) + b'\n'
+
+def run_import(importer, records):
+    """Import the records, yielding NDJSON error, progress and summary lines"""
+    try:
+        for number, record in records:
+            if isinstance(record, dict) and record.get('type') == 'export':
+                continue
+            importer.rows += 1
+            try:
+                if isinstance(record, ValidationError):
+                    raise record
+                full = importer.add(record)
+            except ValidationError as e:
+                importer.failed += 1
+                if importer.failed <= IMPORT_MAX_REPORTED_ERRORS:
+                    yield _line({'type': 'error', 'line': number, 'error': str(e)})
+                continue
+            if full:
+                importer.commit()
+                yield _line({'type': 'progress', **importer.summary()})
+        importer.commit()
+        logger.info(f"Import for user {importer.user_id} finished: {importer.summary()}")
+    except Exception as e:
+        # Chunks committed so far stay; the summary says how far the import got
+        db.session.rollback()
+        logger.error(f"Import for user {importer.user_id} failed: {e}")
+        yield _line({'type': 'error', 'error': 'Import stopped; earlier chunks were kept', 'details': str(e)})
+    yield _line({'type': 'summary', **importer.summary()})
+
+@transfer_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_data():
+    """Import lists and todos from an NDJSON or CSV request body"""
+    user_id = int(get_jwt_identity())
+    data_format = IMPORT_FORMATS.get(request.mimetype)
+    if data_format is None:
+        return jsonify({'error': 'Content-Type must be application/x-ndjson or text/csv'}), 415
+
+    if data_format == 'csv':
+        text = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = [name.strip().lower() for name in next(reader, [])]
+        if 'title' not in header:
+            return jsonify({'error': 'CSV header must include a title column'}), 400
+        records = csv_records(reader, header)
+    else:
+        records = ndjson_records(request.stream)
+
+    logger.info(f"Starting {data_format} import for user {user_id}")
+    importer = Importer(user_id)
+    return Response(stream_with_context(run_import(importer, records)), mimetype='application/x-ndjson')
@@ -1,15 +1,82 @@
-from flask import Blueprint, jsonify, request
-from models import db, User, UserRole
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from models import db, User, UserRole, UserStats
 from decorators import role_required
+from principals import bump_security_epoch, invalidate_principal, revoke_deleted_user
+from purge import PurgeModeError, hide_user, purge_in_background, wake_purge_worker
+from pagination import get_page_args, paginate, PaginationError
+from routing import replica_read
+from serialization import rows_to_dicts, rows_to_ndjson
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
 
+# Same keys, in the same order, as User.to_dict()
+USER_FIELDS = ('id', 'username', 'email', 'created_at', 'role', 'is_active')
+USER_COLUMNS = tuple(getattr(User, field) for field in USER_FIELDS)
+USER_EXPORT_BATCH_SIZE = 1000
+
+class FilterError(ValueError):
+    """Raised when a user listing filter is invalid"""
+
+def _parse_datetime(args, name):
+    try:
+        return datetime.fromisoformat(args[name])
+    except ValueError:
+        raise FilterError(f'{name} must be an ISO 8601 date or datetime')
+
+def user_filters(args):
+    """Criteria for the role, is_active, created_after, created_before and username filters"""
+    criteria = []
+    if 'role' in args:
+        try:
+            criteria.append(User.role == UserRole(args['role']))
+        except ValueError:
+            raise FilterError('Invalid role')
+    if 'is_active' in args:
+        criteria.append(User.is_active == (args['is_active'].lower() in ('true', '1', 'yes')))
+    if 'created_after' in args:
+        criteria.append(User.created_at >= _parse_datetime(args, 'created_after'))
+    if 'created_before' in args:
+        criteria.append(User.created_at < _parse_datetime(args, 'created_before'))
+    if args.get('username'):
+        # A range rather than LIKE, so the unique index on username serves the prefix
+        prefix = args['username']
+        criteria += [User.username >= prefix, User.username < prefix + '\U0010ffff']
+    return criteria
+
+def stream_users(query):
+    """The users of a column query as NDJSON, one chunk per batch of rows"""
+    result = db.session.execute(query.statement.execution_options(yield_per=USER_EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        yield rows_to_ndjson(rows, USER_FIELDS)
+
 @users_bp.route('', methods=['GET'])
 @users_bp.route('/', methods=['GET'])
+@replica_read
 @role_required('admin')
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    try:
+        query = db.session.query(*USER_COLUMNS).filter(*user_filters(request.args))
+
+        if request.args.get('format') == 'ndjson':
+            return Response(stream_with_context(stream_users(query.order_by(User.id))),
+                            mimetype='application/x-ndjson')
+
+        limit, cursor = get_page_args(request.args)
+        if limit is None:
+            users = query.order_by(User.id).all()
+            return jsonify(rows_to_dicts(users, USER_FIELDS))
+
+        # Paginated responses are wrapped so they can carry the cursor
+        users, next_cursor = paginate(query, (User.id,), limit, cursor)
+    except (PaginationError, FilterError) as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'users': rows_to_dicts(users, USER_FIELDS),
+        'count': len(users),
+        'next_cursor': next_cursor
+    })
 
 @users_bp.route('/<int:user_id>', methods=['PUT'])
 @role_required('admin')
@@ -17,24 +84,48 @@ def update_user(user_id):
     user = User.query.get_or_404(user_id)
     data = request.get_json()
     
+    revoke = False
     if 'role' in data:
         try:
-            user.role = UserRole(data['role'])
+            role = UserRole(data['role'])
         except ValueError:
             return jsonify({'message': 'Invalid role'}), 400
+        revoke = role != user.role
+        user.role = role
             
     if 'is_active' in data:
+        revoke = revoke or (user.is_active and not data['is_active'])
         user.is_active = data['is_active']
+
+    # Tokens issued under the old role or before deactivation stop working
+    if revoke:
+        bump_security_epoch(user)
             
     db.session.commit()
+    invalidate_principal(user_id)
     return jsonify(user.to_dict())
 
 @users_bp.route('/<int:user_id>', methods=['DELETE'])
 @role_required('admin')
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    stats = db.session.get(UserStats, user_id)
+    try:
+        background = purge_in_background(request.args, stats.todo_count if stats else 0)
+    except PurgeModeError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if background:
+        job = hide_user(user)
+        db.session.commit()
+        invalidate_principal(user_id)
+        wake_purge_worker()
+        return jsonify({'message': 'User deletion started', 'purge': job.to_dict()}), 202
+
+    revoke_deleted_user(user)
     db.session.delete(user)
     db.session.commit()
+    invalidate_principal(user_id)
     return jsonify({'message': 'User deleted'})
 
 @users_bp.route('/<int:user_id>/reset-password', methods=['POST'])
@@ -47,6 +138,8 @@ def admin_reset_password(user_id):
         return jsonify({'message': 'Password is required'}), 400
         
     user.set_password(data['password'])
+    bump_security_epoch(user)
     db.session.commit()
+    invalidate_principal(user_id)
     
     return jsonify({'message': 'Password has been reset successfully.'})
@@ -0,0 +1,65 @@
+"""
+Field validation shared by the single-item, batch and bulk endpoints, so a
+todo or list is accepted or rejected the same way whichever route it takes.
+Messages are safe to return to the client as they are.
+"""
+
+MAX_TITLE_LENGTH = 200
+MAX_LIST_NAME_LENGTH = 100
+
+class ValidationError(ValueError):
+    """Raised when a request field is missing or invalid"""
+
+def is_id(value):
+    """Whether a JSON value is an integer ID; true and false parse as ints but are not IDs"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def validate_title(value):
+    """A todo title, stripped"""
+    title = value.strip() if isinstance(value, str) else ''
+    if not title or len(title) > MAX_TITLE_LENGTH:
+        raise ValidationError(f'Title must be between 1 and {MAX_TITLE_LENGTH} characters')
+    return title
+
+def validate_description(value):
+    """A todo description, stripped; empty descriptions are stored as None"""
+    if not value:
+        return None
+    if not isinstance(value, str):
+        raise ValidationError('Description must be a string')
+    return value.strip() or None
+
+def validate_new_todo(data):
+    """The title and description of a todo to create"""
+    if not isinstance(data, dict) or 'title' not in data:
+        raise ValidationError('Missing required field: title')
+    return {
+        'title': validate_title(data['title']),
+        'description': validate_description(data.get('description')),
+    }
+
+def validate_todo_changes(data):
+    """The fields present in a todo update, validated"""
+    changes = {}
+    if 'title' in data:
+        changes['title'] = validate_title(data['title'])
+    if 'description' in data:
+        changes['description'] = validate_description(data['description'])
+    if 'completed' in data:
+        if not isinstance(data['completed'], bool):
+            raise ValidationError('Completed field must be a boolean')
+        changes['completed'] = data['completed']
+    if 'order' in data:
+        if not isinstance(data['order'], int) or isinstance(data['order'], bool):
+            raise ValidationError('Order field must be an integer')
+        changes['order'] = data['order']
+    return changes
+
+def validate_list_name(value):
+    """A todo list name, stripped"""
+    name = value.strip() if isinstance(value, str) else ''
+    if not name:
+        raise ValidationError('Name is required')
+    if len(name) > MAX_LIST_NAME_LENGTH:
+        raise ValidationError(f'Name must be at most {MAX_LIST_NAME_LENGTH} characters')
+    return name
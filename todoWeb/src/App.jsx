@@ -26,6 +26,7 @@ import {
   updateTodo as apiUpdateTodo,
   deleteTodo as apiDeleteTodo,
   reorderTodos as apiReorderTodos,
+  moveTodo as apiMoveTodo,
 } from './api';
 
 const AdminRoute = ({ user, children }) => {
@@ -153,12 +154,21 @@ function App() {
     }
   };
 
-  const reorderTodos = async (reorderedTodos) => {
+  const reorderTodos = async (reorderedTodos, movedTodoId) => {
     if (!selectedList) return;
     try {
       setTodos(reorderedTodos);
-      const orderedIds = reorderedTodos.map((todo) => todo.id);
-      await apiReorderTodos(selectedList.id, orderedIds);
+      const index = reorderedTodos.findIndex((todo) => todo.id === movedTodoId);
+      if (index === -1) {
+        const orderedIds = reorderedTodos.map((todo) => todo.id);
+        await apiReorderTodos(selectedList.id, orderedIds);
+      } else {
+        // Only send the moved todo and its new neighbour
+        const neighbour = index > 0
+          ? { after_id: reorderedTodos[index - 1].id }
+          : { before_id: reorderedTodos[1]?.id ?? null };
+        await apiMoveTodo(selectedList.id, movedTodoId, neighbour);
+      }
     } catch (error) {
       console.error('Failed to reorder todos:', error);
       fetchTodos(selectedList.id);
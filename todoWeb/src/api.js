@@ -125,8 +125,21 @@ export const reorderTodos = async (listId, orderedIds) => {
   });
 };
 
-export const getUsers = async () => {
-  return fetchWithAuth(`${API_URL}/users`);
+// Place one todo next to a neighbour: pass { after_id } or { before_id }
+export const moveTodo = async (listId, todoId, neighbour) => {
+  return fetchWithAuth(`${API_URL}/todolists/${listId}/todos/${todoId}/move`, {
+    method: 'PATCH',
+    body: JSON.stringify(neighbour),
+  });
+};
+
+// One page of users: { users, count, next_cursor }. Filters: role, is_active, username (prefix)
+export const getUsers = async ({ limit = 50, cursor, ...filters } = {}, { signal } = {}) => {
+  const params = new URLSearchParams({ limit, ...filters });
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
+  return fetchWithAuth(`${API_URL}/users?${params}`, { signal });
 };
 
 export const updateUser = async (id, updates) => {
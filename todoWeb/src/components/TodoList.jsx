@@ -60,8 +60,8 @@ const TodoList = ({ todos, updateTodo, deleteTodo, reorderTodos }) => {
       newTodos = [...newRelevantTodos, ...completedTodos];
     }
 
-    // Call the reorder function with the complete list
-    reorderTodos(newTodos);
+    // Call the reorder function with the complete list and the moved todo
+    reorderTodos(newTodos, draggedTodo.id);
   };
 
   if (todos.length === 0) {
@@ -1,24 +1,47 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { getUsers, updateUser, deleteUser, adminResetPassword } from '../api';
 
+const FILTER_DEBOUNCE_MS = 300;
+
 const Settings = () => {
     const [users, setUsers] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [usernameFilter, setUsernameFilter] = useState('');
+    // The filter actually queried, once typing has paused
+    const [query, setQuery] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    // Aborted when the query changes, so a slow response for an older query never lands
+    const requests = useRef(null);
+
+    // Users are fetched a page at a time; "Load more" appends the next page
+    const fetchUsers = async (cursor = null) => {
+        const { signal } = requests.current;
+        try {
+            const filters = query ? { username: query } : {};
+            const page = await getUsers({ cursor, ...filters }, { signal });
+            if (signal.aborted) return;
+            setUsers(previous => cursor ? [...previous, ...page.users] : page.users);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            if (signal.aborted) return;
+            setError('Failed to fetch users. You might not have the required permissions.');
+        } finally {
+            if (!signal.aborted) setLoading(false);
+        }
+    };
 
     useEffect(() => {
-        const fetchUsers = async () => {
-            try {
-                const usersData = await getUsers();
-                setUsers(usersData);
-            } catch (err) {
-                setError('Failed to fetch users. You might not have the required permissions.');
-            } finally {
-                setLoading(false);
-            }
-        };
+        const timer = setTimeout(() => setQuery(usernameFilter), FILTER_DEBOUNCE_MS);
+        return () => clearTimeout(timer);
+    }, [usernameFilter]);
+
+    useEffect(() => {
+        const controller = new AbortController();
+        requests.current = controller;
         fetchUsers();
-    }, []);
+        return () => controller.abort();
+    }, [query]);
 
     const handleRoleChange = async (userId, newRole) => {
         try {
@@ -67,6 +90,13 @@ const Settings = () => {
     return (
         <div className="container mx-auto p-4">
             <h1 className="text-2xl font-bold mb-4">User Management</h1>
+            <input
+                type="text"
+                value={usernameFilter}
+                onChange={(e) => setUsernameFilter(e.target.value)}
+                placeholder="Filter by username prefix"
+                className="border rounded p-2 mb-4"
+            />
             <div className="overflow-x-auto">
                 <table className="min-w-full bg-white">
                     <thead>
@@ -123,6 +153,14 @@ const Settings = () => {
                     </tbody>
                 </table>
             </div>
+            {nextCursor && (
+                <button
+                    onClick={() => fetchUsers(nextCursor)}
+                    className="mt-4 bg-gray-200 px-4 py-2 rounded hover:bg-gray-300"
+                >
+                    Load more
+                </button>
+            )}
         </div>
     );
 };